@@ -1,55 +1,599 @@
-import subprocess
 import sys
 import os
 import re
-from PyQt6.QtGui import QIcon, QFont, QColor, QPixmap, QPainter
+import time
+
+from alchemist.trace import trace
+
+# Any command line arguments mean a headless render: hand over to the CLI
+# before PyQt6 is imported (macOS passes -psn_* to app bundles, ignore it)
+if __name__ == "__main__" and len(sys.argv) > 1 and not sys.argv[1].startswith("-psn"):
+    from alchemist.cli import main
+    sys.exit(main(sys.argv[1:]))
+
+from PyQt6.QtGui import QIcon, QFont, QColor, QPixmap, QPainter, QDesktopServices
 from PyQt6.QtWidgets import QProgressBar, QStackedLayout, QWidget, QMessageBox
 
-def resource_path(relative_path):
-    """ Get absolute path to resource, works for dev and for PyInstaller """
-    if hasattr(sys, '_MEIPASS'):
-        return os.path.join(sys._MEIPASS, relative_path)
-    return os.path.join(os.path.dirname(__file__), relative_path)
-
-def ffmpeg_binary():
-    if sys.platform == "win32":
-        return "ffmpeg.exe"
-    else:
-        return "ffmpeg"
-
-def ffprobe_binary():
-    if sys.platform == "win32":
-        return "ffprobe.exe"
-    else:
-        return "ffprobe"
-
-def ffmpeg_path():
-    path = resource_path(os.path.join("bin", ffmpeg_binary()))
-    if not os.path.exists(path):
-        QMessageBox.critical(None, "Error", f"{ffmpeg_binary()} not found at: {path}")
-    return path
-
-def ffprobe_path():
-    path = resource_path(os.path.join("bin", ffprobe_binary()))
-    if not os.path.exists(path):
-        QMessageBox.critical(None, "Error", f"{ffprobe_binary()} not found at: {path}")
-    return path
-
-print("ffmpeg and ffprobe paths:")
-print(ffmpeg_path())
-print(ffprobe_path())
-
-if sys.platform == "win32":
-    CREATE_NO_WINDOW = subprocess.CREATE_NO_WINDOW
-else:
-    CREATE_NO_WINDOW = 0
+from alchemist.appdata import app_data_dir
+from alchemist.binaries import check_binaries, resource_path, ffmpeg_path, ffprobe_path
+from alchemist.capabilities import (
+    CPU_H264_LABEL, DEFAULT_PRORES_ENCODER, HW_ENCODERS, PRORES_ENCODERS, SOFTWARE_ENCODERS, get_capabilities
+)
+from alchemist import rendercache
+from alchemist.engine import PRESETS, RenderJob, cache_state, output_filenames, run_job
+from alchemist.framefeed import INPUT_FILES, INPUT_PIPE
+from alchemist.joblog import JobLog, RING_LINES, prune_logs
+from alchemist.mediainfo import audio_mismatch, describe_audio, media_cache
+from alchemist.metrics import JobMetrics, estimate_eta, format_duration, write_report
+from alchemist.probe import probe_image
+from alchemist.queuejournal import DONE, FAILED, PENDING, QueueJournal
+from alchemist.scheduler import ResourceScheduler, estimate_costs
+from alchemist.sequences import IMAGE_EXTS, find_sequence_folders
+from alchemist.thumbnails import sample_frames, thumbnail_cache
 
 from PyQt6.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog,
-    QLabel, QLineEdit, QMessageBox, QComboBox, QTreeWidget, QTreeWidgetItem,
-    QTextEdit, QInputDialog
+    QApplication, QWidget, QVBoxLayout, QPushButton, QFileDialog,
+    QLabel, QLineEdit, QMessageBox, QComboBox, QTreeView, QAbstractItemView,
+    QListView, QInputDialog, QSpinBox, QCheckBox, QMenu, QStyle, QStyledItemDelegate,
+    QStyleOptionProgressBar, QStyleOptionButton, QStyleOptionViewItem
+)
+from PyQt6.QtCore import (
+    Qt, QSize, QRect, QEvent, QObject, QRunnable, QThreadPool, QTimer, QUrl, pyqtSignal,
+    QAbstractTableModel, QAbstractListModel, QModelIndex
 )
-from PyQt6.QtCore import Qt, QSize
+
+# Optional features (render farm, watch folders) import their modules when first
+# used, so their dependencies don't slow down startup
+trace("imports")
+
+
+class ProgressDelegate(QStyledItemDelegate):
+    # Paints the status column as a progress bar. The fraction done (0.0 - 1.0)
+    # lives in the UserRole of the cell, the status text in the DisplayRole.
+    def paint(self, painter, option, index):
+        progress = index.data(Qt.ItemDataRole.UserRole)
+        if progress is None:
+            super().paint(painter, option, index)
+            return
+        bar = QStyleOptionProgressBar()
+        bar.rect = option.rect.adjusted(2, 3, -2, -3)
+        bar.state = option.state | QStyle.StateFlag.State_Horizontal
+        bar.minimum = 0
+        bar.maximum = 1000
+        bar.progress = int(max(0.0, min(1.0, progress)) * 1000)
+        bar.text = index.data(Qt.ItemDataRole.DisplayRole) or ""
+        bar.textVisible = True
+        bar.textAlignment = Qt.AlignmentFlag.AlignCenter
+        QApplication.style().drawControl(QStyle.ControlElement.CE_ProgressBar, bar, painter)
+
+
+class QueueRow:
+    # One queued image sequence folder and everything the queue shows about it
+    def __init__(self, folder, sequences):
+        self.folder = folder
+        self.key = queue_key(folder)
+        self.name = os.path.basename(os.path.normpath(folder))
+        self.sequences = sequences
+        self.take = "tk01"
+        self.audio = None        # Audio source path, only set when it has an audio stream
+        self.audio_name = None   # File name of the chosen audio source, if any
+        self.audio_path = None   # The chosen audio source, with or without an audio stream
+        self.audio_info = None   # mediainfo probe of audio_path, None while probing
+        self.format = ""         # e.g. "4096x2160 16-bit", filled in by the frame probe
+        self.pix_fmt = ""
+        self.status = ""
+        self.progress = None     # Fraction done while rendering, None otherwise
+        self.error = ""
+        self.done = False
+        self.cache_state = None  # rendercache state of the current output, None until checked
+        self.extra_presets = []  # Presets rendered besides the main one, from the same decode
+        self.batch_state = None  # queuejournal state in the current or last batch, None if not in one
+        self.thumbnail = None    # QIcon of the middle frame, None until the contact sheet is loaded
+        self.thumbnail_path = None  # Cached contact sheet (first/middle/last frame)
+
+
+def queue_key(folder):
+    # Normalized folder path used to index queue rows
+    return os.path.normcase(os.path.normpath(folder))
+
+
+class QueueModel(QAbstractTableModel):
+    # Table model behind the render queue. Filename previews are computed in
+    # data() for visible rows only, so a task code or preset change is a single
+    # dataChanged over the preview column instead of rewriting every row.
+    (COL_REMOVE, COL_THUMB, COL_FOLDER, COL_TAKE, COL_AUDIO, COL_PREVIEW,
+     COL_STATUS, COL_FRAMES, COL_FORMAT) = range(9)
+    HEADERS = ["", "Thumbnail", "IMG SQ Folder", "Take #", "Audio Source (optional)", "Filename Preview",
+               "Status", "Frames", "Format"]
+
+    # Shown in the status column while a row has no render status of its own
+    CACHE_LABELS = {rendercache.UP_TO_DATE: "Up to date", rendercache.CHANGED: "Changed"}
+
+    def __init__(self, check_icon, parent=None):
+        super().__init__(parent)
+        self.check_icon = check_icon
+        self.rows = []
+        self._by_key = {}  # queue_key(folder) -> QueueRow
+        self.task_code = ""
+        self.preset = ""
+        self.fps = "24"
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.column() == self.COL_TAKE:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole or role == Qt.ItemDataRole.EditRole:
+            if column == self.COL_FOLDER:
+                return row.name
+            if column == self.COL_TAKE:
+                return row.take
+            if column == self.COL_AUDIO:
+                return row.audio_name or ""
+            if column == self.COL_PREVIEW:
+                names = self.preview_filenames(row)
+                return names[0] + (f"  (+{len(names) - 1})" if len(names) > 1 else "")
+            if column == self.COL_STATUS:
+                return row.status or self.CACHE_LABELS.get(row.cache_state, "")
+            if column == self.COL_FRAMES:
+                return row.sequences[0].describe()
+            if column == self.COL_FORMAT:
+                return row.format
+        elif role == Qt.ItemDataRole.UserRole:
+            # Action/progress delegates read their state from here
+            if column == self.COL_AUDIO:
+                return row.audio_name
+            if column == self.COL_STATUS:
+                return row.progress
+        elif role == Qt.ItemDataRole.DecorationRole:
+            if column == self.COL_FOLDER and row.done:
+                return self.check_icon
+            if column == self.COL_THUMB:
+                return row.thumbnail
+        elif role == Qt.ItemDataRole.ForegroundRole:
+            if column == self.COL_AUDIO and row.audio_name:
+                if row.audio_info is None:
+                    return QColor("gray")  # Still probing
+                if not row.audio:
+                    return QColor("red")
+                return QColor("orange") if self.audio_mismatch(row) else QColor("green")
+            if column == self.COL_FRAMES and row.sequences[0].has_gaps:
+                return QColor("orange")
+            if column == self.COL_STATUS and not row.status and row.cache_state == rendercache.UP_TO_DATE:
+                return QColor("gray")
+        elif role == Qt.ItemDataRole.ToolTipRole:
+            if column == self.COL_FOLDER:
+                return row.folder
+            if column == self.COL_THUMB and row.thumbnail_path:
+                # First, middle and last frame
+                return f'<img src="{QUrl.fromLocalFile(row.thumbnail_path).toString()}">'
+            if column == self.COL_STATUS:
+                if row.error:
+                    return row.error
+                if row.cache_state == rendercache.UP_TO_DATE:
+                    return "Frames, audio and settings unchanged since the last render, will be skipped"
+                if row.cache_state == rendercache.CHANGED:
+                    return "Changed since the last render, will be re-rendered"
+                return None
+            if column == self.COL_AUDIO and row.audio_name:
+                if row.audio_info is None:
+                    return "Reading audio source..."
+                return "\n".join(filter(None, [describe_audio(row.audio_info), self.audio_mismatch(row)]))
+            if column == self.COL_PREVIEW:
+                return "\n".join(self.preview_filenames(row))
+            if column == self.COL_FRAMES:
+                return self._frames_tooltip(row)
+            if column == self.COL_FORMAT:
+                return row.pix_fmt or None
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if role != Qt.ItemDataRole.EditRole or index.column() != self.COL_TAKE:
+            return False
+        # Ensure take number is always formatted as tkXX
+        row = self.rows[index.row()]
+        match = re.match(r'tk?(\d{1,2})', str(value), re.IGNORECASE)
+        row.take = f"tk{int(match.group(1)):02d}" if match else "tk01"
+        self.row_changed(row, self.COL_TAKE, self.COL_PREVIEW)
+        return True
+
+    def _frames_tooltip(self, row):
+        sequence = row.sequences[0]
+        tooltip = [f"{sequence.pattern}: frames {sequence.first}-{sequence.last}"]
+        if sequence.has_gaps:
+            tooltip.append(f"Missing frames (held from the previous frame): {sequence.describe_missing()}")
+        if len(row.sequences) > 1:
+            tooltip.append("Other sequences in this folder (not rendered):")
+            tooltip += [f"  {s.pattern}: {s.describe()}" for s in row.sequences[1:]]
+        return "\n".join(tooltip)
+
+    def audio_mismatch(self, row):
+        # Uses the cached probe only, never starts one
+        return audio_mismatch(row.audio_info, row.sequences[0].length, self.fps) if row.audio else None
+
+    def set_fps(self, fps):
+        self.fps = fps
+        if self.rows:
+            self.dataChanged.emit(self.index(0, self.COL_AUDIO), self.index(len(self.rows) - 1, self.COL_AUDIO))
+
+    def presets_for(self, row):
+        # The main preset first, then the row's extra presets
+        return [self.preset] + [preset for preset in row.extra_presets if preset != self.preset]
+
+    def preview_filenames(self, row):
+        return output_filenames(row.name, row.take, self.task_code, self.presets_for(row))
+
+    def set_naming(self, task_code, preset):
+        self.task_code = task_code
+        self.preset = preset
+        if self.rows:
+            self.dataChanged.emit(self.index(0, self.COL_PREVIEW), self.index(len(self.rows) - 1, self.COL_PREVIEW))
+
+    def contains(self, key):
+        return key in self._by_key
+
+    def row_for_key(self, key):
+        return self._by_key.get(key)
+
+    def add_row(self, row):
+        position = len(self.rows)
+        self.beginInsertRows(QModelIndex(), position, position)
+        self.rows.append(row)
+        self._by_key[row.key] = row
+        self.endInsertRows()
+
+    def remove_row(self, row):
+        if row.key not in self._by_key:
+            return
+        position = self.rows.index(row)
+        self.beginRemoveRows(QModelIndex(), position, position)
+        del self.rows[position]
+        del self._by_key[row.key]
+        self.endRemoveRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.rows = []
+        self._by_key = {}
+        self.endResetModel()
+
+    def row_changed(self, row, *columns):
+        # Repaints the given columns of one row (all of them by default). Rows
+        # removed while they were still rendering are silently ignored.
+        if row.key not in self._by_key:
+            return
+        position = self.rows.index(row)
+        columns = columns or (0, len(self.HEADERS) - 1)
+        self.dataChanged.emit(self.index(position, min(columns)), self.index(position, max(columns)))
+
+
+class LogModel(QAbstractListModel):
+    # Read-only list view onto one JobLog's ring buffer. refresh() only inserts
+    # the lines added since the last call (and drops the ones the ring dropped),
+    # so following a running job never rebuilds the whole list.
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.job_log = None
+        self.lines = []
+        self.count = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.lines)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if index.isValid() and role == Qt.ItemDataRole.DisplayRole:
+            return self.lines[index.row()]
+        return None
+
+    def set_log(self, job_log):
+        self.beginResetModel()
+        self.job_log = job_log
+        self.lines, self.count = job_log.since(0) if job_log else ([], 0)
+        self.endResetModel()
+
+    def refresh(self):
+        """ Pulls new lines from the job log, returns True if any were added. """
+        if self.job_log is None:
+            return False
+        lines, count = self.job_log.since(self.count)
+        if not lines:
+            return False
+        if count - self.count >= RING_LINES:
+            # More new lines than the ring holds, start over from the ring
+            self.beginResetModel()
+            self.lines, self.count = lines, count
+            self.endResetModel()
+            return True
+        self.count = count
+        position = len(self.lines)
+        self.beginInsertRows(QModelIndex(), position, position + len(lines) - 1)
+        self.lines += lines
+        self.endInsertRows()
+        overflow = len(self.lines) - RING_LINES
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            del self.lines[:overflow]
+            self.endRemoveRows()
+        return True
+
+
+class QueueActionDelegate(QStyledItemDelegate):
+    # Paints the remove "X" and the audio column's "Add Audio" button / remove
+    # audio "X" straight onto the cells and turns clicks on them into signals,
+    # so rows don't need live QPushButton widgets.
+    remove_clicked = pyqtSignal(int)
+    audio_clicked = pyqtSignal(int)
+    remove_audio_clicked = pyqtSignal(int)
+
+    def __init__(self, remove_icon, parent=None):
+        super().__init__(parent)
+        self.remove_icon = remove_icon
+
+    def _icon_rect(self, rect, centered):
+        x = rect.center().x() - 8 if centered else rect.right() - 19
+        return QRect(x, rect.center().y() - 8, 16, 16)
+
+    def _button_rect(self, rect):
+        return QRect(rect.left() + 2, rect.center().y() - 11, min(90, rect.width() - 4), 22)
+
+    def sizeHint(self, option, index):
+        size = super().sizeHint(option, index)
+        return QSize(size.width(), max(size.height(), 24))
+
+    def paint(self, painter, option, index):
+        if index.column() == QueueModel.COL_REMOVE:
+            self.remove_icon.paint(painter, self._icon_rect(option.rect, True))
+            return
+        if index.data(Qt.ItemDataRole.UserRole) is None:
+            button = QStyleOptionButton()
+            button.rect = self._button_rect(option.rect)
+            button.text = "Add Audio"
+            button.state = QStyle.StateFlag.State_Enabled | QStyle.StateFlag.State_Raised
+            QApplication.style().drawControl(QStyle.ControlElement.CE_PushButton, button, painter)
+            return
+        text_option = QStyleOptionViewItem(option)
+        text_option.rect = option.rect.adjusted(0, 0, -22, 0)
+        super().paint(painter, text_option, index)
+        self.remove_icon.paint(painter, self._icon_rect(option.rect, False))
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() != QEvent.Type.MouseButtonRelease or event.button() != Qt.MouseButton.LeftButton:
+            return super().editorEvent(event, model, option, index)
+        pos = event.position().toPoint()
+        if index.column() == QueueModel.COL_REMOVE:
+            self.remove_clicked.emit(index.row())
+        elif index.data(Qt.ItemDataRole.UserRole) is None:
+            if self._button_rect(option.rect).contains(pos):
+                self.audio_clicked.emit(index.row())
+        elif self._icon_rect(option.rect, False).contains(pos):
+            self.remove_audio_clicked.emit(index.row())
+        else:
+            self.audio_clicked.emit(index.row())
+        return True
+
+
+class BinaryCheckSignals(QObject):
+    finished = pyqtSignal(str, str, list)  # ffmpeg path, ffprobe path, problems
+
+
+class BinaryCheckWorker(QRunnable):
+    # Resolves ffmpeg/ffprobe and test-runs them, so the window never waits on it
+    def __init__(self):
+        super().__init__()
+        self.signals = BinaryCheckSignals()
+
+    def run(self):
+        self.signals.finished.emit(*check_binaries())
+
+
+class CapabilitySignals(QObject):
+    finished = pyqtSignal(object)  # EncoderCapabilities
+
+
+class CapabilityProbeWorker(QRunnable):
+    # Loads (or probes once and caches) the encoders ffmpeg can use, off the GUI thread
+    def __init__(self, ffmpeg):
+        super().__init__()
+        self.ffmpeg = ffmpeg
+        self.signals = CapabilitySignals()
+
+    def run(self):
+        self.signals.finished.emit(get_capabilities(self.ffmpeg))
+
+
+class IngestSignals(QObject):
+    found = pyqtSignal(str, object)  # folder, [ImageSequence]
+    finished = pyqtSignal(list)      # names of dropped paths without any sequence
+
+
+class IngestWorker(QRunnable):
+    # Finds the sequence folders in dropped paths (recursing into parent
+    # directories) off the GUI thread, each folder is reported as soon as found
+    def __init__(self, paths):
+        super().__init__()
+        self.paths = paths
+        self.signals = IngestSignals()
+
+    def run(self):
+        rejected = []
+        for path in self.paths:
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTS):
+                path = os.path.dirname(path)  # A dropped frame stands for its folder
+            if not os.path.isdir(path):
+                continue
+            found = False
+            for folder, sequences in find_sequence_folders(path):
+                self.signals.found.emit(folder, sequences)
+                found = True
+            if not found:
+                rejected.append(os.path.basename(os.path.normpath(path)))
+        self.signals.finished.emit(rejected)
+
+
+class WatchSignals(QObject):
+    # Emitted from the FolderWatcher's thread, delivered on the GUI thread
+    found = pyqtSignal(str, object)  # folder, [ImageSequence]
+
+
+class FrameProbeSignals(QObject):
+    finished = pyqtSignal(str, object)  # folder, probe_image() result or None
+
+
+class FrameProbeWorker(QRunnable):
+    # Reads resolution and bit depth from the first frame of a queued sequence
+    def __init__(self, ffprobe, folder, frame_path):
+        super().__init__()
+        self.ffprobe = ffprobe
+        self.folder = folder
+        self.frame_path = frame_path
+        self.signals = FrameProbeSignals()
+
+    def run(self):
+        self.signals.finished.emit(self.folder, probe_image(self.ffprobe, self.frame_path))
+
+
+class ThumbnailSignals(QObject):
+    finished = pyqtSignal(str, object)  # folder, contact sheet path or None
+
+
+class ThumbnailWorker(QRunnable):
+    # Loads a sequence's contact sheet from the thumbnail cache, rendering it on a miss
+    def __init__(self, ffmpeg, folder, sequence):
+        super().__init__()
+        self.ffmpeg = ffmpeg
+        self.folder = folder
+        self.sequence = sequence
+        self.signals = ThumbnailSignals()
+
+    def run(self):
+        self.signals.finished.emit(self.folder, thumbnail_cache().get(self.sequence, self.ffmpeg))
+
+
+class MediaProbeSignals(QObject):
+    finished = pyqtSignal(str, str, object)  # folder, media path, mediainfo result or None
+
+
+class MediaProbeWorker(QRunnable):
+    # Reads an audio source's streams and duration through the media info cache
+    def __init__(self, folder, path):
+        super().__init__()
+        self.folder = folder
+        self.path = path
+        self.signals = MediaProbeSignals()
+
+    def run(self):
+        self.signals.finished.emit(self.folder, self.path, media_cache().get(self.path, ffprobe_path()))
+
+
+class CacheCheckSignals(QObject):
+    checked = pyqtSignal(int, str, object)  # generation, folder, rendercache state or None
+    finished = pyqtSignal()
+
+
+class CacheCheckWorker(QRunnable):
+    # Fingerprints queued folders against their outputs' render manifests
+    def __init__(self, generation, jobs, ffmpeg):
+        super().__init__()
+        self.generation = generation
+        self.jobs = jobs  # [(folder key, RenderJob)]
+        self.ffmpeg = ffmpeg
+        self.signals = CacheCheckSignals()
+
+    def run(self):
+        for key, job in self.jobs:
+            try:
+                state = cache_state(job, self.ffmpeg)
+            except Exception:
+                state = None
+            self.signals.checked.emit(self.generation, key, state)
+        self.signals.finished.emit()
+
+
+class CostEstimateSignals(QObject):
+    finished = pyqtSignal(object)  # {job id: JobCost or None}
+
+
+class CostEstimateWorker(QRunnable):
+    # Estimates what each job of a batch costs (samples a few frame sizes per folder)
+    def __init__(self, jobs, ffmpeg, cpu_threads):
+        super().__init__()
+        self.jobs = jobs  # {job id: RenderJob}
+        self.ffmpeg = ffmpeg
+        self.cpu_threads = cpu_threads
+        self.signals = CostEstimateSignals()
+
+    def run(self):
+        # Never raises, a job that can't be estimated gets None and the batch still starts
+        self.signals.finished.emit(estimate_costs(self.jobs, self.ffmpeg, self.cpu_threads))
+
+
+class RenderSignals(QObject):
+    started = pyqtSignal(int)
+    progress = pyqtSignal(int, int, int)         # job id, current frame, total frames
+    finished = pyqtSignal(int, bool, str, bool)  # job id, success, error message, skipped
+
+
+class RenderWorker(QRunnable):
+    # Runs a single engine job on the render thread pool. Never touches
+    # widgets directly, everything goes back to the GUI thread through signals.
+    # ffmpeg's log goes straight into the job's JobLog, the log view polls it.
+    def __init__(self, job_id, job, job_log, metrics):
+        super().__init__()
+        self.job_id = job_id
+        self.job = job
+        self.job_log = job_log
+        self.metrics = metrics
+        self.signals = RenderSignals()
+
+    def run(self):
+        self.job_log.open()
+        self.signals.started.emit(self.job_id)
+        result = run_job(
+            self.job,
+            progress_callback=lambda frame, total: self.signals.progress.emit(self.job_id, frame, total),
+            log_callback=self.job_log.append,
+            metrics=self.metrics)
+        if not result.success:
+            self.job_log.append(f"Render failed: {result.error.splitlines()[-1] if result.error else 'unknown error'}")
+        self.job_log.close()
+        self.signals.finished.emit(self.job_id, result.success, result.error, result.skipped)
+
+
+class FarmSignals(QObject):
+    finished = pyqtSignal(object, str)  # broker reply (None on error), error message
+
+
+class FarmRequestWorker(QRunnable):
+    # Talks to the farm broker off the GUI thread: submits a batch or polls its status
+    def __init__(self, request, *args):
+        super().__init__()
+        self.request = request
+        self.args = args
+        self.signals = FarmSignals()
+
+    def run(self):
+        from alchemist.farm import FarmError
+        try:
+            self.signals.finished.emit(self.request(*self.args), "")
+        except FarmError as e:
+            self.signals.finished.emit(None, str(e))
 
 
 class FFmpegGUI(QWidget):
@@ -99,24 +643,45 @@ class FFmpegGUI(QWidget):
         # Folder/Audio list with headers
         self.input_label = QLabel("Image Sequence Folders (drag & drop supported):")
         self.layout.addWidget(self.input_label)
-        self.input_tree = QTreeWidget()
-        self.input_tree.setColumnCount(5)
-        self.input_tree.setHeaderLabels(["", "IMG SQ Folder", "Take #", "Audio Source (optional)", "Filename Preview"])
-        self.input_tree.setSelectionMode(QTreeWidget.SelectionMode.ExtendedSelection)
-        self.input_tree.setAcceptDrops(True)
-        self.input_tree.viewport().setAcceptDrops(True)
-        self.input_tree.setDropIndicatorShown(True)
-        self.input_tree.setDragDropMode(QTreeWidget.DragDropMode.NoDragDrop)
-        # Set column widths
-        self.input_tree.setColumnWidth(0, 32)   # Remove button column
-        self.input_tree.setColumnWidth(1, 200)  # Folder column
-        self.input_tree.setColumnWidth(2, 60)
-        self.input_tree.setColumnWidth(3, 150)   # Take number column
-        self.input_tree.setColumnWidth(4, 250)  # Preview filename column
-        self.layout.addWidget(self.input_tree)
 
-        # Make take number column editable
-        self.input_tree.itemChanged.connect(self._on_item_changed)
+        # Icons are painted once and shared by every row
+        self._remove_icon = self._paint_icon("red", [(4, 4, 12, 12), (12, 4, 4, 12)])
+        self._check_icon = self._paint_icon("green", [(4, 10, 8, 14), (8, 14, 13, 5)])
+
+        self.queue_model = QueueModel(self._check_icon, self)
+        self.queue_view = QTreeView()
+        self.queue_view.setModel(self.queue_model)
+        self.queue_view.setRootIsDecorated(False)
+        self.queue_view.setItemsExpandable(False)
+        self.queue_view.setUniformRowHeights(True)  # Lets the view skip measuring every row
+        self.queue_view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.queue_view.setAcceptDrops(True)
+        self.queue_view.viewport().setAcceptDrops(True)
+        self.queue_view.setDropIndicatorShown(True)
+        self.queue_view.setDragDropMode(QAbstractItemView.DragDropMode.NoDragDrop)
+        # Right click picks more presets for the selected rows
+        self.queue_view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.queue_view.customContextMenuRequested.connect(self._show_queue_menu)
+        # Set column widths
+        self.queue_view.setColumnWidth(QueueModel.COL_REMOVE, 32)
+        self.queue_view.setColumnWidth(QueueModel.COL_THUMB, 72)
+        self.queue_view.setIconSize(QSize(64, 36))  # Room for the thumbnails
+        self.queue_view.setColumnWidth(QueueModel.COL_FOLDER, 200)
+        self.queue_view.setColumnWidth(QueueModel.COL_TAKE, 60)
+        self.queue_view.setColumnWidth(QueueModel.COL_AUDIO, 150)
+        self.queue_view.setColumnWidth(QueueModel.COL_PREVIEW, 250)
+        self.queue_view.setColumnWidth(QueueModel.COL_STATUS, 120)  # Status / per-job progress
+        self.queue_view.setColumnWidth(QueueModel.COL_FRAMES, 150)
+        self.queue_view.setColumnWidth(QueueModel.COL_FORMAT, 150)  # Resolution / bit depth
+        self.status_delegate = ProgressDelegate(self.queue_view)
+        self.queue_view.setItemDelegateForColumn(QueueModel.COL_STATUS, self.status_delegate)
+        self.action_delegate = QueueActionDelegate(self._remove_icon, self.queue_view)
+        self.action_delegate.remove_clicked.connect(lambda r: self._remove_row(self.queue_model.rows[r]))
+        self.action_delegate.audio_clicked.connect(lambda r: self._browse_audio(self.queue_model.rows[r]))
+        self.action_delegate.remove_audio_clicked.connect(lambda r: self._remove_audio(self.queue_model.rows[r]))
+        self.queue_view.setItemDelegateForColumn(QueueModel.COL_REMOVE, self.action_delegate)
+        self.queue_view.setItemDelegateForColumn(QueueModel.COL_AUDIO, self.action_delegate)
+        self.layout.addWidget(self.queue_view)
 
         # --- Add Clear Queue button here ---
         self.clear_queue_btn = QPushButton("Clear Queue")
@@ -140,8 +705,8 @@ class FFmpegGUI(QWidget):
         self.hwaccel_label = QLabel("Hardware Acceleration:")
         self.layout.addWidget(self.hwaccel_label)
         self.hwaccel_combo = QComboBox()
-        self.hwaccel_combo.addItems(
-            ["Auto-detect", "NVIDIA (h264_nvenc)", "CPU (libx264)"])
+        # Hardware encoders are added once the capability probe has finished
+        self.hwaccel_combo.addItems(["Auto-detect", CPU_H264_LABEL])
         self.layout.addWidget(self.hwaccel_combo)
 
         self.preset_label = QLabel("Encoding Preset:")
@@ -150,18 +715,169 @@ class FFmpegGUI(QWidget):
         self.preset_combo.addItems([
             "Preview MP4 - H.264 25Mbps",
             "ProRes MOV - 422 Proxy",
-            "ProRes MOV - 422 Standard"           
+            "ProRes MOV - 422 Standard",
+            "Proxy MP4 - H.264 1/2",
+            "Proxy MP4 - H.264 1/4",
         ])
         self.layout.addWidget(self.preset_combo)
 
+        self.prores_label = QLabel("ProRes Encoder:")
+        self.layout.addWidget(self.prores_label)
+        self.prores_combo = QComboBox()
+        for encoder in PRORES_ENCODERS:
+            self.prores_combo.addItem(SOFTWARE_ENCODERS[encoder]["label"], encoder)
+        self.prores_combo.setCurrentIndex(PRORES_ENCODERS.index(DEFAULT_PRORES_ENCODER))
+        self.layout.addWidget(self.prores_combo)
+
+        # Proxies can skip frames for quick timing checks
+        self.frame_step_label = QLabel("Proxy Frame Step:")
+        self.layout.addWidget(self.frame_step_label)
+        self.frame_step_spin = QSpinBox()
+        self.frame_step_spin.setRange(1, 12)
+        self.frame_step_spin.setValue(1)
+        self.frame_step_spin.setToolTip("Proxy renders only read every n-th frame and hold it for the others,\n"
+                                        "1 = every frame. Ignored when a folder also renders full size presets.")
+        self.layout.addWidget(self.frame_step_spin)
+
+        self.concurrency_label = QLabel("Parallel Renders:")
+        self.layout.addWidget(self.concurrency_label)
+        self.concurrency_spin = QSpinBox()
+        self.concurrency_spin.setRange(1, os.cpu_count() or 1)
+        self.concurrency_spin.setValue(min(4, os.cpu_count() or 1))
+        self.concurrency_spin.setToolTip("At most this many renders at once. Short jobs start first, and fewer run\n"
+                                         "at once while the CPU or the disk is already busy.")
+        self.layout.addWidget(self.concurrency_spin)
+
+        # Long shots can be split into segments encoded by parallel ffmpeg
+        # processes and joined losslessly, 1 renders each folder in one pass
+        self.chunks_label = QLabel("Segments per Render:")
+        self.layout.addWidget(self.chunks_label)
+        self.chunks_spin = QSpinBox()
+        self.chunks_spin.setRange(1, os.cpu_count() or 1)
+        self.chunks_spin.setValue(1)
+        self.chunks_spin.setToolTip("Split long sequences into this many parts rendered at the same time.\n"
+                                    "Helps ProRes on machines with many cores, 1 = off.")
+        self.layout.addWidget(self.chunks_spin)
+
+        self.input_mode_label = QLabel("Frame Reading:")
+        self.layout.addWidget(self.input_mode_label)
+        self.input_mode_combo = QComboBox()
+        self.input_mode_combo.addItem("ffmpeg reads the frames", INPUT_FILES)
+        self.input_mode_combo.addItem("Prefetch frames in parallel", INPUT_PIPE)
+        self.input_mode_combo.setToolTip("Prefetching reads several frames ahead of the encoder at once,\n"
+                                         "faster for heavy EXR/TIFF sequences on network storage.")
+        self.layout.addWidget(self.input_mode_combo)
+
+        self.force_checkbox = QCheckBox("Re-render unchanged folders")
+        self.force_checkbox.setToolTip("Folders whose frames, audio and settings match their last render are\n"
+                                       "skipped unless this is checked.")
+        self.layout.addWidget(self.force_checkbox)
+
+        # Render jobs run on their own pool so the GUI thread stays responsive
+        self.render_pool = QThreadPool()
+        self._batch_jobs = {}     # job id -> {"row", "name", "fraction", "state"}
+        self._batch_workers = {}  # job id -> RenderWorker, kept alive until finished
+        # Jobs start shortest first, as many as fit the CPU and disk budgets
+        self.scheduler = ResourceScheduler()
+        self._job_costs = {}      # job id -> JobCost of the running batch
+        self._pending_jobs = []   # Job ids not started yet, in the order they start
+        self._cost_worker = None
+        self._batch_failures = []
+
+        # Dropped folders are discovered and probed on their own pool
+        self.ingest_pool = QThreadPool()
+        self.ingest_pool.setMaxThreadCount(4)
+        self._ingest_workers = []
+        # Thumbnails are rendered on their own smaller pool, the probes come first
+        self.thumbnail_pool = QThreadPool()
+        self.thumbnail_pool.setMaxThreadCount(2)
+
         # Place these lines here, after both widgets are created:
         self.task_input.textChanged.connect(self.update_all_previews)
         self.preset_combo.currentIndexChanged.connect(self.update_all_previews)
 
+        # Outputs are checked against their render manifests shortly after the
+        # queue or any setting that ends up in the output changes
+        self._cache_generation = 0
+        self._cache_workers = []
+        self.cache_check_timer = QTimer(self)
+        self.cache_check_timer.setSingleShot(True)
+        self.cache_check_timer.setInterval(500)
+        self.cache_check_timer.timeout.connect(self._check_cache_states)
+        self.output_path.textChanged.connect(self._schedule_cache_check)
+        self.fps_input.textChanged.connect(self._schedule_cache_check)
+        self.fps_input.textChanged.connect(self.queue_model.set_fps)
+        self.hwaccel_combo.currentIndexChanged.connect(self._schedule_cache_check)
+        self.prores_combo.currentIndexChanged.connect(self._schedule_cache_check)
+        self.frame_step_spin.valueChanged.connect(self._schedule_cache_check)
+        self.queue_model.rowsInserted.connect(self._schedule_cache_check)
+        self.queue_model.dataChanged.connect(self._on_queue_data_changed)
+        self.update_all_previews()
+
+        # The queue and the settings are saved to the journal a moment after
+        # they change (and right away when a render finishes), the next launch
+        # restores them and offers to resume an interrupted batch
+        self.journal = QueueJournal()
+        self._restoring = None       # While restoring: queue_key -> journal entry
+        self._batch_resumable = False
+        self._resume_pending = False  # The restored batch wasn't finished, "Resume Batch" is shown
+        self.journal_timer = QTimer(self)
+        self.journal_timer.setSingleShot(True)
+        self.journal_timer.setInterval(1000)
+        self.journal_timer.timeout.connect(self._save_journal)
+        for signal in (self.queue_model.rowsInserted, self.queue_model.rowsRemoved, self.queue_model.modelReset,
+                       self.queue_model.dataChanged, self.task_input.textChanged, self.output_path.textChanged,
+                       self.fps_input.textChanged, self.preset_combo.currentIndexChanged,
+                       self.prores_combo.currentIndexChanged):
+            signal.connect(self._schedule_journal_save)
+
         self.run_btn = QPushButton("Convert All")
         self.run_btn.clicked.connect(self.run_ffmpeg_batch)
         self.layout.addWidget(self.run_btn)
 
+        self.resume_btn = QPushButton("Resume Batch")
+        self.resume_btn.setToolTip("Render the folders the interrupted batch never finished.")
+        self.resume_btn.setVisible(False)
+        self.resume_btn.clicked.connect(lambda: self.run_ffmpeg_batch(resume=True))
+        self.layout.addWidget(self.resume_btn)
+
+        # Watch folders: sequences written below these roots are queued and
+        # rendered with the current settings once they stop growing
+        self.layout.addWidget(QLabel("Watch Folders:"))
+        self.watch_input = QLineEdit()
+        self.watch_input.setPlaceholderText("Folders renders are written to, separated by ;")
+        self.layout.addWidget(self.watch_input)
+        self.watch_btn = QPushButton("Start Watching")
+        self.watch_btn.setCheckable(True)
+        self.watch_btn.toggled.connect(self.toggle_watch)
+        self.layout.addWidget(self.watch_btn)
+        self._watcher = None
+        self._watch_keys = set()  # Folders found by the watcher, waiting for the next batch
+        self.watch_signals = WatchSignals()
+        self.watch_signals.found.connect(self._on_watched_sequence)
+        # Shots finishing together are gathered into one batch
+        self.watch_render_timer = QTimer(self)
+        self.watch_render_timer.setSingleShot(True)
+        self.watch_render_timer.setInterval(2000)
+        self.watch_render_timer.timeout.connect(self._render_watched)
+        self.watch_input.textChanged.connect(self._schedule_journal_save)
+
+        # Render farm: queue the batch on a broker instead of rendering here
+        self.layout.addWidget(QLabel("Render Farm:"))
+        self.farm_url_input = QLineEdit()
+        self.farm_url_input.setPlaceholderText("http://host:port")
+        self.layout.addWidget(self.farm_url_input)
+        self.farm_btn = QPushButton("Submit to Farm")
+        self.farm_btn.clicked.connect(self.submit_to_farm)
+        self.layout.addWidget(self.farm_btn)
+        self._farm_url = None
+        self._farm_batch = None
+        self._farm_jobs = {}       # broker job id -> local job id
+        self._farm_request = None  # FarmRequestWorker in flight, kept alive until finished
+        self.farm_poll_timer = QTimer(self)
+        self.farm_poll_timer.setInterval(2000)
+        self.farm_poll_timer.timeout.connect(self._poll_farm)
+
         # --- Status bar with progress ---
         self.status_widget = QWidget()
         self.status_layout = QVBoxLayout()
@@ -194,21 +910,119 @@ class FFmpegGUI(QWidget):
         self.toggle_output_btn.toggled.connect(self.toggle_ffmpeg_output)
         self.layout.addWidget(self.toggle_output_btn)
 
-        self.ffmpeg_output = QTextEdit()
-        self.ffmpeg_output.setReadOnly(True)
+        # One log per job of the last batch, the combo picks the one shown. The
+        # full logs are on disk, the view only shows each job's in-memory tail.
+        self._job_logs = []
+        self._log_follow = True  # Show each job as it starts until the user picks one
+        self.log_job_combo = QComboBox()
+        self.log_job_combo.setVisible(False)
+        self.log_job_combo.currentIndexChanged.connect(self._show_job_log)
+        self.log_job_combo.activated.connect(self._stop_log_follow)
+        self.layout.addWidget(self.log_job_combo)
+
+        self.log_model = LogModel(self)
+        self.ffmpeg_output = QListView()
+        self.ffmpeg_output.setModel(self.log_model)
+        self.ffmpeg_output.setUniformItemSizes(True)  # Only the visible lines are ever laid out
+        self.ffmpeg_output.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.ffmpeg_output.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.ffmpeg_output.setFont(QFont("Consolas" if sys.platform == "win32" else "Monospace", 9))
         self.ffmpeg_output.setVisible(False)
         self.layout.addWidget(self.ffmpeg_output)
 
+        self.open_log_btn = QPushButton("Open Log File")
+        self.open_log_btn.setVisible(False)
+        self.open_log_btn.clicked.connect(self.open_job_log_file)
+        self.layout.addWidget(self.open_log_btn)
+
+        # The log view pulls new lines from the shown job on a timer instead of
+        # the render threads pushing every line through a signal
+        self.log_refresh_timer = QTimer(self)
+        self.log_refresh_timer.setInterval(250)
+        self.log_refresh_timer.timeout.connect(self._refresh_log_view)
+        self.log_refresh_timer.start()
+
         # --- Show Output Folder button ---
         self.show_output_btn = QPushButton("Show Output Folder")
         self.show_output_btn.setVisible(False)
         self.show_output_btn.clicked.connect(self.open_output_folder)
         self.layout.addWidget(self.show_output_btn)
+
+        # Timings, fps and throughput of the last batch, also saved to the app
+        # data "reports" folder after every batch
+        self._report_jobs = []
+        self._report_seconds = None
+        self._batch_started = 0.0
+        self.save_report_btn = QPushButton("Save Performance Report...")
+        self.save_report_btn.setVisible(False)
+        self.save_report_btn.clicked.connect(self.save_report)
+        self.layout.addWidget(self.save_report_btn)
         # --- End addition ---
 
         self.setLayout(self.layout)
         self.setAcceptDrops(True)
 
+        # Resolve and check the binaries in the background, then probe the
+        # encoders once per session
+        self.capabilities = None
+        self.capability_worker = None
+        self._painted = False
+        self.binary_worker = BinaryCheckWorker()
+        self.binary_worker.signals.finished.connect(self._on_binaries_checked)
+        QThreadPool.globalInstance().start(self.binary_worker)
+
+        self._restore_journal()
+        trace("window built")
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._painted:
+            self._painted = True
+            trace("first paint")
+
+    def _on_binaries_checked(self, ffmpeg, ffprobe, problems):
+        for problem in problems:
+            QMessageBox.critical(self, "Error", problem)
+        self.capability_worker = CapabilityProbeWorker(ffmpeg)
+        self.capability_worker.signals.finished.connect(self._on_capabilities_ready)
+        QThreadPool.globalInstance().start(self.capability_worker)
+
+    # Encoder each preset needs, presets that can't be encoded are disabled
+    PRESET_ENCODERS = {
+        "Preview MP4 - H.264 25Mbps": "libx264",
+        "ProRes MOV - 422 Proxy": "prores",
+        "ProRes MOV - 422 Standard": "prores",
+        "Proxy MP4 - H.264 1/2": "libx264",
+        "Proxy MP4 - H.264 1/4": "libx264",
+    }
+
+    def _on_capabilities_ready(self, capabilities):
+        trace("encoders probed")
+        self.capabilities = capabilities
+        current = self.hwaccel_combo.currentText()
+        self.hwaccel_combo.clear()
+        self.hwaccel_combo.addItem("Auto-detect")
+        for encoder in capabilities.hw_h264_encoders():
+            self.hwaccel_combo.addItem(HW_ENCODERS[encoder]["label"])
+        self.hwaccel_combo.addItem(CPU_H264_LABEL)
+        index = self.hwaccel_combo.findText(current)
+        self.hwaccel_combo.setCurrentIndex(max(index, 0))
+
+        if not capabilities.encoders:
+            return  # Probe failed, leave every preset selectable
+        preset_model = self.preset_combo.model()
+        for i in range(self.preset_combo.count()):
+            encoder = self.PRESET_ENCODERS.get(self.preset_combo.itemText(i))
+            enabled = encoder is None or capabilities.has(encoder)
+            if PRESETS.get(self.preset_combo.itemText(i), {}).get("codec") == "h264":
+                enabled = enabled or bool(capabilities.hw_h264_encoders())
+            elif encoder == "prores":
+                enabled = any(capabilities.has(e) for e in PRORES_ENCODERS)
+            preset_model.item(i).setEnabled(enabled)
+        prores_model = self.prores_combo.model()
+        for i, encoder in enumerate(PRORES_ENCODERS):
+            prores_model.item(i).setEnabled(capabilities.has(encoder))
+
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
             event.acceptProposedAction()
@@ -217,80 +1031,230 @@ class FFmpegGUI(QWidget):
         event.acceptProposedAction()
 
     def dropEvent(self, event):
-        for url in event.mimeData().urls():
-            file = url.toLocalFile()
-            if os.path.isdir(file):
-                folder_name = os.path.basename(os.path.normpath(file))
-                existing_paths = [self.input_tree.topLevelItem(i).data(0, Qt.ItemDataRole.UserRole) for i in range(self.input_tree.topLevelItemCount())]
-                if file not in existing_paths:
-                    item = QTreeWidgetItem(["", folder_name, "tk01", "No audio", ""])
-                    item.setFlags(item.flags() | Qt.ItemFlag.ItemIsDropEnabled | Qt.ItemFlag.ItemIsEditable)
-                    item.setData(1, Qt.ItemDataRole.UserRole, file)
-                    item.setData(2, Qt.ItemDataRole.UserRole, "tk01")  # Take number
-                    item.setData(3, Qt.ItemDataRole.UserRole, None)    # Audio
-                    self.input_tree.addTopLevelItem(item)
-                    self._set_remove_button(item)
-                    self._set_audio_button(item)
-                    self._update_preview_filename(item)
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        if paths:
+            worker = IngestWorker(paths)
+            worker.signals.found.connect(self._on_sequence_found)
+            worker.signals.finished.connect(lambda rejected, w=worker: self._on_ingest_finished(w, rejected))
+            self._ingest_workers.append(worker)
+            if not self._batch_jobs:
+                self.status_label.setText("Scanning dropped folders...")
+            self.ingest_pool.start(worker)
         event.accept()
 
-    def _set_remove_button(self, item):
-        remove_btn = QPushButton()
-        remove_btn.setFixedSize(QSize(20, 20))
-        remove_btn.setStyleSheet(
-            "QPushButton { border: none; background: transparent; }")
-        pixmap = QPixmap(16, 16)
-        pixmap.fill(Qt.GlobalColor.transparent)
-        painter = QPainter(pixmap)
-        painter.setPen(QColor("red"))
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        painter.drawLine(4, 4, 12, 12)
-        painter.drawLine(12, 4, 4, 12)
-        painter.end()
-        remove_btn.setIcon(QIcon(pixmap))
-        remove_btn.setIconSize(QSize(16, 16))
-        remove_btn.clicked.connect(lambda: self._remove_item(item))
-        self.input_tree.setItemWidget(item, 0, remove_btn)
-
-    def _set_audio_button(self, item):
-        item.setText(3, "")           # Clear text
-        item.setForeground(3, QColor())  # Clear color
-        btn = QPushButton("Add Audio")
-        btn.setFixedSize(QSize(90, 22))
-        btn.clicked.connect(lambda: self._browse_audio(item))
-        self.input_tree.setItemWidget(item, 3, btn)
-
-    def _set_remove_audio_button(self, item, filename):
-        # Clear text and foreground before adding widget
-        item.setText(3, "")
-        item.setForeground(3, QColor())
-        widget = QWidget()
-        layout = QHBoxLayout()
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.setSpacing(4)
-        label = QLabel(filename)
-        label.setStyleSheet("color: green;")
-        layout.addWidget(label)
-        btn = QPushButton()
-        btn.setFixedSize(QSize(22, 22))
-        btn.setStyleSheet("QPushButton { border: none; background: transparent; }")
+    def _on_sequence_found(self, folder, sequences):
+        if self.queue_model.contains(queue_key(folder)):
+            return
+        row = QueueRow(folder, sequences)
+        self.queue_model.add_row(row)
+
+        sequence = sequences[0]
+        probe = FrameProbeWorker(ffprobe_path(), row.key, sequence.path(sequence.first))
+        probe.signals.finished.connect(self._on_frame_probed)
+        self._ingest_workers.append(probe)
+        probe.signals.finished.connect(lambda *args, w=probe: self._ingest_workers.remove(w))
+        self.ingest_pool.start(probe)
+        self._load_thumbnail(row)
+
+    def _load_thumbnail(self, row):
+        worker = ThumbnailWorker(ffmpeg_path(), row.key, row.sequences[0])
+        worker.signals.finished.connect(self._on_thumbnail_ready)
+        self._ingest_workers.append(worker)
+        worker.signals.finished.connect(lambda *args, w=worker: self._ingest_workers.remove(w))
+        self.thumbnail_pool.start(worker)
+
+    def _on_thumbnail_ready(self, key, path):
+        row = self.queue_model.row_for_key(key)
+        if row is None or not path:
+            return
+        sheet = QPixmap(path)
+        if sheet.isNull():
+            return
+        # The queue shows the middle frame, the tooltip the whole sheet
+        panes = len(sample_frames(row.sequences[0]))
+        width = sheet.width() // panes
+        row.thumbnail = QIcon(sheet.copy(width * (panes // 2), 0, width, sheet.height()))
+        row.thumbnail_path = path
+        self.queue_model.row_changed(row, QueueModel.COL_THUMB)
+
+    def _restore_journal(self):
+        journal = self.journal.load()
+        if journal is None:
+            return
+        self._restoring = {}  # No saves until the restored queue is complete
+        settings = journal["settings"]
+        self.output_path.setText(settings.get("output_dir", ""))
+        self.watch_input.setText(settings.get("watch_roots", ""))
+        self.task_input.setText(settings.get("task_code", ""))
+        self.fps_input.setText(settings.get("fps") or "24")
+        self.preset_combo.setCurrentIndex(max(self.preset_combo.findText(settings.get("preset", "")), 0))
+        index = self.prores_combo.findData(settings.get("prores_encoder"))
+        if index >= 0:
+            self.prores_combo.setCurrentIndex(index)
+        if not journal["jobs"]:
+            self._restoring = None
+            return
+        self._restoring = {queue_key(job["folder"]): job for job in journal["jobs"]}
+        self._resume_pending = journal["batch_running"]
+        worker = IngestWorker([job["folder"] for job in journal["jobs"]])
+        worker.signals.found.connect(self._on_restored_sequence)
+        worker.signals.finished.connect(lambda rejected, w=worker: self._on_restore_finished(w, rejected))
+        self._ingest_workers.append(worker)
+        self.status_label.setText("Restoring the last queue...")
+        self.ingest_pool.start(worker)
+
+    def _on_restored_sequence(self, folder, sequences):
+        # Only the folders that were queued, not new subfolders found next to them
+        entry = self._restoring.get(queue_key(folder))
+        if entry is None or self.queue_model.contains(queue_key(folder)):
+            return
+        self._on_sequence_found(folder, sequences)
+        row = self.queue_model.row_for_key(queue_key(folder))
+        row.take = entry.get("take") or row.take
+        presets = [self.preset_combo.itemText(i) for i in range(self.preset_combo.count())]
+        row.extra_presets = [p for p in entry.get("extra_presets") or [] if p in presets]
+        if entry.get("audio") and os.path.isfile(entry["audio"]):
+            self._set_audio_source(row, entry["audio"])
+            row.audio_name = entry.get("audio_name") or os.path.basename(entry["audio"])
+        row.batch_state = entry.get("state")
+        if row.batch_state == DONE:
+            row.done = True
+        elif row.batch_state == PENDING:
+            row.status = "Interrupted"
+        elif row.batch_state == FAILED:
+            row.status = "Failed"
+        self.queue_model.row_changed(row)
+
+    def _on_restore_finished(self, worker, rejected):
+        self._restoring = None
+        self._on_ingest_finished(worker, rejected)
+        if rejected:
+            self.status_label.setText(f"No longer found, removed from the queue: {', '.join(rejected)}")
+        self._resume_pending = self._resume_pending and any(
+            row.batch_state == PENDING for row in self.queue_model.rows)
+        self.resume_btn.setVisible(self._resume_pending)
+        self._save_journal()
+
+    def _schedule_journal_save(self, *args):
+        # Progress repaints change the model all the time while rendering,
+        # saving at most once per interval is enough
+        if not self.journal_timer.isActive():
+            self.journal_timer.start()
+
+    def _save_journal(self):
+        if self._restoring is not None:
+            return
+        jobs = [{
+            "folder": row.folder,
+            "take": row.take,
+            "audio": row.audio_path,
+            "audio_name": row.audio_name,
+            "extra_presets": list(row.extra_presets),
+            "state": row.batch_state,
+        } for row in self.queue_model.rows]
+        settings = {
+            "output_dir": self.output_path.text(),
+            "task_code": self.task_input.text().strip(),
+            "preset": self.preset_combo.currentText(),
+            "fps": self.fps_input.text(),
+            "prores_encoder": self.prores_combo.currentData(),
+            "watch_roots": self.watch_input.text(),
+        }
+        running = bool(self._batch_jobs) and self._batch_resumable
+        self.journal.save(jobs, settings, running or self._resume_pending)
+
+    def closeEvent(self, event):
+        # A batch still rendering stays resumable from its unfinished jobs
+        self.journal_timer.stop()
+        self._save_journal()
+        if self._watcher is not None:
+            self._watcher.stop()
+        super().closeEvent(event)
+
+    def toggle_watch(self, checked):
+        if not checked:
+            if self._watcher is not None:
+                self._watcher.stop()
+                self._watcher = None
+            self.watch_btn.setText("Start Watching")
+            self.watch_input.setEnabled(True)
+            return
+        roots = [root.strip() for root in self.watch_input.text().split(";") if root.strip()]
+        missing = [root for root in roots if not os.path.isdir(root)]
+        if not roots:
+            error = "Enter the folders to watch."
+        elif missing:
+            error = f"Not a folder: {', '.join(missing)}"
+        elif not os.path.isdir(self.output_path.text()):
+            error = "Invalid output folder."
+        else:
+            error = None
+        if error:
+            QMessageBox.critical(self, "Error", error)
+            self.watch_btn.setChecked(False)
+            return
+        from alchemist.watch import FolderWatcher
+        self._watcher = FolderWatcher(roots, self.watch_signals.found.emit)
+        mode = self._watcher.start()
+        self.watch_btn.setText("Stop Watching")
+        self.watch_input.setEnabled(False)
+        if not self._batch_jobs:
+            self.status_label.setText(f"Watching {len(roots)} folder{'s' if len(roots) > 1 else ''} ({mode})")
+
+    def _on_watched_sequence(self, folder, sequences):
+        if self._watcher is None:
+            return  # Stopped while this was on its way
+        row = self.queue_model.row_for_key(queue_key(folder))
+        if row is None:
+            self._on_sequence_found(folder, sequences)
+            row = self.queue_model.row_for_key(queue_key(folder))
+        else:
+            # Written again (a new version of the comp), render it again
+            row.sequences = sequences
+            row.done = False
+            self._load_thumbnail(row)
+        self._set_row_status(row, "Detected", None)
+        self.queue_model.row_changed(row)
+        self._watch_keys.add(row.key)
+        if not self._batch_jobs:
+            self.watch_render_timer.start()
+
+    def _render_watched(self):
+        if self._batch_jobs or not self._watch_keys:
+            return  # Picked up again when the running batch finishes
+        keys, self._watch_keys = self._watch_keys, set()
+        self.run_ffmpeg_batch(only=keys)
+
+    def _on_frame_probed(self, key, info):
+        row = self.queue_model.row_for_key(key)
+        if row is None or not info:
+            return
+        row.format = f"{info['width']}x{info['height']} {info['bit_depth']}"
+        row.pix_fmt = info["pix_fmt"] or ""
+        self.queue_model.row_changed(row, QueueModel.COL_FORMAT)
+
+    def _on_ingest_finished(self, worker, rejected):
+        self._ingest_workers.remove(worker)
+        if self._batch_jobs:
+            return  # Keep the render status visible
+        if rejected:
+            self.status_label.setText(f"No image sequence found in: {', '.join(rejected)}")
+        else:
+            self.status_label.setText("")
+
+    def _paint_icon(self, color, lines):
         pixmap = QPixmap(16, 16)
         pixmap.fill(Qt.GlobalColor.transparent)
         painter = QPainter(pixmap)
-        painter.setPen(QColor("red"))
+        painter.setPen(QColor(color))
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        painter.drawLine(4, 4, 12, 12)
-        painter.drawLine(12, 4, 4, 12)
+        for line in lines:
+            painter.drawLine(*line)
         painter.end()
-        btn.setIcon(QIcon(pixmap))
-        btn.setIconSize(QSize(16, 16))
-        btn.clicked.connect(lambda: self._remove_audio(item))
-        layout.addWidget(btn)
-        widget.setLayout(layout)
-        self.input_tree.setItemWidget(item, 3, widget)
-
-    def _browse_audio(self, item):
-        image_folder = item.data(1, Qt.ItemDataRole.UserRole)
+        return QIcon(pixmap)
+
+    def _browse_audio(self, row):
+        image_folder = row.folder
         if image_folder:
             start_dir = os.path.dirname(image_folder)
         else:
@@ -300,8 +1264,7 @@ class FFmpegGUI(QWidget):
             self, "Select Audio/Video File", start_dir,
             "Audio/Video Files (*.wav *.mp3 *.aac *.flac *.m4a *.ogg *.mp4 *.mov *.mkv *.avi *.webm *.m4v)", options=options)
         if file:
-            has_audio = self._audio_file_has_audio(file)
-            item.setData(3, Qt.ItemDataRole.UserRole, file if has_audio else None)
+            self._set_audio_source(row, file)
             filename = os.path.basename(file)
             # 2 & 3. Extract and format take number
             take_match = re.search(r'tk(\d{2})', filename, re.IGNORECASE)
@@ -315,65 +1278,106 @@ class FFmpegGUI(QWidget):
                     take_number = f"tk{int(take_number):02d}"
                 else:
                     take_number = "tk01"
-            item.setText(2, take_number)
-            item.setData(2, Qt.ItemDataRole.UserRole, take_number)
-            if has_audio:
-                item.setText(3, filename)
-                item.setForeground(3, QColor("green"))
-            else:
-                item.setText(3, filename)
-                item.setForeground(3, QColor("red"))
-            self._set_remove_audio_button(item, filename)
-            self._update_preview_filename(item)
-
-    def _update_preview_filename(self, item):
-        # Get current values
-        folder_name = item.text(1)
-        take_number = item.text(2)
-        task_code = self.task_input.text().strip() or "TASK"
-        # Guess extension based on preset (optional: you can improve this)
-        preset = self.preset_combo.currentText() if hasattr(self, 'preset_combo') else ""
-        if "mov" in preset.lower():
-            ext = "mov"
-        else:
-            ext = "mp4"
-        preview = f"{folder_name}_{take_number}_{task_code}.{ext}"
-        item.setText(4, preview)
+            row.take = take_number
+            row.audio_name = filename
+            self.queue_model.row_changed(row)
+
+    def _set_audio_source(self, row, file):
+        # The audio only counts once a probe found an audio stream in it, an
+        # unchanged file is answered from the media info cache right away
+        info = media_cache().cached(file)
+        row.audio_path = file
+        row.audio_info = info
+        row.audio = file if info and info["has_audio"] else None
+        if info is not None:
+            return
+        probe = MediaProbeWorker(row.key, file)
+        probe.signals.finished.connect(self._on_audio_probed)
+        self._ingest_workers.append(probe)
+        probe.signals.finished.connect(lambda *args, w=probe: self._ingest_workers.remove(w))
+        self.ingest_pool.start(probe)
+
+    def _on_audio_probed(self, key, file, info):
+        row = self.queue_model.row_for_key(key)
+        if row is None or row.audio_path != file:
+            return  # Removed or replaced while probing
+        row.audio_info = info or {"streams": [], "duration": None, "has_audio": False}
+        row.audio = file if row.audio_info["has_audio"] else None
+        self.queue_model.row_changed(row, QueueModel.COL_AUDIO)
+
+    def _remove_audio(self, row):
+        row.audio = None
+        row.audio_name = None
+        row.audio_path = None
+        row.audio_info = None
+        self.queue_model.row_changed(row, QueueModel.COL_AUDIO)
+
+    def _show_queue_menu(self, pos):
+        index = self.queue_view.indexAt(pos)
+        if not index.isValid():
+            return
+        selected = {i.row() for i in self.queue_view.selectionModel().selectedRows()}
+        positions = selected if index.row() in selected else {index.row()}
+        rows = [self.queue_model.rows[p] for p in sorted(positions)]
+        main_preset = self.preset_combo.currentText()
+        menu = QMenu(self)
+        menu.addSection("Also render as")
+        for i in range(self.preset_combo.count()):
+            preset = self.preset_combo.itemText(i)
+            if preset == main_preset:
+                continue
+            action = menu.addAction(preset)
+            action.setCheckable(True)
+            action.setChecked(all(preset in row.extra_presets for row in rows))
+            action.toggled.connect(lambda checked, p=preset: self._set_extra_preset(rows, p, checked))
+        menu.exec(self.queue_view.viewport().mapToGlobal(pos))
+
+    def _set_extra_preset(self, rows, preset, enabled):
+        for row in rows:
+            if enabled and preset not in row.extra_presets:
+                row.extra_presets.append(preset)
+            elif not enabled and preset in row.extra_presets:
+                row.extra_presets.remove(preset)
+            self.queue_model.row_changed(row, QueueModel.COL_PREVIEW)
+        self._schedule_cache_check()
+
+    def _remove_row(self, row):
+        self.queue_model.remove_row(row)
 
-    # Optionally, update preview for all rows when task code or preset changes:
     def update_all_previews(self):
-        for i in range(self.input_tree.topLevelItemCount()):
-            self._update_preview_filename(self.input_tree.topLevelItem(i))
-
-    # Call this after task code or preset changes:
-    # self.task_input.textChanged.connect(self.update_all_previews)
-    # self.preset_combo.currentIndexChanged.connect(self.update_all_previews)
-
-    def _remove_audio(self, item):
-        item.setData(3, Qt.ItemDataRole.UserRole, None)
-        item.setText(3, "No audio")
-        item.setForeground(3, QColor())
-        self._set_audio_button(item)
-
-    def _remove_item(self, item):
-        idx = self.input_tree.indexOfTopLevelItem(item)
-        if idx != -1:
-            self.input_tree.takeTopLevelItem(idx)
-
-    def _on_item_changed(self, item, column):
-        # Ensure take number is always formatted as tkXX
-        if column == 2:
-            text = item.text(2)
-            match = re.match(r'tk?(\d{1,2})', text, re.IGNORECASE)
-            if match:
-                num = int(match.group(1))
-                formatted = f"tk{num:02d}"
-                item.setText(2, formatted)
-                item.setData(2, Qt.ItemDataRole.UserRole, formatted)
-            else:
-                item.setText(2, "tk01")
-                item.setData(2, Qt.ItemDataRole.UserRole, "tk01")
-        self._update_preview_filename(item)
+        self.queue_model.set_naming(self.task_input.text().strip(), self.preset_combo.currentText())
+        self._schedule_cache_check()
+
+    def _on_queue_data_changed(self, top_left, bottom_right):
+        # Take and audio edits change the output (status updates don't)
+        if top_left.column() <= QueueModel.COL_AUDIO and bottom_right.column() >= QueueModel.COL_TAKE:
+            self._schedule_cache_check()
+
+    def _schedule_cache_check(self, *args):
+        self.cache_check_timer.start()
+
+    def _check_cache_states(self):
+        if self._batch_jobs:
+            return  # Finished jobs report their own state
+        self._cache_generation += 1
+        jobs = self._collect_jobs(quiet=True) or []
+        if not jobs:
+            for row in self.queue_model.rows:
+                row.cache_state = None
+                self.queue_model.row_changed(row, QueueModel.COL_STATUS)
+            return
+        worker = CacheCheckWorker(self._cache_generation, [(row.key, job) for row, job in jobs], ffmpeg_path())
+        worker.signals.checked.connect(self._on_cache_checked)
+        self._cache_workers.append(worker)
+        worker.signals.finished.connect(lambda w=worker: self._cache_workers.remove(w))
+        self.ingest_pool.start(worker)
+
+    def _on_cache_checked(self, generation, key, state):
+        row = self.queue_model.row_for_key(key)
+        if generation != self._cache_generation or row is None:
+            return  # Settings changed again since this check started
+        row.cache_state = state
+        self.queue_model.row_changed(row, QueueModel.COL_STATUS)
 
     def browse_output(self):
         options = QFileDialog.Option.DontUseNativeDialog
@@ -383,23 +1387,14 @@ class FFmpegGUI(QWidget):
             self.output_path.setText(folder)
 
     def clear_queue(self):
-        self.input_tree.clear()
+        self.queue_model.clear()
+        self._resume_pending = False
+        self.resume_btn.setVisible(False)
 
-    def _audio_file_has_audio(self, file):
-        try:
-            result = subprocess.run(
-                [ffprobe_path(), "-v", "error", "-select_streams", "a",
-                    "-show_entries", "stream=codec_type", "-of", "csv=p=0", file],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                creationflags=CREATE_NO_WINDOW
-            )
-            return "audio" in result.stdout
-        except Exception:
-            return False
 
-    def run_ffmpeg_batch(self):
+    def _collect_jobs(self, quiet=False):
+        # [(QueueRow, RenderJob)] for the current queue and settings, None after
+        # telling the user what is missing (unless quiet)
         output_dir = self.output_path.text()
         fps = self.fps_input.text()
         hwaccel = self.hwaccel_combo.currentText()
@@ -407,51 +1402,348 @@ class FFmpegGUI(QWidget):
         task_code = self.task_input.text().strip()
 
         if not os.path.isdir(output_dir):
-            QMessageBox.critical(self, "Error", "Invalid output folder.")
+            if not quiet:
+                QMessageBox.critical(self, "Error", "Invalid output folder.")
             return
 
-        items = [self.input_tree.topLevelItem(i) for i in range(self.input_tree.topLevelItemCount())]
-        if not items:
-            QMessageBox.critical(self, "Error", "No input folders selected.")
+        rows = list(self.queue_model.rows)
+        if not rows:
+            if not quiet:
+                QMessageBox.critical(self, "Error", "No input folders selected.")
+            return
+        chunks = self.chunks_spin.value()
+        force = self.force_checkbox.isChecked()
+        input_mode = self.input_mode_combo.currentData()
+        return [(row, RenderJob(row.folder, output_dir, fps, preset, hwaccel, row.audio, row.take, task_code,
+                                chunks, force, input_mode=input_mode,
+                                extra_presets=self.queue_model.presets_for(row)[1:],
+                                prores_encoder=self.prores_combo.currentData(),
+                                frame_step=self.frame_step_spin.value()))
+                for row in rows]
+
+    def _start_batch(self, jobs):
+        # Resets the queue's status columns and the batch bookkeeping for jobs
+        for job_log in self._job_logs:
+            job_log.close()
+        # Log files are only opened while their job runs, the old ones are pruned once up front
+        prune_logs()
+        self._job_logs = [JobLog(row.name, open_file=False) for row, _ in jobs]
+        self._log_follow = True
+        self.log_job_combo.blockSignals(True)
+        self.log_job_combo.clear()
+        self.log_job_combo.addItems([row.name for row, _ in jobs])
+        self.log_job_combo.blockSignals(False)
+        self._show_job_log(0)
+        self.progress_bar.setMaximum(1000)
+        self.progress_bar.setValue(0)
+        self.show_output_btn.setVisible(False)
+        self.save_report_btn.setVisible(False)
+        self._batch_started = time.monotonic()
+        self.run_btn.setEnabled(False)
+        self.farm_btn.setEnabled(False)
+        self.clear_queue_btn.setEnabled(False)
+        self.resume_btn.setVisible(False)
+        self._resume_pending = False
+        self._batch_failures = []
+        for job_id, (row, job) in enumerate(jobs):
+            mismatch = self.queue_model.audio_mismatch(row)
+            if mismatch:
+                self._job_logs[job_id].append(f"Warning: {mismatch}")
+            row.done = False
+            row.error = ""
+            self._set_row_status(row, "Queued", 0.0)
+            self._batch_jobs[job_id] = {
+                "row": row,
+                "name": row.name,
+                "fraction": 0.0,
+                "frames": row.sequences[0].length,
+                "state": "queued",
+                "metrics": JobMetrics(row.name, row.folder),
+                "job": job,
+            }
+            row.batch_state = PENDING
+        self._save_journal()
+
+    def run_ffmpeg_batch(self, resume=False, only=None):
+        # only: queue keys of the rows to render (watched folders), all rows if None
+        if self._batch_jobs:
+            return  # A batch is already rendering
+        jobs = self._collect_jobs()
+        if not jobs:
+            return
+        if only is not None:
+            jobs = [(row, job) for row, job in jobs if row.key in only]
+            if not jobs:
+                return
+        if resume:
+            # Finished folders keep their state, a second interruption resumes
+            # from the jobs still left
+            jobs = [(row, job) for row, job in jobs if row.batch_state == PENDING]
+            if not jobs:
+                self.resume_btn.setVisible(False)
+                self._resume_pending = False
+                return
+
+        self._batch_resumable = True
+        self._start_batch(jobs)
+        self.render_pool.setMaxThreadCount(self.concurrency_spin.value())
+        self.scheduler.max_jobs = self.concurrency_spin.value()
+        self.status_label.setText("Estimating render costs...")
+        self._cost_worker = CostEstimateWorker(dict(enumerate(job for _, job in jobs)), ffmpeg_path(),
+                                               self.scheduler.cpu_threads)
+        self._cost_worker.signals.finished.connect(self._on_costs_estimated)
+        self.ingest_pool.start(self._cost_worker)
+
+    def _on_costs_estimated(self, costs):
+        self._cost_worker = None
+        self._job_costs = costs
+        self._pending_jobs = self.scheduler.order(costs)
+        self._start_admitted_jobs()
+        self._update_batch_status()
+
+    def _start_admitted_jobs(self):
+        for job_id in self.scheduler.admit(self._pending_jobs, self._job_costs, list(self._batch_workers)):
+            self._pending_jobs.remove(job_id)
+            job = self._batch_jobs[job_id]["job"]
+            if not job.threads:
+                job.threads = self.scheduler.threads_for(self._job_costs[job_id])
+            worker = RenderWorker(job_id, job, self._job_logs[job_id], self._batch_jobs[job_id]["metrics"])
+            worker.signals.started.connect(self._on_job_started)
+            worker.signals.progress.connect(self._on_job_progress)
+            worker.signals.finished.connect(self._on_job_finished)
+            self._batch_workers[job_id] = worker
+            self.render_pool.start(worker)
+
+    def submit_to_farm(self):
+        if self._batch_jobs:
+            return  # A batch is already rendering
+        url = self.farm_url_input.text().strip()
+        if not url:
+            QMessageBox.critical(self, "Error", "Enter the render farm broker address.")
+            return
+        if "://" not in url:
+            url = "http://" + url
+        jobs = self._collect_jobs()
+        if not jobs:
+            return
+        from alchemist import farm
+
+        # The broker keeps farm batches, there is nothing to resume locally
+        self._batch_resumable = False
+        self._start_batch(jobs)
+        self._farm_url = url
+        self.status_label.setText(f"Submitting {len(jobs)} jobs to {url}...")
+        self._farm_request = FarmRequestWorker(farm.submit_batch, url, [job for _, job in jobs])
+        self._farm_request.signals.finished.connect(self._on_farm_submitted)
+        self.ingest_pool.start(self._farm_request)
+
+    def _on_farm_submitted(self, reply, error_msg):
+        self._farm_request = None
+        if reply is None:
+            for job in self._batch_jobs.values():
+                job["state"] = "failed"
+                self._set_row_status(job["row"], "Not submitted", None)
+            self._batch_failures = [("Render farm", error_msg)]
+            self._finish_batch()
             return
+        self._farm_batch = reply["batch"]
+        self._farm_jobs = dict(zip(reply["jobs"], sorted(self._batch_jobs)))
+        self.farm_poll_timer.start()
+
+    def _poll_farm(self):
+        if self._farm_request is not None:
+            return  # Slow broker, wait for the previous poll
+        from alchemist import farm
+        self._farm_request = FarmRequestWorker(farm.batch_status, self._farm_url, self._farm_batch)
+        self._farm_request.signals.finished.connect(self._on_farm_status)
+        self.ingest_pool.start(self._farm_request)
+
+    def _on_farm_status(self, reply, error_msg):
+        from alchemist import farm
+        self._farm_request = None
+        if reply is None:
+            self.status_label.setText(f"Render farm not reachable, retrying: {error_msg}")
+            return
+        # Broker states are mapped onto the same handlers the local render pool uses
+        for farm_job in reply["jobs"]:
+            job_id = self._farm_jobs.get(farm_job["id"])
+            job = self._batch_jobs.get(job_id)
+            if job is None or job["state"] in ("done", "failed"):
+                continue
+            job_log = self._job_logs[job_id]
+            if farm_job["state"] == farm.LEASED:
+                if job["state"] != "running":
+                    job_log.open()
+                    job_log.append(f"Rendering on {farm_job['worker']} (attempt {farm_job['attempts']})")
+                    self._on_job_started(job_id)
+                if farm_job["total"]:
+                    self._on_job_progress(job_id, farm_job["frame"], farm_job["total"])
+            elif farm_job["state"] == farm.QUEUED and job["state"] == "running":
+                # Requeued after a failed attempt or a lost worker
+                job["state"] = "queued"
+                job_log.append(f"Attempt {farm_job['attempts']} failed, requeued: {farm_job['error'] or ''}")
+                self._set_row_status(job["row"], f"Retrying (attempt {farm_job['attempts'] + 1})", 0.0)
+            elif farm_job["state"] in (farm.DONE, farm.FAILED):
+                job_log.append(f"{farm_job['state'].capitalize()} on {farm_job['worker'] or 'farm'}: "
+                               f"{farm_job['output'] if farm_job['state'] == farm.DONE else farm_job['error']}")
+                self._on_job_finished(job_id, farm_job["state"] == farm.DONE, farm_job["error"] or "")
+                if not self._batch_jobs:
+                    return  # _finish_batch() ran
+
+    def _set_row_status(self, row, text, fraction):
+        row.status = text
+        row.progress = fraction
+        self.queue_model.row_changed(row, QueueModel.COL_STATUS)
+
+    def _on_job_started(self, job_id):
+        job = self._batch_jobs[job_id]
+        job["state"] = "running"
+        self._set_row_status(job["row"], "Running", 0.0)
+        self._update_batch_status()
+        if self._log_follow:
+            self.log_job_combo.setCurrentIndex(job_id)
+
+    def _on_job_progress(self, job_id, frame, total):
+        job = self._batch_jobs[job_id]
+        job["fraction"] = min(frame, total) / total if total else 0.0
+        text = f"{frame}/{total}"
+        metrics = job["metrics"]
+        fps = metrics.fps() if metrics.encode_started is not None else None
+        if fps and frame < total:
+            # Farm jobs are timed on the worker, they only show frames
+            text += f"  {fps:.0f} fps  ETA {format_duration(metrics.eta())}"
+        self._set_row_status(job["row"], text, job["fraction"])
+        self._update_batch_status()
+
+    def _show_job_log(self, index):
+        self.log_model.set_log(self._job_logs[index] if 0 <= index < len(self._job_logs) else None)
+        self.ffmpeg_output.scrollToBottom()
+
+    def _stop_log_follow(self, index):
+        self._log_follow = False
+
+    def _refresh_log_view(self):
+        if not self.ffmpeg_output.isVisible():
+            return
+        scrollbar = self.ffmpeg_output.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum()
+        if self.log_model.refresh() and at_bottom:
+            self.ffmpeg_output.scrollToBottom()
+
+    def open_job_log_file(self):
+        job_log = self.log_model.job_log
+        if job_log is None or not job_log.path:
+            QMessageBox.warning(self, "Warning", "No log file for this job.")
+            return
+        job_log.flush()
+        QDesktopServices.openUrl(QUrl.fromLocalFile(job_log.path))
+
+    def _on_job_finished(self, job_id, success, error_msg, skipped=False):
+        job = self._batch_jobs[job_id]
+        self._job_logs[job_id].close()
+        job["fraction"] = 1.0
+        if success:
+            job["state"] = "done"
+            job["skipped"] = skipped
+            job["row"].cache_state = rendercache.UP_TO_DATE
+            self._set_row_status(job["row"], "Up to date" if skipped else "Done", None)
+            self.set_row_checkmark(job["row"])
+        else:
+            job["state"] = "failed"
+            job["row"].error = error_msg
+            self._set_row_status(job["row"], "Failed", None)
+            self._batch_failures.append((job["name"], error_msg))
+        job["row"].batch_state = DONE if success else FAILED
+        self._batch_workers.pop(job_id, None)
+        if self._pending_jobs:
+            self._start_admitted_jobs()
+        self._update_batch_status()
+        if all(j["state"] in ("done", "failed") for j in self._batch_jobs.values()):
+            self._finish_batch()
+        else:
+            self._save_journal()
 
-        for item in items:
-            folder = item.data(1, Qt.ItemDataRole.UserRole)
-            audio_file = item.data(3, Qt.ItemDataRole.UserRole)
-            take_number = item.data(2, Qt.ItemDataRole.UserRole)
-            self.status_label.setText(f"Rendering: {folder}")
-            QApplication.processEvents()
-            success, error_msg = self.run_ffmpeg(folder, output_dir, fps, hwaccel, preset, audio_file, take_number, task_code)
-            if success:
-                self.set_item_checkmark(item)
-            else:
-                folder_name = os.path.basename(folder)
-                QMessageBox.critical(self, "Error", f"Failed rendering: {folder_name}\n\nError:\n{error_msg}")
-                self.status_label.setText(f"Error rendering: {folder_name}")
-                return  # Abort further operations
-        self.status_label.setText("All renders finished.")
+    def _update_batch_status(self):
+        jobs = self._batch_jobs.values()
+        if not jobs:
+            return
+        finished = sum(1 for j in jobs if j["state"] in ("done", "failed"))
+        running = sum(1 for j in jobs if j["state"] == "running")
+        self.progress_bar.setValue(int(sum(j["fraction"] for j in jobs) / len(jobs) * 1000))
+        text = f"Rendering: {finished}/{len(jobs)} finished, {running} running"
+        if self._batch_failures:
+            text += f", {len(self._batch_failures)} failed"
+        # Batch ETA from the frames done so far, weighted by each job's length
+        done = sum(j["fraction"] * j["frames"] for j in jobs)
+        eta = estimate_eta(done, sum(j["frames"] for j in jobs), time.monotonic() - self._batch_started)
+        if eta:
+            text += f", ETA {format_duration(eta)}"
+        self.status_label.setText(text)
+
+    def _finish_batch(self):
+        for job_log in self._job_logs:
+            job_log.flush()
+        total = len(self._batch_jobs)
+        skipped = sum(1 for j in self._batch_jobs.values() if j.get("skipped"))
+        self._write_batch_report()
+        self._batch_jobs = {}
+        self._save_journal()
+        self.farm_poll_timer.stop()
+        self._farm_jobs = {}
+        self.run_btn.setEnabled(True)
+        self.farm_btn.setEnabled(True)
+        self.clear_queue_btn.setEnabled(True)
+        self.progress_bar.setValue(self.progress_bar.maximum())
         self.show_output_btn.setVisible(True)
+        if self._batch_failures:
+            self.status_label.setText(f"Renders finished with errors: {len(self._batch_failures)} of {total} failed.")
+            details = "\n\n".join(f"{name}:\n{error_msg}" for name, error_msg in self._batch_failures)
+            QMessageBox.critical(self, "Error", f"Failed rendering {len(self._batch_failures)} of {total} folders.\n\n{details}")
+        elif skipped:
+            self.status_label.setText(f"All renders finished, {skipped} of {total} were up to date and skipped.")
+        else:
+            self.status_label.setText("All renders finished.")
+        if self._watch_keys:
+            self.watch_render_timer.start()
+
+    def _write_batch_report(self):
+        # Farm jobs are measured on the workers, only local renders are reported
+        jobs = [j["metrics"] for j in self._batch_jobs.values() if j["metrics"].success is not None]
+        if not jobs:
+            return
+        self._report_jobs = jobs
+        self._report_seconds = time.monotonic() - self._batch_started
+        path = os.path.join(app_data_dir("reports"), f"batch_{time.strftime('%Y%m%d-%H%M%S')}.json")
+        try:
+            write_report(path, self._report_jobs, self._report_seconds)
+        except OSError:
+            pass  # The report can still be saved by hand
+        self.save_report_btn.setVisible(True)
+
+    def save_report(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Save Performance Report", os.path.join(self.output_path.text(), "render_report.csv"),
+            "CSV (*.csv);;JSON (*.json)", options=QFileDialog.Option.DontUseNativeDialog)
+        if not path:
+            return
+        try:
+            write_report(path, self._report_jobs, self._report_seconds)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Could not save the report:\n{e}")
 
-    def set_item_checkmark(self, item):
+    def set_row_checkmark(self, row):
         # Add a green checkmark icon to the folder column
-        pixmap = QPixmap(16, 16)
-        pixmap.fill(Qt.GlobalColor.transparent)
-        painter = QPainter(pixmap)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        painter.setPen(QColor("green"))
-        painter.setBrush(QColor("green"))
-        painter.drawLine(4, 10, 8, 14)
-        painter.drawLine(8, 14, 13, 5)
-        painter.end()
-        item.setIcon(1, QIcon(pixmap))
+        row.done = True
+        self.queue_model.row_changed(row, QueueModel.COL_FOLDER)
 
     def toggle_ffmpeg_output(self, checked):
         if checked:
             self.toggle_output_btn.setText("Hide FFmpeg Output")
-            self.ffmpeg_output.setVisible(True)
         else:
             self.toggle_output_btn.setText("Show FFmpeg Output")
-            self.ffmpeg_output.setVisible(False)
+        for widget in (self.log_job_combo, self.ffmpeg_output, self.open_log_btn):
+            widget.setVisible(checked)
+        self._refresh_log_view()
 
     def open_output_folder(self):
         folder = self.output_path.text()
@@ -460,152 +1752,12 @@ class FFmpegGUI(QWidget):
         else:
             QMessageBox.warning(self, "Warning", "Output folder does not exist.")
 
-    def run_ffmpeg(self, input_dir, output_dir, fps, hwaccel, preset, audio_file=None, take_number="tk01", task_code="TASK"):
-        files = sorted([f for f in os.listdir(input_dir) if f.lower().endswith(
-            ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.exr'))])
-        if not files:
-            return False, "No image files found."
-
-        total_frames = len(files)
-        self.progress_bar.setMaximum(total_frames)
-        self.progress_bar.setValue(0)
-        self.status_label.setText(f"Rendering: {os.path.basename(input_dir)}")
-
-        pattern = None
-        match = re.match(r"(.*?)(\d+)(\.[^.]+)$", files[0])
-        if match:
-            prefix, digits, ext = match.groups()
-            num_digits = len(digits)
-            pattern = f"{prefix}%0{num_digits}d{ext}"
-        else:
-            pattern = files[0]
-
-        input_pattern = os.path.join(input_dir, pattern)
-        base_name = os.path.basename(os.path.normpath(input_dir))
-
-        # Increment take number if audio had one
-        if take_number and re.match(r'tk\d{2}', take_number, re.IGNORECASE):
-            try:
-                num = int(take_number[2:])
-                take_number_out = f"tk{num+1:02d}"
-            except Exception:
-                take_number_out = take_number
-        else:
-            take_number_out = take_number or "tk01"
-
-        # Use task_code or default
-        task_code_out = task_code if task_code else "TASK"
-
-        # Choose extension based on preset
-        if preset == "ProRes MOV - 422 Standard":
-            ext = "mov"
-            codec = "prores_ks"
-            ffmpeg_args = ["-profile:v", "3"]
-        elif preset == "ProRes MOV - 422 Proxy":
-            ext = "mov"
-            codec = "prores_ks"
-            ffmpeg_args = ["-profile:v", "0"]
-        elif preset == "Preview MP4 - H.264 25Mbps":
-            ext = "mp4"
-            use_nvenc = False
-            if hwaccel == "NVIDIA (h264_nvenc)":
-                use_nvenc = True
-            elif hwaccel == "Auto-detect":
-                try:
-                    # Check if h264_nvenc is available
-                    result = subprocess.run(
-                        [ffmpeg_path(), '-hide_banner', '-encoders'],
-                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
-                        creationflags=CREATE_NO_WINDOW
-                    )
-                    if "h264_nvenc" in result.stdout:
-                        # Test if nvenc actually works
-                        test_cmd = [
-                            ffmpeg_path(),
-                            "-f", "lavfi",
-                            "-i", "testsrc=duration=1:size=128x128:rate=1",
-                            "-c:v", "h264_nvenc",
-                            "-f", "null",
-                            "-"
-                        ]
-                        test_result = subprocess.run(
-                            test_cmd,
-                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
-                            creationflags=CREATE_NO_WINDOW
-                        )
-                        if test_result.returncode == 0:
-                            use_nvenc = True
-                        else:
-                            use_nvenc = False  # Fallback to CPU if nvenc fails
-                    else:
-                        use_nvenc = False
-                except Exception:
-                    use_nvenc = False
-            codec = "h264_nvenc" if use_nvenc else "libx264"
-            ffmpeg_args = ["-b:v", "25M"]
-        else:
-            ext = "mp4"
-            codec = "libx264"
-            ffmpeg_args = []
-
-        # Build output filename
-        output_file = os.path.join(
-            output_dir,
-            f"{base_name}_{take_number}_{task_code_out}.{ext}"
-        )
-
-        cmd = [
-            ffmpeg_path(),  # <-- Use the function, not the string
-            "-framerate", fps,
-            "-i", input_pattern,
-        ]
-
-        # Add audio if provided
-        if audio_file:
-            cmd += ["-i", audio_file, "-map", "0:v:0", "-map", "1:a:0?"]
-        # If no audio, just map video
-        cmd += [
-            "-c:v", codec,
-            *ffmpeg_args,
-            "-pix_fmt", "yuv420p",
-            "-y",
-            output_file
-        ]
-
-        self.ffmpeg_output.clear()
-        try:
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                creationflags=CREATE_NO_WINDOW
-            )
-            output_lines = []
-            current_frame = 0
-            for line in process.stdout:
-                self.ffmpeg_output.append(line.rstrip())
-                output_lines.append(line.rstrip())
-                # Parse frame number from ffmpeg output
-                frame_match = re.search(r'frame=\s*(\d+)', line)
-                if frame_match:
-                    current_frame = int(frame_match.group(1))
-                    self.progress_bar.setValue(min(current_frame, total_frames))
-                QApplication.processEvents()
-            process.wait()
-            self.progress_bar.setValue(total_frames)
-            if process.returncode == 0:
-                return True, ""
-            else:
-                return False, "\n".join(output_lines[-20:])
-        except Exception as e:
-            return False, str(e)
-
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    trace("QApplication")
     app.setWindowIcon(QIcon(resource_path("SadAlchemist.ico")))
     window = FFmpegGUI()
     window.show()
+    trace("window shown")
     sys.exit(app.exec())
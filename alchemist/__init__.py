@@ -0,0 +1 @@
+"""Qt-free building blocks of SadAlchemist (probing, scanning, encoding)."""
@@ -0,0 +1,57 @@
+"""Per-user storage for caches and state that outlive a session."""
+import json
+import os
+import sys
+import tempfile
+
+# The process umask, read once at import (os.umask can only be read by setting it)
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+def app_data_dir(*parts):
+    """ Directory for SadAlchemist's caches, created on demand.
+
+    SADALCHEMIST_DATA_DIR overrides the platform default, which is handy for
+    render nodes sharing a cache or for keeping test runs isolated.
+    """
+    base = os.environ.get("SADALCHEMIST_DATA_DIR")
+    if not base:
+        if sys.platform == "win32":
+            root = os.environ.get("LOCALAPPDATA") or os.path.expanduser(os.path.join("~", "AppData", "Local"))
+        elif sys.platform == "darwin":
+            root = os.path.expanduser("~/Library/Application Support")
+        else:
+            root = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+        base = os.path.join(root, "SadAlchemist")
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def read_json(path, default=None):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write_json_atomic(path, data):
+    # Write to a temp file in the same folder and rename over the target, so a
+    # crash or a second process never sees a half-written file. mkstemp creates
+    # it private (0600), so it gets the permissions open() would have given it:
+    # manifests next to renders are read by other artists and farm workers.
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=folder)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1)
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,150 @@
+"""Audio sources conformed once and muxed into every render by stream copy.
+
+A job's audio source is often a large reference movie shared by several takes
+or folders. Instead of handing it to every render (each one demuxing and
+decoding the whole movie again), its first audio stream is extracted once,
+resampled to AUDIO_SAMPLE_RATE and encoded to AAC in an .m4a, and renders
+stream copy that file, cut to their sequence's length.
+
+Conformed files live in the data folder's audio cache under a key made from
+the source's path, size and mtime and the conform settings, so a source seen
+before (in this session or an earlier one) isn't decoded again, and an edited
+source gets a new file. Jobs running at the same time wait for each other
+instead of conforming the same source twice. The cache is trimmed to
+MAX_CACHE_BYTES, least recently used files first.
+"""
+import hashlib
+import json
+import os
+import subprocess
+import threading
+
+from .appdata import app_data_dir
+from .binaries import CREATE_NO_WINDOW, ffmpeg_path
+from .mediainfo import media_cache
+
+CACHE_FOLDER = "audio"
+CACHE_FORMAT = 1
+
+# What every source is conformed to
+AUDIO_SAMPLE_RATE = 48000
+AUDIO_CODEC = "aac"
+AUDIO_BITRATE = "192k"
+
+# The cache is trimmed to this size, then to TRIM_TO of it
+MAX_CACHE_BYTES = 1024 * 1024 * 1024
+TRIM_TO = 0.8
+
+
+def conform_key(source):
+    """ Hex key of source's conformed audio, None if source is gone. """
+    try:
+        st = os.stat(source)
+    except OSError:
+        return None
+    header = [CACHE_FORMAT, os.path.abspath(source), st.st_size, st.st_mtime_ns,
+              AUDIO_CODEC, AUDIO_BITRATE, AUDIO_SAMPLE_RATE]
+    return hashlib.sha256(json.dumps(header).encode("utf-8")).hexdigest()[:32]
+
+
+def conform_command(ffmpeg, source, path):
+    return [
+        ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+        "-i", source,
+        "-map", "0:a:0", "-vn", "-sn", "-dn",
+        "-c:a", AUDIO_CODEC, "-b:a", AUDIO_BITRATE, "-ar", str(AUDIO_SAMPLE_RATE),
+        "-f", "mp4", path,
+    ]
+
+
+class AudioCache:
+    # Thread-safe, shared by every job of the session
+    def __init__(self, folder=None, max_bytes=MAX_CACHE_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._key_locks = {}  # key -> Lock held while that source is conformed
+
+    def _path(self, key):
+        self.folder = self.folder or app_data_dir(CACHE_FOLDER)
+        return os.path.join(self.folder, key + ".m4a")
+
+    def _key_lock(self, key):
+        with self.lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, source, ffmpeg=None, log_callback=None):
+        """ Path of source's conformed audio, conformed first when it isn't cached.
+
+        None when source has no audio stream or can't be conformed, the caller
+        falls back to the source itself then.
+        """
+        key = conform_key(source)
+        if key is None:
+            return None
+        path = self._path(key)
+        with self._key_lock(key):
+            try:
+                os.utime(path)  # Most recently used
+                return path
+            except OSError:
+                pass
+            info = media_cache().get(source)
+            if info is not None and not info["has_audio"] and not info.get("error"):
+                return None  # Nothing to conform, ffmpeg's "1:a:0?" map leaves the audio out
+            if log_callback:
+                log_callback(f"Conforming the audio of {os.path.basename(source)}")
+            tmp_path = os.path.join(self.folder, f".{key}.{threading.get_ident()}.m4a")
+            try:
+                result = subprocess.run(conform_command(ffmpeg or ffmpeg_path(), source, tmp_path),
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                                        creationflags=CREATE_NO_WINDOW)
+                error = result.stderr.strip().splitlines()[-1] if result.returncode and result.stderr.strip() else ""
+                success = result.returncode == 0 and os.path.exists(tmp_path)
+            except (OSError, subprocess.SubprocessError) as e:
+                success, error = False, str(e)
+            if not success:
+                if log_callback:
+                    log_callback(f"Could not conform the audio ({error or 'ffmpeg failed'}), using the source")
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return None
+            os.replace(tmp_path, path)
+        self._trim()
+        return path
+
+    def _trim(self):
+        with self.lock:
+            entries = []
+            try:
+                with os.scandir(self.folder) as scan:
+                    for entry in scan:
+                        if entry.name.endswith(".m4a") and not entry.name.startswith("."):
+                            try:
+                                st = entry.stat()
+                            except OSError:
+                                continue
+                            entries.append((st.st_mtime, entry.path, st.st_size))
+            except OSError:
+                return
+            total = sum(size for _, _, size in entries)
+            if total <= self.max_bytes:
+                return
+            for _, path, size in sorted(entries):
+                if total <= self.max_bytes * TRIM_TO:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+
+
+_session_cache = AudioCache()
+
+
+def audio_cache():
+    """ The session-wide AudioCache. """
+    return _session_cache
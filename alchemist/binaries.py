@@ -0,0 +1,94 @@
+"""Locating and running the bundled ffmpeg/ffprobe binaries."""
+import os
+import shutil
+import subprocess
+import sys
+import threading
+
+from .trace import trace
+
+if sys.platform == "win32":
+    CREATE_NO_WINDOW = subprocess.CREATE_NO_WINDOW
+else:
+    CREATE_NO_WINDOW = 0
+
+
+def resource_path(relative_path):
+    """ Get absolute path to resource, works for dev and for PyInstaller """
+    if hasattr(sys, '_MEIPASS'):
+        return os.path.join(sys._MEIPASS, relative_path)
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), relative_path)
+
+
+# Resolved paths, (binary, override) -> path. Resolving stats the bundled copy
+# and searches PATH, which is slow on network drives, so it happens once.
+_resolved = {}
+_resolved_lock = threading.Lock()
+
+
+def ffmpeg_binary():
+    if sys.platform == "win32":
+        return "ffmpeg.exe"
+    else:
+        return "ffmpeg"
+
+
+def ffprobe_binary():
+    if sys.platform == "win32":
+        return "ffprobe.exe"
+    else:
+        return "ffprobe"
+
+
+def _find_binary(binary, env_var):
+    # SADALCHEMIST_FFMPEG/SADALCHEMIST_FFPROBE win, then the copy bundled in
+    # bin/, then whatever is on PATH (render nodes usually have a system ffmpeg).
+    # Falls back to the bundled path so error messages point at it.
+    override = os.environ.get(env_var)
+    key = (binary, override)
+    with _resolved_lock:
+        path = _resolved.get(key)
+        if path is None:
+            path = _resolved[key] = _locate_binary(binary, override)
+            trace(f"{binary} resolved: {path}")
+    return path
+
+
+def _locate_binary(binary, override):
+    if override:
+        return override
+    bundled = resource_path(os.path.join("bin", binary))
+    if os.path.exists(bundled):
+        return bundled
+    return shutil.which(binary) or bundled
+
+
+def ffmpeg_path():
+    return _find_binary(ffmpeg_binary(), "SADALCHEMIST_FFMPEG")
+
+
+def ffprobe_path():
+    return _find_binary(ffprobe_binary(), "SADALCHEMIST_FFPROBE")
+
+
+def check_binary(path):
+    """ None if path runs (-version exits cleanly), otherwise what is wrong with it. """
+    name = os.path.basename(path)
+    if not os.path.exists(path):
+        return f"{name} not found at: {path}"
+    try:
+        result = subprocess.run([path, "-hide_banner", "-version"], stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL, timeout=30, creationflags=CREATE_NO_WINDOW)
+    except (OSError, subprocess.SubprocessError) as e:
+        return f"{name} at {path} can't be run: {e}"
+    if result.returncode != 0:
+        return f"{name} at {path} can't be run (exit code {result.returncode})."
+    return None
+
+
+def check_binaries():
+    """ (ffmpeg path, ffprobe path, [problems]), resolved and test-run, for a background thread. """
+    ffmpeg, ffprobe = ffmpeg_path(), ffprobe_path()
+    problems = [problem for problem in (check_binary(ffmpeg), check_binary(ffprobe)) if problem]
+    trace("binaries checked")
+    return ffmpeg, ffprobe, problems
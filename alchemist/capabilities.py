@@ -0,0 +1,230 @@
+"""Detection of the encoders the bundled ffmpeg can actually use.
+
+ffmpeg lists hardware encoders whether or not the matching GPU and driver are
+present, so each one is confirmed with a tiny trial encode. That takes a few
+seconds, so the result is cached on disk keyed by the ffmpeg binary's path,
+mtime and version, and memoized for the rest of the session.
+
+Even a confirmed encoder can fail to start on a real job (driver hiccups,
+sizes the hardware rejects), so fallback_chain() orders the usable encoders of
+a codec family for the engine to retry with.
+"""
+import os
+import re
+import subprocess
+import sys
+import threading
+
+from .appdata import app_data_dir, read_json, write_json_atomic
+from .binaries import CREATE_NO_WINDOW
+
+CACHE_FORMAT = 2
+CACHE_FILE = "encoder_capabilities.json"
+
+VAAPI_DEVICE = os.environ.get("SADALCHEMIST_VAAPI_DEVICE", "/dev/dri/renderD128")
+
+# Hardware encoders in order of preference for "Auto-detect". Only list what a
+# preset or the acceleration combo can select, each one costs a trial encode.
+# input_args go before the first -i, video_filter/pix_fmt replace the default
+# -pix_fmt and args are the encoder's tuning options.
+HW_ENCODERS = {
+    "h264_nvenc": {
+        "label": "NVIDIA (h264_nvenc)",
+        "input_args": [], "video_filter": None, "pix_fmt": "yuv420p", "args": ["-preset", "p4"],
+    },
+    "h264_qsv": {
+        "label": "Intel QSV (h264_qsv)",
+        "input_args": [], "video_filter": None, "pix_fmt": "nv12", "args": ["-preset", "faster"],
+    },
+    "h264_vaapi": {
+        "label": "VAAPI (h264_vaapi)",
+        "input_args": ["-vaapi_device", VAAPI_DEVICE], "video_filter": "format=nv12,hwupload", "pix_fmt": None,
+        "args": [],
+    },
+    "h264_videotoolbox": {
+        "label": "Apple VideoToolbox (h264_videotoolbox)",
+        "input_args": [], "video_filter": None, "pix_fmt": "yuv420p", "args": [],
+    },
+}
+
+# Software encoders, also in order of preference within their family, and
+# their tuning options. libx264's "faster" keeps previews at their bitrate
+# for a fraction of the default preset's CPU time.
+SOFTWARE_ENCODERS = {
+    "libx264": {"label": "CPU (libx264)", "args": ["-preset", "faster"]},
+    "libx265": {"label": "CPU (libx265)", "args": ["-preset", "fast"]},
+    "prores_ks": {"label": "prores_ks (best quality)", "args": []},
+    "prores_aw": {"label": "prores_aw (faster)", "args": []},
+}
+
+CPU_H264_LABEL = SOFTWARE_ENCODERS["libx264"]["label"]
+
+# ProRes software encoders a job can ask for
+PRORES_ENCODERS = ("prores_ks", "prores_aw")
+DEFAULT_PRORES_ENCODER = "prores_ks"
+
+
+class EncoderCapabilities:
+    def __init__(self, ffmpeg_version, encoders, working_hw):
+        self.ffmpeg_version = ffmpeg_version
+        self.encoders = set(encoders)      # Everything "ffmpeg -encoders" lists
+        self.working_hw = list(working_hw)  # Hardware encoders that passed the trial encode
+
+    def has(self, encoder):
+        if encoder in HW_ENCODERS:
+            return encoder in self.working_hw
+        return encoder in self.encoders
+
+    def hw_h264_encoders(self):
+        return [e for e in HW_ENCODERS if e.startswith("h264_") and e in self.working_hw]
+
+    def best_h264_encoder(self):
+        hw = self.hw_h264_encoders()
+        return hw[0] if hw else "libx264"
+
+    def to_dict(self):
+        return {
+            "ffmpeg_version": self.ffmpeg_version,
+            "encoders": sorted(self.encoders),
+            "working_hw": self.working_hw,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("ffmpeg_version", ""), data.get("encoders", []), data.get("working_hw", []))
+
+
+def encoder_for_label(label):
+    # Maps a hardware acceleration combo entry back to its encoder name
+    for name, info in HW_ENCODERS.items():
+        if info["label"] == label:
+            return name
+    if label == CPU_H264_LABEL:
+        return "libx264"
+    return None
+
+
+def encoder_family(encoder):
+    # "h264_vaapi" -> "h264", "libx264" -> "h264", "prores_aw" -> "prores"
+    if encoder.startswith("libx26"):
+        return "h26" + encoder[-1]
+    return encoder.split("_")[0]
+
+
+def fallback_chain(encoder, capabilities):
+    """ encoder followed by the usable encoders of its family that come after
+    it in order of preference (hardware before software), to retry with. """
+    order = list(HW_ENCODERS) + list(SOFTWARE_ENCODERS)
+    chain = [encoder]
+    if encoder not in order:
+        return chain
+    family = encoder_family(encoder)
+    for candidate in order[order.index(encoder) + 1:]:
+        if encoder_family(candidate) == family and capabilities.has(candidate):
+            chain.append(candidate)
+    return chain
+
+
+def video_encode_args(encoder):
+    """ Returns (input_args, output_args) needed to feed frames to encoder. """
+    info = HW_ENCODERS.get(encoder)
+    if info is None:
+        return [], list(SOFTWARE_ENCODERS.get(encoder, {}).get("args", [])) + ["-pix_fmt", "yuv420p"]
+    output_args = list(info["args"])
+    if info["video_filter"]:
+        output_args += ["-vf", info["video_filter"]]
+    if info["pix_fmt"]:
+        output_args += ["-pix_fmt", info["pix_fmt"]]
+    return list(info["input_args"]), output_args
+
+
+def _run(cmd, timeout=30):
+    return subprocess.run(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        timeout=timeout, creationflags=CREATE_NO_WINDOW
+    )
+
+
+def ffmpeg_version(ffmpeg):
+    try:
+        first_line = _run([ffmpeg, "-hide_banner", "-version"]).stdout.splitlines()[0]
+    except (OSError, IndexError, subprocess.SubprocessError):
+        return ""
+    return first_line.strip()
+
+
+def list_encoders(ffmpeg):
+    # Lines of "ffmpeg -encoders" look like " V....D libx264    libx264 H.264 ..."
+    try:
+        output = _run([ffmpeg, "-hide_banner", "-encoders"]).stdout
+    except (OSError, subprocess.SubprocessError):
+        return set()
+    return set(re.findall(r"^\s*[VAS][A-Z.]{5}\s+(\S+)", output, re.MULTILINE))
+
+
+def trial_encode(ffmpeg, encoder):
+    if encoder.endswith("_vaapi") and (sys.platform != "linux" or not os.path.exists(VAAPI_DEVICE)):
+        return False
+    input_args, output_args = video_encode_args(encoder)
+    cmd = [
+        ffmpeg, "-hide_banner", "-v", "error",
+        *input_args,
+        "-f", "lavfi", "-i", "testsrc=duration=1:size=256x256:rate=1",
+        *output_args,
+        "-c:v", encoder, "-frames:v", "1",
+        "-f", "null", "-"
+    ]
+    try:
+        return _run(cmd).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+def probe_capabilities(ffmpeg, version=None):
+    encoders = list_encoders(ffmpeg)
+    working_hw = [e for e in HW_ENCODERS if e in encoders and trial_encode(ffmpeg, e)]
+    available = [e for e in encoders if e in SOFTWARE_ENCODERS or e in HW_ENCODERS]
+    return EncoderCapabilities(version if version is not None else ffmpeg_version(ffmpeg), available, working_hw)
+
+
+def _cache_key(ffmpeg, version):
+    st = os.stat(ffmpeg)
+    return {"path": os.path.abspath(ffmpeg), "mtime": st.st_mtime_ns, "size": st.st_size, "version": version}
+
+
+def load_capabilities(ffmpeg, cache_path=None, refresh=False):
+    """ Capabilities of ffmpeg, from the on-disk cache when the binary is unchanged. """
+    cache_path = cache_path or os.path.join(app_data_dir(), CACHE_FILE)
+    version = ffmpeg_version(ffmpeg)
+    try:
+        key = _cache_key(ffmpeg, version)
+    except OSError:
+        return EncoderCapabilities(version, [], [])
+    cache = read_json(cache_path, {})
+    if cache.get("format") != CACHE_FORMAT:
+        cache = {"format": CACHE_FORMAT, "binaries": {}}
+    entry = cache["binaries"].get(key["path"])
+    if entry and entry.get("key") == key and not refresh:
+        return EncoderCapabilities.from_dict(entry["capabilities"])
+
+    capabilities = probe_capabilities(ffmpeg, version)
+    if not version:
+        return capabilities  # ffmpeg didn't run, don't remember a bogus probe
+    cache["binaries"][key["path"]] = {"key": key, "capabilities": capabilities.to_dict()}
+    try:
+        write_json_atomic(cache_path, cache)
+    except OSError:
+        pass  # A read-only profile only costs us the probe next launch
+    return capabilities
+
+
+_session_lock = threading.Lock()
+_session_capabilities = {}
+
+
+def get_capabilities(ffmpeg):
+    """ Session-wide capabilities, probed (or loaded from cache) only once per binary. """
+    with _session_lock:
+        if ffmpeg not in _session_capabilities:
+            _session_capabilities[ffmpeg] = load_capabilities(ffmpeg)
+        return _session_capabilities[ffmpeg]
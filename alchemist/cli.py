@@ -0,0 +1,372 @@
+"""Headless command line for rendering without the GUI (farm nodes, scripts).
+
+Progress is written to stdout as one JSON object per line, ffmpeg's own log
+goes to stderr with --verbose and always to a per-job log file (the "log" field
+of the finished event). Exit status is 0 when every job rendered, 1 if
+any job failed and 2 for usage errors.
+
+    python -m alchemist -o /renders --task COMP shot_010 shot_020
+    python -m alchemist --manifest jobs.csv -j 4
+
+Watch mode renders every sequence that finishes writing below the given roots,
+with the other options as the settings of each job:
+
+    python -m alchemist --watch /shows/renders -o /dailies --task COMP
+
+Farm mode runs a broker, workers on any number of machines, and submits to it:
+
+    python -m alchemist --broker 0.0.0.0:8765
+    python -m alchemist --worker http://broker-host:8765
+    python -m alchemist --submit http://broker-host:8765 --manifest jobs.csv
+"""
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from . import farm
+from .binaries import ffmpeg_path, ffprobe_path
+from .capabilities import DEFAULT_PRORES_ENCODER, PRORES_ENCODERS
+from .engine import DEFAULT_PRESET, HWACCEL_AUTO, PRESETS, RenderJob, run_job
+from .framefeed import INPUT_FILES, INPUT_MODES
+from .joblog import JobLog, prune_logs
+from .mediainfo import audio_mismatch, media_cache
+from .metrics import JobMetrics, write_report
+from .scheduler import DEFAULT_DISK_MB_S, ResourceScheduler, estimate_costs
+from .sequences import main_sequence
+from .watch import POLL_INTERVAL, SETTLE_SECONDS, FolderWatcher
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+# Manifest columns/keys, "task" and "output" are accepted as short forms
+MANIFEST_ALIASES = {"task": "task_code", "output": "output_dir"}
+
+# Seconds between progress events of the same job
+PROGRESS_INTERVAL = 0.5
+
+# Watch mode waits this long after a folder is ready for others finishing with it
+WATCH_GATHER_SECONDS = 2.0
+
+
+class EventWriter:
+    # Thread-safe JSON lines writer for machine readable progress
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        line = json.dumps({"event": event, **fields})
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def load_manifest(path, defaults):
+    """ Jobs from a JSON (list of objects) or CSV (header row) manifest.
+
+    Missing fields fall back to defaults, relative folders and audio paths are
+    resolved against the manifest's folder.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".json"):
+            entries = json.load(f)
+            if isinstance(entries, dict):
+                entries = entries.get("jobs", [])
+        else:
+            entries = list(csv.DictReader(f))
+    jobs = []
+    for entry in entries:
+        fields = dict(defaults)
+        for key, value in entry.items():
+            key = MANIFEST_ALIASES.get(key.strip().lower(), key.strip().lower())
+            if value not in (None, ""):
+                fields[key] = value
+        if not fields.get("folder"):
+            raise ValueError(f"Manifest entry without a folder: {entry}")
+        for key in ("folder", "audio", "output_dir"):
+            if fields.get(key) and not os.path.isabs(fields[key]):
+                fields[key] = os.path.join(base, fields[key])
+        jobs.append(RenderJob.from_dict(fields))
+    return jobs
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="sadalchemist",
+        description="Convert image sequence folders to video without the GUI.")
+    parser.add_argument("folders", nargs="*", help="Image sequence folders to render")
+    parser.add_argument("--manifest", help="JSON or CSV job list (folder, take, task, audio, preset, extra_presets, "
+                             "fps, chunks, input_mode, output)")
+    parser.add_argument("-o", "--output", help="Output folder (default: each manifest entry's output)")
+    parser.add_argument("--preset", default=DEFAULT_PRESET, choices=sorted(PRESETS), help="Encoding preset")
+    parser.add_argument("--also", dest="extra_presets", action="append", default=[], choices=sorted(PRESETS),
+                        metavar="PRESET", help="Another preset rendered from the same decode, repeat for more")
+    parser.add_argument("--fps", default="24", help="Frames per second (default: 24)")
+    parser.add_argument("--task", default="TASK", help="Task code used in the output name")
+    parser.add_argument("--take", default="tk01", help="Take number used in the output name")
+    parser.add_argument("--audio", help="Audio source muxed into every folder given on the command line")
+    parser.add_argument("--hwaccel", default=HWACCEL_AUTO, help="Hardware acceleration, as named in the GUI")
+    parser.add_argument("--prores-encoder", default=DEFAULT_PRORES_ENCODER, choices=PRORES_ENCODERS,
+                        help="ProRes encoder: prores_ks (best quality) or prores_aw (faster)")
+    parser.add_argument("--chunks", type=int, default=1,
+                        help="Split each render into this many segments encoded in parallel (default: 1, off)")
+    parser.add_argument("--input-mode", default=INPUT_FILES, choices=INPUT_MODES,
+                        help="files: ffmpeg reads the frames, pipe: prefetch them in parallel and pipe them in "
+                             "(faster on network storage)")
+    parser.add_argument("--frame-step", type=int, default=1,
+                        help="Proxy presets only read every N-th frame, for quick timing checks (default: 1)")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="Re-render outputs whose frames, audio and settings are unchanged")
+    parser.add_argument("-j", "--jobs", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Number of renders to run at once")
+    parser.add_argument("--disk-budget", type=float, default=DEFAULT_DISK_MB_S, metavar="MB/S",
+                        help=f"Disk bandwidth the renders running at once may read together "
+                             f"(default: {DEFAULT_DISK_MB_S}, 0 = no limit)")
+    parser.add_argument("--in-order", action="store_true",
+                        help="Render in the given order, -j at a time, instead of shortest first within the "
+                             "CPU and disk budgets")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Copy ffmpeg's log to stderr")
+    parser.add_argument("--report", help="Write a performance report of the batch (.json or .csv)")
+    watch_group = parser.add_argument_group("watch folders")
+    watch_group.add_argument("--watch", metavar="ROOT", action="append", default=[],
+                             help="Render sequences written below ROOT once they stop growing, repeat for more roots")
+    watch_group.add_argument("--settle", type=float, default=SETTLE_SECONDS,
+                             help=f"Seconds a sequence must stay unchanged before it renders "
+                                  f"(default: {SETTLE_SECONDS:g})")
+    watch_group.add_argument("--poll", action="store_true",
+                             help=f"Rescan the roots every {POLL_INTERVAL:g} s instead of using inotify")
+    watch_group.add_argument("--watch-existing", action="store_true",
+                             help="Also render the sequences already in the roots when watching starts")
+    farm_group = parser.add_argument_group("render farm")
+    farm_group.add_argument("--broker", metavar="[HOST:]PORT",
+                            help="Run a farm job broker (use 0.0.0.0:PORT to accept other machines)")
+    farm_group.add_argument("--broker-db", help="SQLite file for the broker's jobs (default: app data folder)")
+    farm_group.add_argument("--worker", metavar="URL", help="Run as a farm worker pulling jobs from the broker at URL")
+    farm_group.add_argument("--worker-name", help="Name reported to the broker (default: host-pid)")
+    farm_group.add_argument("--submit", metavar="URL", help="Queue the jobs on the broker at URL and follow them")
+    return parser
+
+
+def check_audio(jobs, events):
+    # Probes every audio source of the batch up front (cached across runs) and
+    # warns about sources without audio or not as long as their sequence
+    sources = [job.audio for job in jobs if job.audio]
+    if not sources:
+        return
+    infos = media_cache().probe_many(sources, ffprobe_path())
+    for job_id, job in enumerate(jobs):
+        info = infos.get(job.audio)
+        if not info:
+            continue
+        if not info["has_audio"]:
+            events.emit("warning", job=job_id, folder=job.folder, message=f"No audio stream in {job.audio}")
+            continue
+        sequence = main_sequence(job.folder)
+        mismatch = sequence and audio_mismatch(info, sequence.length, job.fps)
+        if mismatch:
+            events.emit("warning", job=job_id, folder=job.folder, message=mismatch)
+
+
+def run_jobs(jobs, parallel, events, verbose=False, report=None, scheduler=None):
+    """ Renders jobs with up to parallel at once, returns the number that failed.
+
+    report is a .json or .csv path for the batch's performance report. With a
+    ResourceScheduler jobs start shortest first as the budgets allow, else in order.
+    """
+    ffmpeg = ffmpeg_path()
+    log_lock = threading.Lock()
+    prune_logs()  # Once per batch, each job opens its log when it starts
+    job_metrics = [JobMetrics(job.name, job.folder) for job in jobs]
+    batch_started = time.monotonic()
+
+    def render(job_id, job):
+        last_report = {"time": 0.0, "frame": None}
+        metrics = job_metrics[job_id]
+
+        def on_progress(frame, total):
+            now = time.monotonic()
+            if frame == last_report["frame"]:
+                return
+            if frame < total and now - last_report["time"] < PROGRESS_INTERVAL:
+                return
+            last_report.update(time=now, frame=frame)
+            fps, eta = metrics.fps(), metrics.eta()
+            events.emit("progress", job=job_id, frame=frame, total=total,
+                        fps=round(fps, 2) if fps else None, eta=round(eta, 1) if eta is not None else None)
+
+        job_log = JobLog(job.name)
+
+        def on_log(line):
+            job_log.append(line)
+            if verbose:
+                with log_lock:
+                    print(f"[{job.name}] {line}", file=sys.stderr)
+
+        events.emit("start", job=job_id, folder=job.folder)
+        started = time.monotonic()
+        result = run_job(job, on_progress, on_log, ffmpeg=ffmpeg, metrics=metrics)
+        job_log.close()
+        events.emit("finished", job=job_id, folder=job.folder, success=result.success,
+                    output=result.output_file, outputs=result.output_files, error=result.error,
+                    skipped=result.skipped,
+                    seconds=round(time.monotonic() - started, 3), log=job_log.path,
+                    metrics=metrics.to_dict())
+        return result.success
+
+    if scheduler is None:
+        with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+            results = list(pool.map(render, range(len(jobs)), jobs))
+    else:
+        scheduler.max_jobs = max(1, parallel)
+        costs = estimate_costs(dict(enumerate(jobs)), ffmpeg, scheduler.cpu_threads)
+        pending = scheduler.order(costs)
+        results = [None] * len(jobs)
+        running = {}  # future -> job id
+        with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+            while pending or running:
+                for job_id in scheduler.admit(pending, costs, list(running.values())):
+                    pending.remove(job_id)
+                    job = jobs[job_id]
+                    if not job.threads:
+                        job.threads = scheduler.threads_for(costs[job_id])
+                    running[pool.submit(render, job_id, job)] = job_id
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+    if report:
+        try:
+            write_report(report, job_metrics, time.monotonic() - batch_started)
+        except OSError as e:
+            print(f"Could not write the report: {e}", file=sys.stderr)
+    return results.count(False)
+
+
+def watch_folders(args, defaults, events):
+    """ Renders sequences as they finish writing below args.watch until interrupted. """
+    ready = queue.Queue()
+    watcher = FolderWatcher(args.watch, lambda folder, sequences: ready.put(folder), settle=args.settle,
+                            existing=args.watch_existing, use_inotify=not args.poll)
+    events.emit("watching", roots=watcher.roots, mode=watcher.start())
+    try:
+        while True:
+            folders = [ready.get()]
+            # Shots of one comp render usually finish together, they share a batch
+            while True:
+                try:
+                    folders.append(ready.get(timeout=WATCH_GATHER_SECONDS))
+                except queue.Empty:
+                    break
+            for folder in folders:
+                events.emit("detected", folder=folder)
+            jobs = [RenderJob.from_dict({**defaults, "folder": folder}) for folder in folders]
+            failed = run_jobs(jobs, args.jobs, events, args.verbose,
+                              scheduler=None if args.in_order else ResourceScheduler(disk_mb_s=args.disk_budget))
+            events.emit("summary", total=len(jobs), failed=failed)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+    return EXIT_OK
+
+
+def follow_farm_batch(url, batch, events):
+    """ Polls a submitted batch until every job is done or failed, returns the failed count. """
+    reported = {}
+    while True:
+        try:
+            jobs = farm.batch_status(url, batch)["jobs"]
+        except farm.FarmError as e:
+            print(e, file=sys.stderr)
+            time.sleep(farm.POLL_INTERVAL)
+            continue
+        for job in jobs:
+            state = (job["state"], job["frame"], job["worker"])
+            if reported.get(job["id"]) == state:
+                continue
+            reported[job["id"]] = state
+            if job["state"] in (farm.DONE, farm.FAILED):
+                events.emit("finished", job=job["id"], success=job["state"] == farm.DONE,
+                            output=job["output"], error=job["error"] or "", worker=job["worker"])
+            elif job["state"] == farm.LEASED:
+                events.emit("progress", job=job["id"], frame=job["frame"], total=job["total"], worker=job["worker"])
+        if all(job["state"] in (farm.DONE, farm.FAILED) for job in jobs):
+            return sum(1 for job in jobs if job["state"] == farm.FAILED)
+        time.sleep(farm.POLL_INTERVAL)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.broker:
+        host, _, port = args.broker.rpartition(":")
+        if not port.isdigit():
+            parser.error(f"Invalid broker address: {args.broker}")
+        farm.serve_broker(host or "127.0.0.1", int(port), args.broker_db)
+        return EXIT_OK
+    if args.worker:
+        try:
+            farm.run_worker(args.worker, args.worker_name, lambda line: print(line, file=sys.stderr, flush=True))
+        except KeyboardInterrupt:
+            pass
+        return EXIT_OK
+
+    defaults = {
+        "output_dir": args.output, "fps": args.fps, "preset": args.preset,
+        "hwaccel": args.hwaccel, "take": args.take, "task_code": args.task, "chunks": args.chunks,
+        "force": args.force, "input_mode": args.input_mode, "extra_presets": args.extra_presets,
+        "prores_encoder": args.prores_encoder, "frame_step": args.frame_step,
+    }
+    if args.watch:
+        if args.manifest or args.folders or args.submit:
+            parser.error("--watch renders what appears in its roots, it takes no folders, manifest or --submit.")
+        for root in args.watch:
+            if not os.path.isdir(root):
+                parser.error(f"Not a folder: {root}")
+        if not args.output or not os.path.isdir(args.output):
+            parser.error(f"Invalid output folder: {args.output}")
+        if not os.path.exists(ffmpeg_path()):
+            print(f"ffmpeg not found at: {ffmpeg_path()}", file=sys.stderr)
+            return EXIT_USAGE
+        return watch_folders(args, defaults, EventWriter(sys.stdout))
+
+    try:
+        jobs = load_manifest(args.manifest, defaults) if args.manifest else []
+    except (OSError, ValueError) as e:
+        parser.error(f"Could not read manifest: {e}")
+    jobs += [RenderJob.from_dict({**defaults, "folder": os.path.abspath(folder), "audio": args.audio})
+             for folder in args.folders]
+    if not jobs:
+        parser.error("No folders or manifest given.")
+    for job in jobs:
+        if not job.output_dir or not os.path.isdir(job.output_dir):
+            parser.error(f"Invalid output folder for {job.folder}: {job.output_dir}")
+
+    events = EventWriter(sys.stdout)
+    if args.submit:
+        try:
+            batch = farm.submit_batch(args.submit, jobs)["batch"]
+        except farm.FarmError as e:
+            print(e, file=sys.stderr)
+            return EXIT_USAGE
+        events.emit("submitted", batch=batch, total=len(jobs))
+        failed = follow_farm_batch(args.submit, batch, events)
+        events.emit("summary", total=len(jobs), failed=failed)
+        return EXIT_FAILED if failed else EXIT_OK
+
+    if not os.path.exists(ffmpeg_path()):
+        print(f"ffmpeg not found at: {ffmpeg_path()}", file=sys.stderr)
+        return EXIT_USAGE
+    check_audio(jobs, events)
+    scheduler = None if args.in_order else ResourceScheduler(disk_mb_s=args.disk_budget)
+    failed = run_jobs(jobs, args.jobs, events, args.verbose, args.report, scheduler)
+    events.emit("summary", total=len(jobs), failed=failed)
+    return EXIT_FAILED if failed else EXIT_OK
@@ -0,0 +1,750 @@
+"""Qt-free render engine: turns a queued folder into an ffmpeg command and runs it.
+
+Shared by the GUI render pool and the headless command line, so both always
+build exactly the same ffmpeg invocation.
+"""
+import io
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from . import rendercache
+from .audiocache import AUDIO_BITRATE, AUDIO_CODEC, AUDIO_SAMPLE_RATE, audio_cache
+from .binaries import CREATE_NO_WINDOW, ffmpeg_path
+from .capabilities import (
+    DEFAULT_PRORES_ENCODER, HW_ENCODERS, PRORES_ENCODERS, encoder_for_label, fallback_chain, get_capabilities,
+    video_encode_args,
+)
+from .framefeed import INPUT_FILES, INPUT_MODES, INPUT_PIPE, FrameFeeder, frame_paths, pipe_decoder
+from .metrics import JobMetrics
+from .sequences import main_sequence, write_concat_list
+
+HWACCEL_AUTO = "Auto-detect"
+
+# Encoding presets by the name shown in the GUI. "h264" picks the encoder
+# from the hardware acceleration setting, "prores" from the job's ProRes
+# encoder. "tag" tells apart the file names of presets sharing an extension
+# when a job renders both. Proxies ("scale") are downscaled review copies on
+# fast libx264 settings, named with "suffix".
+PRESETS = {
+    "Preview MP4 - H.264 25Mbps": {"ext": "mp4", "codec": "h264", "args": ["-b:v", "25M"], "tag": "h264"},
+    "ProRes MOV - 422 Proxy": {"ext": "mov", "codec": "prores", "args": ["-profile:v", "0"],
+                               "tag": "prores_proxy"},
+    "ProRes MOV - 422 Standard": {"ext": "mov", "codec": "prores", "args": ["-profile:v", "3"],
+                                  "tag": "prores_422"},
+    "Proxy MP4 - H.264 1/2": {"ext": "mp4", "codec": "libx264", "args": ["-preset", "superfast", "-crf", "23"],
+                              "tag": "half", "suffix": "_proxy", "scale": 2},
+    "Proxy MP4 - H.264 1/4": {"ext": "mp4", "codec": "libx264", "args": ["-preset", "superfast", "-crf", "23"],
+                              "tag": "quarter", "suffix": "_proxy", "scale": 4},
+}
+DEFAULT_PRESET = "Preview MP4 - H.264 25Mbps"
+
+# Number of ffmpeg log lines kept per job for error reports
+LOG_TAIL_LINES = 20
+
+# Seconds between checks of a render's stop event, and the error it stops with
+STOP_POLL_INTERVAL = 0.5
+STOPPED_ERROR = "Render stopped"
+
+# Chunked renders never cut segments shorter than this, the extra process and
+# the join cost more than they save on short shots
+MIN_CHUNK_FRAMES = 48
+
+# Decoders that can decode at 1/2, 1/4 or 1/8 resolution (-lowres)
+LOWRES_DECODERS = {".jpg", ".jpeg"}
+
+
+class RenderJob:
+    # Everything needed to render one image sequence folder
+    FIELDS = ("folder", "output_dir", "fps", "preset", "hwaccel", "audio", "take", "task_code",
+              "chunks", "force", "threads", "input_mode", "extra_presets", "prores_encoder", "frame_step")
+
+    def __init__(self, folder, output_dir, fps="24", preset=DEFAULT_PRESET, hwaccel=HWACCEL_AUTO,
+                 audio=None, take="tk01", task_code="TASK", chunks=1, force=False, threads=0,
+                 input_mode=INPUT_FILES, extra_presets=(), prores_encoder=DEFAULT_PRORES_ENCODER, frame_step=1):
+        self.folder = folder
+        self.output_dir = output_dir
+        self.fps = str(fps)
+        self.preset = preset
+        self.hwaccel = hwaccel
+        self.audio = audio or None
+        self.take = take or "tk01"
+        self.task_code = task_code or "TASK"
+        # Segments encoded in parallel and joined without re-encoding, 1 renders in one pass
+        self.chunks = max(1, int(chunks or 1))
+        # Render even when the output's manifest says nothing changed
+        self.force = force in (True, 1, "1", "true", "True", "yes")
+        # Encoder threads per ffmpeg process, 0 leaves it to ffmpeg
+        self.threads = max(0, int(threads or 0))
+        # How frames reach ffmpeg, see framefeed
+        self.input_mode = input_mode if input_mode in INPUT_MODES else INPUT_FILES
+        # More presets encoded from the same decode of the frames, each to its
+        # own file (";" separated in CSV manifests)
+        if isinstance(extra_presets, str):
+            extra_presets = extra_presets.split(";")
+        self.extra_presets = []
+        for extra in extra_presets or ():
+            extra = extra.strip()
+            if extra and extra != preset and extra not in self.extra_presets:
+                self.extra_presets.append(extra)
+        self.prores_encoder = prores_encoder if prores_encoder in PRORES_ENCODERS else DEFAULT_PRORES_ENCODER
+        # Proxy renders only read every frame_step-th frame (held for the
+        # frames in between, so the timing and the audio stay in sync)
+        self.frame_step = max(1, int(frame_step or 1))
+
+    @property
+    def name(self):
+        return os.path.basename(os.path.normpath(self.folder))
+
+    @property
+    def presets(self):
+        return [self.preset] + self.extra_presets
+
+    def to_dict(self):
+        return {
+            "folder": self.folder, "output_dir": self.output_dir, "fps": self.fps,
+            "preset": self.preset, "hwaccel": self.hwaccel, "audio": self.audio,
+            "take": self.take, "task_code": self.task_code, "chunks": self.chunks,
+            "force": self.force, "threads": self.threads, "input_mode": self.input_mode,
+            "extra_presets": list(self.extra_presets), "prores_encoder": self.prores_encoder,
+            "frame_step": self.frame_step,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{k: v for k, v in data.items() if k in cls.FIELDS})
+
+
+class RenderResult:
+    def __init__(self, success, error="", output_file=None, skipped=False, output_files=None):
+        self.success = success
+        self.error = error
+        self.output_file = output_file
+        # Every file this render wrote, more than one for multi-preset jobs
+        self.output_files = output_files if output_files is not None else [output_file] if output_file else []
+        self.skipped = skipped  # Output was already up to date, nothing was encoded
+        self.metrics = None     # JobMetrics of the render, set by run_job
+
+
+def preset_extension(preset):
+    info = PRESETS.get(preset)
+    if info:
+        return info["ext"]
+    return "mov" if "mov" in preset.lower() else "mp4"
+
+
+def preset_tag(preset):
+    info = PRESETS.get(preset)
+    if info:
+        return info["tag"]
+    return re.sub(r"\W+", "_", preset).strip("_").lower()
+
+
+def proxy_scale(preset):
+    """ How many times smaller than the frames preset renders, 1 for full size. """
+    return PRESETS.get(preset, {}).get("scale", 1)
+
+
+def output_filename(name, take, task_code, preset):
+    suffix = PRESETS.get(preset, {}).get("suffix", "")
+    return f"{name}_{take or 'tk01'}_{task_code or 'TASK'}{suffix}.{preset_extension(preset)}"
+
+
+def output_filenames(name, take, task_code, presets):
+    """ The file name of each of presets. A preset whose name is already taken
+    by an earlier one (same extension) gets its tag appended. """
+    names = []
+    for preset in presets:
+        filename = output_filename(name, take, task_code, preset)
+        if filename in names:
+            base, ext = os.path.splitext(filename)
+            filename = f"{base}_{preset_tag(preset)}{ext}"
+        names.append(filename)
+    return names
+
+
+def video_codec(preset, hwaccel, ffmpeg, prores_encoder=DEFAULT_PRORES_ENCODER):
+    codec = PRESETS.get(preset, {"codec": "libx264"})["codec"]
+    if codec == "prores":
+        return prores_encoder
+    if codec != "h264":
+        return codec
+    if hwaccel == HWACCEL_AUTO:
+        # Probed once per session (and cached on disk), not once per job
+        return get_capabilities(ffmpeg).best_h264_encoder()
+    return encoder_for_label(hwaccel) or "libx264"
+
+
+def job_codec(job, preset, ffmpeg):
+    return video_codec(preset, job.hwaccel, ffmpeg, job.prores_encoder)
+
+
+# ffmpeg log lines saying an encoder could not be found, opened or initialised
+# (its device, driver or session). Only these move a render down the fallback
+# chain, a bad frame, a missing audio source or a full disk fails the same way
+# with any encoder. "Could not open encoder before EOF" means no frame was
+# decoded at all, an input problem.
+ENCODER_INIT_ERRORS = re.compile(
+    r"Error while opening encoder|Could not open encoder(?! before EOF)|Error initializing output stream|"
+    r"Error selecting an encoder|Encoder not found|Unknown encoder|No capable devices found|"
+    r"OpenEncodeSessionEx failed|Cannot load (libcuda|nvEncodeAPI|libnvidia-encode)|"
+    r"Failed to initiali[sz]e VAAPI|Error creating a MFX session|Error initializing an internal MFX session|"
+    r"Device creation failed|cannot create compression session",
+    re.IGNORECASE)
+
+
+def encoder_init_failed(error):
+    """ True when error (ffmpeg's log tail) says the encoder never got going. """
+    return bool(error) and ENCODER_INIT_ERRORS.search(error) is not None
+
+
+def next_codecs(codecs, chains):
+    """ codecs ({preset: encoder}) with the failed encoders moved one step down
+    their chains, None when there is nothing left to try. A multi-output
+    render doesn't say which encoder failed, hardware encoders are the usual
+    suspects, so they are replaced first. """
+    movable = [preset for preset, codec in codecs.items() if chains[preset].index(codec) + 1 < len(chains[preset])]
+    hardware = [preset for preset in movable if codecs[preset] in HW_ENCODERS]
+    if not movable:
+        return None
+    return {preset: chains[preset][chains[preset].index(codec) + 1] if preset in (hardware or movable) else codec
+            for preset, codec in codecs.items()}
+
+
+def job_outputs(job):
+    """ [(preset, output file)] for every preset job renders, job.preset's first. """
+    names = output_filenames(job.name, job.take, job.task_code, job.presets)
+    return [(preset, os.path.join(job.output_dir, name)) for preset, name in zip(job.presets, names)]
+
+
+def job_output_file(job):
+    return job_outputs(job)[0][1]
+
+
+def job_frame_step(job):
+    # Frames can only be skipped when every output of the job is a proxy, they
+    # all come from the same decode
+    if job.frame_step > 1 and all(proxy_scale(preset) > 1 for preset in job.presets):
+        return job.frame_step
+    return 1
+
+
+def rendered_frames(job, frame_count):
+    """ Frames written for frame_count frames of the sequence. """
+    step = job_frame_step(job)
+    return -(-frame_count // step)
+
+
+def decode_lowres(job, sequence):
+    """ The -lowres level to decode at (1 = half size, 2 = quarter), 0 for full size.
+
+    Only proxy-only jobs of formats whose decoder supports it decode smaller,
+    at the size of their largest proxy.
+    """
+    if sequence.ext.lower() not in LOWRES_DECODERS:
+        return 0
+    scale = min(proxy_scale(preset) for preset in job.presets)
+    return scale.bit_length() - 1
+
+
+def partial_file(output_file, tag=None):
+    """ Hidden name output_file is rendered under until it is complete. tag
+    (a farm worker's name) keeps renders of the same output apart. """
+    folder, name = os.path.split(output_file)
+    base, ext = os.path.splitext(name)
+    if tag:
+        base += "." + re.sub(r"[^\w.-]+", "_", tag)
+    return os.path.join(folder, f".{base}.partial{ext}")
+
+
+def render_fingerprint(job, sequence, ffmpeg, stamps=None, preset=None):
+    """ Returns (digest, settings) describing everything the output of preset
+    (job.preset by default) depends on. """
+    preset = preset or job.preset
+    codec = job_codec(job, preset, ffmpeg)
+    settings = {
+        "fps": job.fps,
+        "preset": preset,
+        "preset_args": PRESETS.get(preset, {}).get("args", []),
+        "codec": codec,
+        "encode_args": list(video_encode_args(codec)),
+        "ffmpeg": get_capabilities(ffmpeg).ffmpeg_version,
+    }
+    if proxy_scale(preset) > 1:
+        settings["frame_step"] = job_frame_step(job)
+    if job.audio:
+        settings["audio"] = [AUDIO_CODEC, AUDIO_BITRATE, AUDIO_SAMPLE_RATE]
+    return rendercache.fingerprint(sequence, job.audio, settings, stamps), settings
+
+
+def cache_state(job, ffmpeg=None):
+    """ rendercache state of job's outputs, None without a sequence.
+
+    UP_TO_DATE or NEW when every output is, CHANGED otherwise.
+    """
+    sequence = main_sequence(job.folder)
+    if sequence is None:
+        return None
+    ffmpeg = ffmpeg or ffmpeg_path()
+    stamps = rendercache.frame_stamps(sequence)
+    states = {rendercache.check(output_file, render_fingerprint(job, sequence, ffmpeg, stamps, preset)[0])
+              for preset, output_file in job_outputs(job)}
+    return states.pop() if len(states) == 1 else rendercache.CHANGED
+
+
+def pipes_frames(job, sequence):
+    # Pipe input mode falls back to prefetching for ffmpeg to read (TIFF, EXR)
+    return job.input_mode == INPUT_PIPE and pipe_decoder(sequence) is not None
+
+
+def frame_feeder(job, sequence, first_frame=None, frame_count=None):
+    """ The FrameFeeder for job's input mode, None when ffmpeg reads the frames unaided. """
+    if job.input_mode != INPUT_PIPE:
+        return None
+    paths = frame_paths(sequence, first_frame, frame_count)[::job_frame_step(job)]
+    return FrameFeeder(paths, pipe=pipes_frames(job, sequence))
+
+
+def audio_args(job, sequence, audio=None):
+    # (input args, per output args) for the job's audio: audio, the source
+    # conformed by audiocache, is cut to the sequence's length and stream
+    # copied, without it the source itself is encoded
+    if audio:
+        return ["-t", f"{sequence.length / float(job.fps):.6f}", "-i", audio], ["-c:a", "copy"]
+    return ["-i", job.audio], []
+
+
+def build_command(job, ffmpeg, sequence, concat_list=None, segment=None, outputs=None, codecs=None, audio=None):
+    """ Returns the ffmpeg command rendering sequence with job's settings.
+
+    outputs is [(preset, output file)], job_outputs(job) by default. ffmpeg
+    decodes the frames once and hands them to one encoder per output, codecs
+    ({preset: encoder}) overrides the encoder the job's settings pick.
+    concat_list is the ffconcat file to read from when the sequence has gaps.
+    segment (first_frame, frame_count) renders only that part of the sequence,
+    without audio. When frames are piped in (see framefeed) ffmpeg reads them
+    from stdin, gaps already filled by frame_paths(). Frame stepped proxies
+    (see job_frame_step) read every n-th frame through the concat list or the
+    pipe, at a frame rate n times lower. audio is the job's conformed audio
+    (see audiocache), muxed by stream copy.
+    """
+    outputs = outputs or job_outputs(job)
+    first_frame, frame_count = segment or (sequence.first, sequence.length)
+    output_args = []  # Given to every output
+    step = job_frame_step(job)
+    rate = job.fps if step == 1 else f"{float(job.fps) / step:.6g}"
+    lowres = decode_lowres(job, sequence)
+    decode_args = ["-lowres", str(lowres)] if lowres else []
+
+    if pipes_frames(job, sequence):
+        video_input = ["-f", "image2pipe", "-framerate", rate, "-c:v", pipe_decoder(sequence), *decode_args,
+                       "-i", "pipe:0"]
+    elif concat_list:
+        video_input = ["-f", "concat", "-safe", "0", *decode_args, "-i", concat_list]
+        output_args += ["-r", rate, "-frames:v", str(rendered_frames(job, frame_count))]
+    elif sequence.still:
+        # One unnumbered image, read as it is named
+        video_input = ["-f", "image2", "-pattern_type", "none", "-framerate", job.fps, *decode_args,
+                       "-i", sequence.path(first_frame)]
+    else:
+        video_input = ["-start_number", str(first_frame), "-framerate", job.fps, *decode_args,
+                       "-i", sequence.path_pattern]
+        if segment:
+            output_args += ["-frames:v", str(frame_count)]
+    if job.threads:
+        output_args += ["-threads", str(job.threads)]
+
+    # Add audio if provided
+    audio_input, audio_output, maps = [], [], ["-map", "0:v:0"]
+    if job.audio and not segment:
+        audio_input, audio_output = audio_args(job, sequence, audio)
+        maps += ["-map", "1:a:0?"]
+
+    input_args = []
+    encodes = []
+    for preset, output_file in outputs:
+        codec = (codecs or {}).get(preset) or job_codec(job, preset, ffmpeg)
+        hw_input_args, pixel_args = video_encode_args(codec)
+        if hw_input_args and not _contains(input_args, hw_input_args):
+            input_args += hw_input_args
+        # Frames decoded at reduced size only need the rest of the way down
+        scale = proxy_scale(preset) >> lowres
+        scale_args = ["-vf", f"scale=trunc(iw/{scale * 2})*2:-2:flags=bilinear"] if scale > 1 else []
+        encodes += [
+            *maps,
+            "-c:v", codec,
+            *output_args,
+            *pixel_args,
+            # After the encoder's defaults, so a preset can override them
+            *PRESETS.get(preset, {"args": []})["args"],
+            *scale_args,
+            *audio_output,
+            "-y",
+            output_file,
+        ]
+
+    return [
+        ffmpeg,
+        "-hide_banner",
+        # Machine readable progress on stdout, the human readable log stays on stderr
+        "-nostats", "-progress", "pipe:1",
+        *input_args,
+        *video_input,
+        *audio_input,
+        *encodes,
+    ]
+
+
+def _contains(args, part):
+    return any(args[i:i + len(part)] == part for i in range(len(args) - len(part) + 1))
+
+
+def build_join_command(job, ffmpeg, segment_list, output_file, sequence=None, audio=None):
+    # Joins the encoded segments listed in segment_list by stream copy and muxes
+    # the audio once. Segments start at 0, so the audio lines up with frame one
+    # just like in a single pass render. audio (conformed, see audio_args) needs
+    # the sequence it is cut to.
+    cmd = [
+        ffmpeg,
+        "-hide_banner",
+        "-nostats", "-progress", "pipe:1",
+        "-f", "concat", "-safe", "0", "-i", segment_list,
+    ]
+    audio_output = []
+    if job.audio:
+        audio_input, audio_output = audio_args(job, sequence, audio)
+        cmd += [*audio_input, "-map", "0:v:0", "-map", "1:a:0?"]
+    cmd += ["-c:v", "copy", *audio_output, "-y", output_file]
+    return cmd
+
+
+def split_frames(first, length, chunks):
+    """ Cuts first..first+length-1 into up to chunks (first_frame, frame_count) segments. """
+    chunks = max(1, min(chunks, length // MIN_CHUNK_FRAMES))
+    size, extra = divmod(length, chunks)
+    segments = []
+    for index in range(chunks):
+        count = size + (1 if index < extra else 0)
+        segments.append((first, count))
+        first += count
+    return segments
+
+
+def iter_progress_blocks(stream):
+    # Parses the key=value output of ffmpeg's "-progress pipe:1". ffmpeg writes a
+    # block of stats terminated by a "progress=continue" (or "progress=end") line,
+    # yield each block as a dict once it is complete.
+    block = {}
+    for line in stream:
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            continue
+        block[key] = value
+        if key == "progress":
+            yield block
+            block = {}
+
+
+def run_ffmpeg_process(cmd, total_frames, progress_callback, log_callback, metrics=None, key=0, feed=None,
+                       stop_event=None):
+    """ Runs cmd, reporting progress and log lines. Returns (success, error_msg).
+
+    metrics (a JobMetrics) gets ffmpeg's -progress stats, key tells apart the
+    processes of a chunked render. feed (a FrameFeeder) runs on a thread of
+    its own while ffmpeg does, writing to its stdin when frames are piped in.
+    Setting stop_event kills ffmpeg.
+    """
+    if stop_event and stop_event.is_set():
+        return False, STOPPED_ERROR
+    try:
+        process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE if feed and feed.pipe else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            creationflags=CREATE_NO_WINDOW
+        )
+    except OSError as e:
+        return False, str(e)
+    stdout = io.TextIOWrapper(process.stdout, encoding="utf-8", errors="replace")
+    stderr = io.TextIOWrapper(process.stderr, encoding="utf-8", errors="replace")
+    # Only the tail of the log is kept for the error report
+    output_tail = deque(maxlen=LOG_TAIL_LINES)
+    feed_errors = []
+
+    def write_frames():
+        try:
+            feed(process.stdin)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # ffmpeg exited, its log says why
+        except Exception as e:
+            # A frame could not be read, don't let ffmpeg finish a short video
+            feed_errors.append(f"Reading frames failed: {e}")
+            process.kill()
+        finally:
+            if process.stdin:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+
+    feeder = None
+    if feed:
+        feeder = threading.Thread(target=write_frames, daemon=True)
+        feeder.start()
+
+    def read_log():
+        for line in stderr:
+            line = line.rstrip()
+            output_tail.append(line)
+            log_callback(line)
+
+    log_reader = threading.Thread(target=read_log, daemon=True)
+    log_reader.start()
+    if stop_event:
+        def watch_stop():
+            while process.poll() is None:
+                if stop_event.wait(STOP_POLL_INTERVAL):
+                    process.kill()
+                    return
+
+        threading.Thread(target=watch_stop, daemon=True).start()
+    if metrics:
+        metrics.process_started(key, process.pid)
+    for block in iter_progress_blocks(stdout):
+        if metrics:
+            metrics.update_progress(key, block)
+        frame = block.get("frame", "")
+        if frame.isdigit():
+            if feed:
+                feed.advance(int(frame))
+            progress_callback(min(int(frame), total_frames), total_frames)
+    process.wait()
+    log_reader.join()
+    if feeder:
+        feed.stop()
+        feeder.join()
+    if stop_event and stop_event.is_set():
+        return False, STOPPED_ERROR
+    if feed_errors:
+        return False, "\n".join(feed_errors)
+    if process.returncode == 0:
+        return True, ""
+    return False, "\n".join(output_tail)
+
+
+def run_job(job, progress_callback=None, log_callback=None, ffmpeg=None, metrics=None, stop_event=None,
+            partial_tag=None):
+    """ Renders job, blocking until ffmpeg exits. Safe to call from any thread.
+
+    The returned RenderResult carries the job's JobMetrics (pass one in to
+    watch fps and ETA while it renders). Setting stop_event stops the render,
+    partial_tag goes into the names of its partial files (see partial_file).
+    """
+    metrics = metrics or JobMetrics(job.name, job.folder)
+    metrics.started = time.monotonic()  # Created when queued, timed from here
+    result = _run_job(job, progress_callback, log_callback or (lambda line: None), ffmpeg or ffmpeg_path(), metrics,
+                      stop_event, partial_tag)
+    metrics.finish(result)
+    result.metrics = metrics
+    return result
+
+
+def _run_job(job, progress_callback, log_callback, ffmpeg, metrics, stop_event=None, partial_tag=None):
+    def on_progress(frame, total):
+        metrics.set_frames(frame, total)
+        if progress_callback:
+            progress_callback(frame, total)
+
+    with metrics.phase("scan"):
+        sequence = main_sequence(job.folder)
+    if sequence is None:
+        return RenderResult(False, "No image files found.")
+
+    # Missing frames are held, so the video covers the whole frame range
+    total_frames = rendered_frames(job, sequence.length)
+    on_progress(0, total_frames)
+
+    outputs = job_outputs(job)
+    try:
+        with metrics.phase("probe"):
+            stamps = rendercache.frame_stamps(sequence)
+            metrics.input_bytes = sum(stamp[0] for _, stamp in stamps if stamp)
+            fingerprints = {preset: render_fingerprint(job, sequence, ffmpeg, stamps, preset)
+                            for preset, _ in outputs}
+    except Exception as e:
+        return RenderResult(False, str(e))
+    # Only the outputs that changed are encoded, the others are left alone
+    stale = [(preset, output_file) for preset, output_file in outputs
+             if job.force or rendercache.check(output_file, fingerprints[preset][0]) != rendercache.UP_TO_DATE]
+    if not stale:
+        log_callback("Frames, audio and settings unchanged since the last render, skipped")
+        on_progress(total_frames, total_frames)
+        return RenderResult(True, "", outputs[0][1], skipped=True)
+    for preset, output_file in outputs:
+        if (preset, output_file) not in stale:
+            log_callback(f"{os.path.basename(output_file)} unchanged since the last render, skipped")
+    for _, output_file in stale:
+        rendercache.discard_manifest(output_file)
+
+    if job.input_mode == INPUT_PIPE and not pipes_frames(job, sequence):
+        log_callback(f"{sequence.ext} frames can't be piped to ffmpeg, prefetching them for it to read instead")
+    segments = split_frames(sequence.first, sequence.length, job.chunks)
+    if job_frame_step(job) > 1:
+        log_callback(f"Proxy render reading 1 of every {job.frame_step} frames")
+        segments = segments[:1]  # A stepped proxy reads few frames, one pass is quicker than joining segments
+    elif job.frame_step > 1:
+        log_callback("Frame step ignored, only renders with nothing but proxy presets can skip frames")
+    # An encoder that fails to start is retried down its fallback chain
+    capabilities = get_capabilities(ffmpeg)
+    chains = {preset: fallback_chain(job_codec(job, preset, ffmpeg), capabilities) for preset, _ in stale}
+    codecs = {preset: chain[0] for preset, chain in chains.items()}
+    # ffmpeg writes hidden partial files that are only renamed to the output
+    # names once complete, a crash never leaves a finished looking movie
+    partials = [(preset, partial_file(output_file, partial_tag)) for preset, output_file in stale]
+    # The audio source is conformed once and then stream copied into each render
+    audio = None
+    if job.audio:
+        with metrics.phase("audio"):
+            audio = audio_cache().get(job.audio, ffmpeg, log_callback)
+    while True:
+        for preset, output_file in stale:
+            log_callback(f"Encoding {os.path.basename(output_file)} with {codecs[preset]}")
+        metrics.encoders = dict(codecs)
+        if len(segments) > 1:
+            result = run_chunked_job(job, sequence, partials, segments, on_progress, log_callback, ffmpeg, metrics,
+                                     codecs, audio, stop_event)
+        else:
+            with metrics.phase("encode"):
+                result = run_single_job(job, sequence, partials, on_progress, log_callback, ffmpeg, metrics, codecs,
+                                        audio, stop_event)
+        stopped = stop_event is not None and stop_event.is_set()
+        retry = not result.success and not stopped and encoder_init_failed(result.error)
+        fallback = next_codecs(codecs, chains) if retry else None
+        if fallback is None:
+            break
+        failed = sorted({codecs[preset] for preset in codecs if fallback[preset] != codecs[preset]})
+        log_callback(f"Encoding with {', '.join(failed)} failed, retrying with the next encoder")
+        codecs = fallback
+        on_progress(0, total_frames)
+    if result.success:
+        try:
+            for (_, partial), (_, output_file) in zip(partials, stale):
+                os.replace(partial, output_file)
+        except OSError as e:
+            result = RenderResult(False, f"Could not move the finished render into place: {e}")
+    if not result.success:
+        for _, partial in partials:
+            if os.path.exists(partial):
+                os.remove(partial)
+    result.output_file = stale[0][1]
+    result.output_files = [output_file for _, output_file in stale] if result.success else []
+    if result.success:
+        for preset, output_file in stale:
+            try:
+                rendercache.write_manifest(output_file, *fingerprints[preset])
+            except OSError as e:
+                log_callback(f"Could not write the render manifest: {e}")
+    return result
+
+
+def run_single_job(job, sequence, outputs, progress_callback, log_callback, ffmpeg, metrics=None, codecs=None,
+                   audio=None, stop_event=None):
+    # Renders the whole sequence to every (preset, output file) of outputs with one ffmpeg process
+    total_frames = rendered_frames(job, sequence.length)
+    step = job_frame_step(job)
+    concat_list = None
+    feed = frame_feeder(job, sequence)
+    try:
+        if sequence.has_gaps:
+            log_callback(f"Missing frames {sequence.describe_missing()}, holding previous frames")
+        if (sequence.has_gaps or step > 1) and not pipes_frames(job, sequence):
+            # image2 stops at the first missing frame, feed the frames through a
+            # concat list that holds the previous frame over each gap instead
+            # (and lists only every step-th frame)
+            fd, concat_list = tempfile.mkstemp(prefix="sadalchemist_", suffix=".ffconcat")
+            os.close(fd)
+            write_concat_list(sequence, job.fps, concat_list, step=step)
+        cmd = build_command(job, ffmpeg, sequence, concat_list, outputs=outputs, codecs=codecs, audio=audio)
+        success, error_msg = run_ffmpeg_process(cmd, total_frames, progress_callback, log_callback, metrics, feed=feed,
+                                                stop_event=stop_event)
+        if success:
+            progress_callback(total_frames, total_frames)
+        return RenderResult(success, error_msg, outputs[0][1], output_files=[f for _, f in outputs])
+    except Exception as e:
+        return RenderResult(False, str(e))
+    finally:
+        if concat_list:
+            os.remove(concat_list)
+
+
+def run_chunked_job(job, sequence, outputs, segments, progress_callback, log_callback, ffmpeg, metrics=None,
+                    codecs=None, audio=None, stop_event=None):
+    # Encodes each segment in its own ffmpeg process at the same time, then
+    # joins them with the concat demuxer without re-encoding. Codecs that scale
+    # poorly over threads (prores_ks) get close to one core per segment. Each
+    # segment is encoded for every output, and every output joined separately.
+    total_frames = sequence.length
+    output_file = outputs[0][1]
+    # Segments live next to the output so the join never copies across disks
+    work_dir = tempfile.mkdtemp(prefix=f".sadalchemist_{job.name}_", dir=job.output_dir)
+    progress_lock = threading.Lock()
+    done_frames = [0] * len(segments)
+    log_callback(f"Rendering in {len(segments)} segments of ~{segments[0][1]} frames")
+
+    def encode(index):
+        first_frame, frame_count = segments[index]
+        label = f"[segment {index + 1}/{len(segments)}]"
+        concat_list = None
+        feed = frame_feeder(job, sequence, first_frame, frame_count)
+        if sequence.has_gaps and not pipes_frames(job, sequence):
+            concat_list = os.path.join(work_dir, f"segment_{index:03d}.ffconcat")
+            write_concat_list(sequence, job.fps, concat_list, first_frame, first_frame + frame_count - 1)
+        segment_outputs = [(preset, os.path.join(work_dir, f"segment_{index:03d}_{n}.{preset_extension(preset)}"))
+                           for n, (preset, _) in enumerate(outputs)]
+        cmd = build_command(job, ffmpeg, sequence, concat_list, (first_frame, frame_count), segment_outputs, codecs)
+
+        def on_progress(frame, total):
+            with progress_lock:
+                done_frames[index] = frame
+                progress_callback(sum(done_frames), total_frames)
+
+        success, error_msg = run_ffmpeg_process(
+            cmd, frame_count, on_progress, lambda line: log_callback(f"{label} {line}"), metrics, index, feed,
+            stop_event)
+        return [f for _, f in segment_outputs], success, f"{label}\n{error_msg}" if error_msg else ""
+
+    try:
+        if sequence.has_gaps:
+            log_callback(f"Missing frames {sequence.describe_missing()}, holding previous frames")
+        with metrics.phase("encode"), ThreadPoolExecutor(max_workers=len(segments)) as pool:
+            results = list(pool.map(encode, range(len(segments))))
+        errors = [error_msg for _, success, error_msg in results if not success]
+        if errors:
+            return RenderResult(False, "\n".join(errors), output_file)
+
+        with metrics.phase("join"):
+            for n, (_, joined_file) in enumerate(outputs):
+                segment_list = os.path.join(work_dir, f"segments_{n}.ffconcat")
+                with open(segment_list, "w", encoding="utf-8") as f:
+                    f.write("ffconcat version 1.0\n")
+                    for segment_files, _, _ in results:
+                        f.write(f"file '{os.path.basename(segment_files[n])}'\n")
+                log_callback(f"Joining segments into {os.path.basename(joined_file)}")
+                success, error_msg = run_ffmpeg_process(
+                    build_join_command(job, ffmpeg, segment_list, joined_file, sequence, audio),
+                    total_frames, lambda frame, total: None, log_callback, stop_event=stop_event)
+                if not success:
+                    return RenderResult(False, error_msg, joined_file)
+        progress_callback(total_frames, total_frames)
+        return RenderResult(True, "", output_file, output_files=[f for _, f in outputs])
+    except Exception as e:
+        return RenderResult(False, str(e))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
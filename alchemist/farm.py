@@ -0,0 +1,297 @@
+"""Render farm mode: a small job broker and the workers that pull from it.
+
+The broker keeps jobs in SQLite and serves a tiny JSON API over HTTP. Workers
+(``python -m alchemist --worker http://host:8765``) lease one job at a time,
+render it with the same engine as the GUI, heartbeat their progress and report
+the result. A job whose worker stops heartbeating is requeued once its lease
+expires, failed jobs are retried up to max_attempts.
+
+Folders, audio and output paths are passed as-is, so every worker needs to
+see the same paths (shared storage mounted identically).
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .appdata import app_data_dir
+from .binaries import ffmpeg_path
+from .engine import RenderJob, run_job
+from .joblog import JobLog, prune_logs
+
+DEFAULT_PORT = 8765
+LEASE_SECONDS = 60
+HEARTBEAT_INTERVAL = 5
+POLL_INTERVAL = 3
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Job states
+QUEUED, LEASED, DONE, FAILED = "queued", "leased", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    frame INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    output TEXT,
+    error TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch);
+CREATE TABLE IF NOT EXISTS workers (
+    name TEXT PRIMARY KEY,
+    last_seen REAL,
+    job_id INTEGER
+);
+"""
+
+
+class FarmError(Exception):
+    pass
+
+
+class Broker:
+    # Job bookkeeping, shared by every request thread of the HTTP server
+    def __init__(self, db_path=None, lease_seconds=LEASE_SECONDS):
+        self.db_path = db_path or os.path.join(app_data_dir(), "farm.db")
+        self.lease_seconds = lease_seconds
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def submit(self, jobs, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        batch = uuid.uuid4().hex
+        now = time.time()
+        with self.lock, self.db:
+            ids = [self.db.execute(
+                "INSERT INTO jobs (batch, spec, max_attempts, updated) VALUES (?, ?, ?, ?)",
+                (batch, json.dumps(job), max_attempts, now)).lastrowid for job in jobs]
+        return {"batch": batch, "jobs": ids}
+
+    def _expire_leases(self, now):
+        # Jobs whose worker went quiet go back to the queue (or fail once they
+        # have used up their attempts)
+        expired = self.db.execute(
+            "SELECT id, attempts, max_attempts FROM jobs WHERE state = ? AND lease_expires < ?",
+            (LEASED, now)).fetchall()
+        for job in expired:
+            state = QUEUED if job["attempts"] < job["max_attempts"] else FAILED
+            self.db.execute(
+                "UPDATE jobs SET state = ?, worker = NULL, error = ?, updated = ? WHERE id = ?",
+                (state, "Worker stopped responding (lease expired)", now, job["id"]))
+
+    def lease(self, worker):
+        now = time.time()
+        with self.lock, self.db:
+            self._expire_leases(now)
+            self.db.execute(
+                "INSERT INTO workers (name, last_seen, job_id) VALUES (?, ?, NULL) "
+                "ON CONFLICT(name) DO UPDATE SET last_seen = excluded.last_seen, job_id = NULL",
+                (worker, now))
+            job = self.db.execute(
+                "SELECT id, spec, attempts FROM jobs WHERE state = ? ORDER BY id LIMIT 1", (QUEUED,)).fetchone()
+            if job is None:
+                return {"job": None}
+            self.db.execute(
+                "UPDATE jobs SET state = ?, worker = ?, attempts = attempts + 1, lease_expires = ?, "
+                "frame = 0, error = NULL, updated = ? WHERE id = ?",
+                (LEASED, worker, now + self.lease_seconds, now, job["id"]))
+            self.db.execute("UPDATE workers SET job_id = ? WHERE name = ?", (job["id"], worker))
+        return {"job": {"id": job["id"], "attempt": job["attempts"] + 1, "spec": json.loads(job["spec"]),
+                        "lease_seconds": self.lease_seconds}}
+
+    def heartbeat(self, worker, job_id, frame=0, total=0):
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute("UPDATE workers SET last_seen = ? WHERE name = ?", (now, worker))
+            updated = self.db.execute(
+                "UPDATE jobs SET lease_expires = ?, frame = ?, total = ?, updated = ? "
+                "WHERE id = ? AND worker = ? AND state = ?",
+                (now + self.lease_seconds, frame, total, now, job_id, worker, LEASED)).rowcount
+        # A lost lease tells the worker its job was handed to someone else
+        return {"ok": bool(updated)}
+
+    def complete(self, worker, job_id, success, error="", output=None):
+        now = time.time()
+        with self.lock, self.db:
+            job = self.db.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND worker = ? AND state = ?",
+                (job_id, worker, LEASED)).fetchone()
+            if job is None:
+                return {"ok": False}
+            if success:
+                state = DONE
+            else:
+                state = QUEUED if job["attempts"] < job["max_attempts"] else FAILED
+            self.db.execute(
+                "UPDATE jobs SET state = ?, worker = ?, lease_expires = NULL, output = ?, error = ?, "
+                "frame = CASE WHEN ? THEN total ELSE frame END, updated = ? WHERE id = ?",
+                (state, worker if success else None, output, error, success, now, job_id))
+            self.db.execute("UPDATE workers SET last_seen = ?, job_id = NULL WHERE name = ?", (now, worker))
+        return {"ok": True}
+
+    def batch_status(self, batch):
+        with self.lock, self.db:
+            self._expire_leases(time.time())
+            rows = self.db.execute(
+                "SELECT id, state, attempts, worker, frame, total, output, error FROM jobs "
+                "WHERE batch = ? ORDER BY id", (batch,)).fetchall()
+        return {"batch": batch, "jobs": [dict(row) for row in rows]}
+
+    def workers(self):
+        with self.lock:
+            rows = self.db.execute("SELECT name, last_seen, job_id FROM workers ORDER BY name").fetchall()
+        return {"workers": [dict(row) for row in rows]}
+
+
+class BrokerRequestHandler(BaseHTTPRequestHandler):
+    # POST /submit, /lease, /heartbeat, /complete and GET /batch/<id>, /workers
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        broker = self.server.broker
+        if self.path.startswith("/batch/"):
+            self._reply(200, broker.batch_status(self.path[len("/batch/"):]))
+        elif self.path == "/workers":
+            self._reply(200, broker.workers())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        broker = self.server.broker
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            data = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/submit":
+                result = broker.submit(data["jobs"], int(data.get("max_attempts", DEFAULT_MAX_ATTEMPTS)))
+            elif self.path == "/lease":
+                result = broker.lease(data["worker"])
+            elif self.path == "/heartbeat":
+                result = broker.heartbeat(data["worker"], data["job"], data.get("frame", 0), data.get("total", 0))
+            elif self.path == "/complete":
+                result = broker.complete(data["worker"], data["job"], bool(data["success"]),
+                                         data.get("error", ""), data.get("output"))
+            else:
+                self._reply(404, {"error": "not found"})
+                return
+        except (KeyError, ValueError, TypeError) as e:
+            self._reply(400, {"error": str(e)})
+            return
+        self._reply(200, result)
+
+    def log_message(self, format, *args):
+        pass  # Workers poll constantly, keep the console quiet
+
+
+def serve_broker(host="127.0.0.1", port=DEFAULT_PORT, db_path=None):
+    """ Runs the broker until interrupted. Use host 0.0.0.0 to accept other machines. """
+    server = ThreadingHTTPServer((host, port), BrokerRequestHandler)
+    server.broker = Broker(db_path)
+    print(f"SadAlchemist farm broker on http://{host}:{port} ({server.broker.db_path})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def _request(url, path, payload=None, timeout=10):
+    data = None if payload is None else json.dumps(payload).encode("utf-8")
+    request = urllib.request.Request(url.rstrip("/") + path, data=data,
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        raise FarmError(f"Farm broker at {url} not reachable: {e}") from e
+
+
+def submit_batch(url, jobs, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """ Queues RenderJobs on the broker, returns {"batch": id, "jobs": [job ids]}. """
+    return _request(url, "/submit", {"jobs": [job.to_dict() for job in jobs], "max_attempts": max_attempts})
+
+
+def batch_status(url, batch):
+    return _request(url, f"/batch/{batch}")
+
+
+def run_worker(url, name=None, log_callback=print, stop_event=None):
+    """ Leases and renders jobs from the broker until stop_event is set. """
+    name = name or f"{socket.gethostname()}-{os.getpid()}"
+    stop_event = stop_event or threading.Event()
+    ffmpeg = ffmpeg_path()
+    log_callback(f"Worker {name} pulling jobs from {url}")
+    while not stop_event.is_set():
+        try:
+            lease = _request(url, "/lease", {"worker": name})["job"]
+        except FarmError as e:
+            log_callback(str(e))
+            stop_event.wait(POLL_INTERVAL)
+            continue
+        if lease is None:
+            stop_event.wait(POLL_INTERVAL)
+            continue
+
+        job = RenderJob.from_dict(lease["spec"])
+        job_id = lease["id"]
+        log_callback(f"Job {job_id} (attempt {lease['attempt']}): {job.folder}")
+        progress = {"frame": 0, "total": 0}
+        done = threading.Event()
+        lease_lost = threading.Event()
+
+        def heartbeat():
+            while not done.wait(HEARTBEAT_INTERVAL):
+                try:
+                    reply = _request(url, "/heartbeat", {"worker": name, "job": job_id, **progress})
+                except FarmError as e:
+                    log_callback(str(e))
+                    continue
+                if not reply.get("ok"):
+                    # The lease expired and the job may be rendering elsewhere already
+                    lease_lost.set()
+                    return
+
+        beat = threading.Thread(target=heartbeat, daemon=True)
+        beat.start()
+        prune_logs()  # A worker's batch is the one job it leased
+        job_log = JobLog(f"farm{job_id}_{job.name}")
+        result = run_job(job, lambda frame, total: progress.update(frame=frame, total=total),
+                         job_log.append, ffmpeg=ffmpeg, stop_event=lease_lost, partial_tag=name)
+        job_log.close()
+        done.set()
+        beat.join()
+        if lease_lost.is_set():
+            log_callback(f"Job {job_id} lease lost, render stopped (log: {job_log.path})")
+            continue  # Not ours to complete any more
+        log_callback(f"Job {job_id} {'done' if result.success else 'failed'}: {result.output_file or result.error}"
+                     f" (log: {job_log.path})")
+        for _ in range(3):
+            try:
+                _request(url, "/complete", {"worker": name, "job": job_id, "success": result.success,
+                                            "error": result.error, "output": result.output_file})
+                break
+            except FarmError as e:
+                log_callback(str(e))
+                stop_event.wait(POLL_INTERVAL)
@@ -0,0 +1,166 @@
+"""Prefetched frame input: read the frame files in parallel ahead of ffmpeg.
+
+ffmpeg's image2 demuxer opens and reads one frame file at a time, so on network
+storage a render mostly waits for the next file. In "pipe" input mode a small
+pool of reader threads fetches the frames ahead of the encoder (in frame order,
+READ_AHEAD frames in front of it):
+
+- Formats ffmpeg can split on a pipe (PNG, JPEG, BMP, DPX, PPM) are streamed
+  to ffmpeg's stdin, where the image2pipe demuxer picks them up. Large files
+  are memory-mapped and written straight from the mapping, so a big frame is
+  never copied into a Python buffer.
+- TIFF and EXR have no frame parser in ffmpeg, image2pipe can't tell where one
+  frame ends and the next begins. ffmpeg keeps reading those files itself and
+  the readers only pull them into the OS cache ahead of it, through one reused
+  buffer per reader, paced by ffmpeg's progress.
+
+ffmpeg still decodes the frames. Decoding EXR/TIFF in Python would need extra
+dependencies for little gain, the stall this removes is the file I/O.
+"""
+import mmap
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# RenderJob.input_mode values
+INPUT_FILES = "files"  # ffmpeg reads the frames itself (image2 demuxer)
+INPUT_PIPE = "pipe"    # Frames are prefetched here, piped to ffmpeg where the format allows
+INPUT_MODES = (INPUT_FILES, INPUT_PIPE)
+
+# Reader threads and how many frames they may fetch ahead of the encoder
+READERS = 4
+READ_AHEAD = 16
+
+# Files at least this big are memory-mapped instead of read into memory
+MMAP_MIN_BYTES = 1024 * 1024
+
+# Buffer each reader reuses when only warming the OS cache
+WARM_CHUNK_BYTES = 4 * 1024 * 1024
+
+# Decoder for each extension image2pipe can split into frames
+PIPE_DECODERS = {
+    ".png": "png", ".jpg": "mjpeg", ".jpeg": "mjpeg", ".bmp": "bmp",
+    ".dpx": "dpx", ".ppm": "ppm",
+}
+
+
+def pipe_decoder(sequence):
+    """ The decoder to pipe sequence's frames into, None when they can't be piped. """
+    return PIPE_DECODERS.get(sequence.ext.lower())
+
+
+def frame_paths(sequence, first=None, count=None):
+    """ The file for every output frame from first on, missing frames repeat the frame before. """
+    first = sequence.first if first is None else first
+    count = sequence.length if count is None else count
+    present = set(sequence.frames)
+    held = max(f for f in sequence.frames if f <= first)
+    paths = []
+    for frame in range(first, first + count):
+        if frame in present:
+            held = frame
+        paths.append(sequence.path(held))
+    return paths
+
+
+def read_frame(path):
+    # Returns the file's contents as bytes or a read-only mmap (which keeps its
+    # own handle, so the file can be closed right away)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_MIN_BYTES:
+            return f.read()
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(data, "madvise"):
+        # Start reading the whole file now, the writer touches it later
+        data.madvise(mmap.MADV_WILLNEED)
+    return data
+
+
+class FrameFeeder:
+    # Called by run_ffmpeg_process on a thread of its own, with ffmpeg's stdin
+    # when pipe is set (and None otherwise). advance() gets ffmpeg's progress.
+    def __init__(self, paths, pipe=True, readers=READERS, read_ahead=READ_AHEAD):
+        self.paths = paths
+        self.pipe = pipe
+        self.readers = readers
+        self.read_ahead = read_ahead
+        self.position = 0  # Frames ffmpeg has encoded so far
+        self.moved = threading.Condition()
+        self.stopped = False
+        self.buffers = threading.local()
+
+    def advance(self, frame):
+        with self.moved:
+            self.position = frame
+            self.moved.notify_all()
+
+    def stop(self):
+        with self.moved:
+            self.stopped = True
+            self.moved.notify_all()
+
+    def __call__(self, stdin):
+        if self.pipe:
+            self._write(stdin)
+        else:
+            self._warm()
+
+    def _write(self, stdin):
+        # Writing to the pipe blocks while ffmpeg is busy, that paces the readers
+        remaining = iter(self.paths)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.readers) as pool:
+            def fill():
+                while len(pending) < self.read_ahead:
+                    path = next(remaining, None)
+                    if path is None:
+                        return
+                    pending.append(pool.submit(read_frame, path))
+
+            try:
+                fill()
+                while pending:
+                    data = pending.popleft().result()
+                    fill()
+                    try:
+                        stdin.write(data)
+                    finally:
+                        if isinstance(data, mmap.mmap):
+                            data.close()
+            finally:
+                # Stopped early (ffmpeg exited or a read failed): drop what was prefetched
+                for future in pending:
+                    if not future.cancel() and future.exception() is None:
+                        data = future.result()
+                        if isinstance(data, mmap.mmap):
+                            data.close()
+
+    def _warm_file(self, path):
+        buffer = getattr(self.buffers, "buffer", None)
+        if buffer is None:
+            buffer = self.buffers.buffer = bytearray(WARM_CHUNK_BYTES)
+        with open(path, "rb", buffering=0) as f:
+            while f.readinto(buffer):
+                pass
+
+    def _warm(self):
+        # Held frames repeat a path, each file only needs reading once
+        first_use = {}
+        for index, path in enumerate(self.paths):
+            first_use.setdefault(path, index)
+        with ThreadPoolExecutor(max_workers=self.readers) as pool:
+            futures = deque()
+            for path, index in first_use.items():
+                with self.moved:
+                    while not self.stopped and index >= self.position + self.read_ahead:
+                        self.moved.wait()
+                    if self.stopped:
+                        break
+                futures.append(pool.submit(self._warm_file, path))
+                while len(futures) > self.readers * 2:
+                    # A file that can't be read fails the render, like in ffmpeg
+                    futures.popleft().result()
+            for future in futures:
+                future.result()
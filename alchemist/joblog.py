@@ -0,0 +1,124 @@
+"""Per-job ffmpeg logs: the full log on disk, a bounded tail in memory.
+
+Every render job gets a JobLog. Each line is appended to a log file in the app
+data ``logs`` folder (rotated once it grows past MAX_LOG_BYTES) and to a
+fixed-size ring buffer that the GUI reads from. A chatty 20,000 frame render
+costs the same memory as a short one, and nothing is lost when the next job
+starts.
+
+A queued job's log can be created without its file, which is only opened once
+the job starts and closed when it finishes, so a batch of thousands of jobs
+holds one descriptor per running render. prune_logs() keeps the newest
+MAX_LOG_FILES files, it runs once before a batch starts.
+"""
+import itertools
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from .appdata import app_data_dir
+
+# Lines kept in memory per job for the log view
+RING_LINES = 5000
+
+# A job's log file is rotated to "<name>.log.1" once it reaches this size
+MAX_LOG_BYTES = 16 * 1024 * 1024
+
+# Oldest log files beyond this count are removed before a batch starts
+MAX_LOG_FILES = 200
+
+_serial = itertools.count(1)  # Keeps names unique for jobs started in the same second
+
+
+def log_dir():
+    return app_data_dir("logs")
+
+
+def prune_logs(folder=None, keep=MAX_LOG_FILES, exclude=()):
+    """ Removes all but the newest keep log files of folder, never those in exclude (logs still in use). """
+    exclude = {os.path.normcase(os.path.abspath(path)) for path in exclude if path}
+    exclude |= {path + ".1" for path in exclude}  # Their rotated halves
+    try:
+        with os.scandir(folder or log_dir()) as entries:
+            logs = sorted((e for e in entries if e.is_file() and ".log" in e.name
+                           and os.path.normcase(os.path.abspath(e.path)) not in exclude),
+                          key=lambda e: e.stat().st_mtime, reverse=True)
+    except OSError:
+        return
+    for entry in logs[keep:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+class JobLog:
+    # Thread-safe, written from the render thread and read from the GUI thread
+    def __init__(self, name, folder=None, ring_lines=RING_LINES, max_bytes=MAX_LOG_BYTES, open_file=True):
+        self.name = name
+        self.lock = threading.Lock()
+        self.ring = deque(maxlen=ring_lines)
+        self.count = 0  # Lines appended so far, including those dropped from the ring
+        self.max_bytes = max_bytes
+        self.folder = folder
+        self.path = None
+        self.file = None
+        if open_file:
+            self.open()
+
+    def open(self):
+        """ Opens the log file (once), lines appended before go into it first. """
+        with self.lock:
+            if self.file or self.path:
+                return
+            safe_name = re.sub(r"[^\w.-]+", "_", self.name)
+            path = os.path.join(self.folder or log_dir(),
+                                f"{time.strftime('%Y%m%d-%H%M%S')}_{safe_name}_{os.getpid()}-{next(_serial)}.log")
+            try:
+                self.file = open(path, "a", encoding="utf-8", errors="replace")
+            except OSError:
+                return  # Logging to disk is best effort, the ring still works
+            self.path = path
+            if self.ring:
+                self.file.write("\n".join(self.ring) + "\n")
+
+    def append(self, line):
+        with self.lock:
+            self.ring.append(line)
+            self.count += 1
+            if self.file:
+                self.file.write(line + "\n")
+                if self.file.tell() >= self.max_bytes:
+                    self._rotate()
+
+    def _rotate(self):
+        self.file.close()
+        try:
+            os.replace(self.path, self.path + ".1")
+            self.file = open(self.path, "w", encoding="utf-8", errors="replace")
+        except OSError:
+            self.file = None
+
+    def since(self, count):
+        """ Returns (lines appended after count that are still in the ring, current count). """
+        with self.lock:
+            new = min(self.count - count, len(self.ring))
+            lines = list(self.ring)[len(self.ring) - new:] if new > 0 else []
+            return lines, self.count
+
+    def lines(self):
+        with self.lock:
+            return list(self.ring)
+
+    def flush(self):
+        with self.lock:
+            if self.file:
+                self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
@@ -0,0 +1,203 @@
+"""Cached ffprobe metadata of audio/video sources.
+
+Every source is probed once with ffprobe's JSON output: its streams (type,
+codec, sample rate, channels and layout), container duration and whether it
+has audio at all. Results are cached in memory and on disk keyed by the file's
+path, size and mtime, so a file chosen again (in this session or the next)
+costs a stat instead of an ffprobe process, and anything that needs a duration
+later on (checking an audio source against its sequence) reads the cache.
+
+Probes run wherever the caller likes: the GUI starts them on its worker pool,
+probe_many() spreads a batch over a thread pool for the command line.
+"""
+import json
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .appdata import app_data_dir, read_json, write_json_atomic
+from .binaries import CREATE_NO_WINDOW, ffprobe_path
+
+CACHE_FORMAT = 1
+CACHE_FILE = "media_info.json"
+
+# Least recently used entries beyond this count are dropped when saving
+MAX_ENTRIES = 5000
+
+# ffprobe processes probe_many() runs at once
+PROBE_WORKERS = 4
+
+# Audio this much longer or shorter than its sequence (in frames) is flagged
+MISMATCH_FRAMES = 1
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def probe_media(ffprobe, path):
+    """ Streams and duration of path, None if ffprobe itself could not run.
+
+    Files ffprobe can't read come back with no streams and an error, that is a
+    result worth caching too.
+    """
+    try:
+        result = subprocess.run(
+            [ffprobe, "-v", "error",
+             "-show_entries", "format=duration:stream=index,codec_type,codec_name,sample_rate,"
+                              "channels,channel_layout,duration",
+             "-of", "json", path],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            timeout=60, creationflags=CREATE_NO_WINDOW
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    try:
+        data = json.loads(result.stdout or "{}")
+    except ValueError:
+        data = {}
+    if result.returncode != 0 and not data.get("streams"):
+        return {"streams": [], "duration": None, "has_audio": False,
+                "error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unreadable"}
+    streams = [{
+        "index": stream.get("index"),
+        "type": stream.get("codec_type"),
+        "codec": stream.get("codec_name"),
+        "sample_rate": int(stream["sample_rate"]) if str(stream.get("sample_rate", "")).isdigit() else None,
+        "channels": stream.get("channels"),
+        "channel_layout": stream.get("channel_layout"),
+        "duration": _float(stream.get("duration")),
+    } for stream in data.get("streams", [])]
+    duration = _float(data.get("format", {}).get("duration"))
+    audio = [s for s in streams if s["type"] == "audio"]
+    if duration is None and audio:
+        duration = audio[0]["duration"]
+    return {"streams": streams, "duration": duration, "has_audio": bool(audio)}
+
+
+def first_audio_stream(info):
+    return next((s for s in info["streams"] if s["type"] == "audio"), None) if info else None
+
+
+def describe_audio(info):
+    # e.g. "pcm_s24le 48000 Hz stereo, 12.50 s"
+    stream = first_audio_stream(info)
+    if stream is None:
+        return "No audio stream"
+    parts = [stream["codec"] or "audio"]
+    if stream["sample_rate"]:
+        parts.append(f"{stream['sample_rate']} Hz")
+    if stream["channel_layout"] or stream["channels"]:
+        parts.append(stream["channel_layout"] or f"{stream['channels']} channels")
+    text = " ".join(parts)
+    if info["duration"] is not None:
+        text += f", {info['duration']:.2f} s"
+    return text
+
+
+def audio_mismatch(info, frames, fps):
+    """ Why info's audio doesn't fit a sequence of frames at fps, None when it does (or is unknown). """
+    try:
+        fps = float(fps)
+    except (TypeError, ValueError):
+        return None
+    if not info or not info["has_audio"] or info["duration"] is None or fps <= 0:
+        return None
+    video = frames / fps
+    difference = info["duration"] - video
+    if abs(difference) < MISMATCH_FRAMES / fps:
+        return None
+    if difference > 0:
+        return (f"Audio is {difference:.2f} s longer than the sequence ({info['duration']:.2f} s vs "
+                f"{video:.2f} s at {fps:g} fps), its end will be cut")
+    return (f"Audio is {-difference:.2f} s shorter than the sequence ({info['duration']:.2f} s vs "
+            f"{video:.2f} s at {fps:g} fps), the end of the video will be silent")
+
+
+class MediaInfoCache:
+    # Thread-safe, shared by every probe of the session. Loaded from disk on
+    # first use, saved after each new probe.
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path
+        self.lock = threading.Lock()
+        self.entries = None  # abspath -> {"key": [size, mtime_ns], "info": ..., "used": time}
+
+    def _load(self):
+        if self.entries is None:
+            self.cache_path = self.cache_path or os.path.join(app_data_dir(), CACHE_FILE)
+            cache = read_json(self.cache_path, {})
+            self.entries = cache.get("files", {}) if cache.get("format") == CACHE_FORMAT else {}
+
+    def cached(self, path):
+        """ The cached info of path when the file is unchanged since it was probed, else None. """
+        path = os.path.abspath(path)
+        try:
+            stamp = _stamp(path)
+        except OSError:
+            return None
+        with self.lock:
+            self._load()
+            entry = self.entries.get(path)
+            if entry is None or entry.get("key") != stamp:
+                return None
+            entry["used"] = time.time()
+            return entry["info"]
+
+    def get(self, path, ffprobe=None, save=True):
+        """ Info of path from the cache, probing it first when needed. None if it can't be probed. """
+        info = self.cached(path)
+        if info is not None:
+            return info
+        path = os.path.abspath(path)
+        try:
+            stamp = _stamp(path)
+        except OSError:
+            return None
+        info = probe_media(ffprobe or ffprobe_path(), path)
+        if info is None:
+            return None  # No ffprobe, nothing worth remembering
+        with self.lock:
+            self._load()
+            self.entries[path] = {"key": stamp, "info": info, "used": time.time()}
+        if save:
+            self.save()
+        return info
+
+    def save(self):
+        with self.lock:
+            if self.entries is None:
+                return
+            if len(self.entries) > MAX_ENTRIES:
+                newest = sorted(self.entries.items(), key=lambda item: item[1].get("used", 0), reverse=True)
+                self.entries = dict(newest[:MAX_ENTRIES])
+            data = {"format": CACHE_FORMAT, "files": dict(self.entries)}
+        try:
+            write_json_atomic(self.cache_path, data)
+        except OSError:
+            pass  # A read-only profile only costs the probes next launch
+
+    def probe_many(self, paths, ffprobe=None, workers=PROBE_WORKERS):
+        """ {path: info or None} for paths, the uncached ones probed in parallel and saved once. """
+        paths = list(dict.fromkeys(paths))
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            infos = list(pool.map(lambda path: self.get(path, ffprobe, save=False), paths))
+        self.save()
+        return dict(zip(paths, infos))
+
+
+_session_cache = MediaInfoCache()
+
+
+def media_cache():
+    """ The session-wide MediaInfoCache. """
+    return _session_cache
@@ -0,0 +1,302 @@
+"""Render throughput metrics: phase timings, ffmpeg's -progress stats and ETAs.
+
+A JobMetrics collects everything measured while one job renders: how long the
+scan, probe, audio, encode and join phases took, the fps/speed/out_time/
+total_size ffmpeg reports, the bytes read from the source folder and written,
+and CPU/GPU utilization sampled while ffmpeg runs. CPU needs the optional psutil package,
+GPU utilization is read from nvidia-smi when it is on PATH.
+
+Batch reports are written as JSON (everything) or CSV (one flat row per job).
+"""
+import csv
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+from .binaries import CREATE_NO_WINDOW
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Seconds between CPU/GPU utilization samples
+SAMPLE_INTERVAL = 1.0
+
+CSV_FIELDS = (
+    "name", "folder", "output", "encoder", "success", "skipped", "frames", "seconds",
+    "scan_seconds", "probe_seconds", "audio_seconds", "encode_seconds", "join_seconds",
+    "fps", "speed", "out_time", "input_bytes", "output_bytes", "read_mb_per_second",
+    "cpu_percent_avg", "cpu_percent_peak", "gpu_percent_avg", "gpu_percent_peak", "error",
+)
+
+
+def parse_out_time(value):
+    # "00:01:02.500000" -> 62.5, ffmpeg writes "N/A" before the first frame
+    try:
+        hours, minutes, seconds = value.split(":")
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except (AttributeError, ValueError):
+        return None
+
+
+def parse_speed(value):
+    # "2.34x" -> 2.34
+    try:
+        return float(value.strip().rstrip("x"))
+    except (AttributeError, ValueError):
+        return None
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "--:--"
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def estimate_eta(done, total, elapsed):
+    """ Seconds left at the rate done/elapsed so far, None until there is a rate. """
+    if done <= 0 or elapsed <= 0 or total <= done:
+        return None if total > done else 0.0
+    return (total - done) * elapsed / done
+
+
+def gpu_utilization():
+    """ Busiest NVIDIA GPU's utilization in percent, None without nvidia-smi. """
+    nvidia_smi = shutil.which("nvidia-smi")
+    if not nvidia_smi:
+        return None
+    try:
+        result = subprocess.run(
+            [nvidia_smi, "--query-gpu=utilization.gpu", "--format=csv,noheader,nounits"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=5,
+            creationflags=CREATE_NO_WINDOW)
+        return max(float(v) for v in result.stdout.split())
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+
+class UtilizationSampler:
+    # Samples the CPU use of ffmpeg processes (psutil) and the GPU utilization
+    # (nvidia-smi) on a background thread while a job encodes
+    def __init__(self):
+        self.processes = []
+        self.cpu = []
+        self.gpu = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.gpu_available = shutil.which("nvidia-smi") is not None
+        self.thread = None
+
+    def add_process(self, pid):
+        if psutil is None:
+            return
+        try:
+            process = psutil.Process(pid)
+            process.cpu_percent()  # The first call only starts the measurement
+        except psutil.Error:
+            return
+        with self.lock:
+            self.processes.append(process)
+
+    def start(self):
+        if psutil is None and not self.gpu_available:
+            return
+        # Started again for every encode attempt of a job, stop() set the event
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stop_event.wait(SAMPLE_INTERVAL):
+            with self.lock:
+                processes = list(self.processes)
+            if processes:
+                total = 0.0
+                for process in processes:
+                    try:
+                        total += process.cpu_percent()
+                    except psutil.Error:
+                        pass
+                if total:
+                    self.cpu.append(total)
+            if self.gpu_available:
+                value = gpu_utilization()
+                if value is not None:
+                    self.gpu.append(value)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+
+class JobMetrics:
+    # Filled in from the render thread(s), read from anywhere. Chunked renders
+    # report several ffmpeg processes at once, their stats are kept per process.
+    def __init__(self, name, folder=""):
+        self.name = name
+        self.folder = folder
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.finished = None
+        self.phases = {}          # phase -> seconds
+        self.encode_started = None
+        self.frame = 0
+        self.total_frames = 0
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.output = None
+        self.encoders = {}        # preset -> encoder of the last encode attempt
+        self.success = None
+        self.skipped = False
+        self.error = ""
+        self._process_stats = {}  # process key -> latest -progress block values
+        self.sampler = UtilizationSampler()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.monotonic()
+        if name == "encode":
+            self.encode_started = start
+            self.sampler.start()
+        try:
+            yield
+        finally:
+            if name == "encode":
+                self.sampler.stop()
+            with self.lock:
+                self.phases[name] = self.phases.get(name, 0.0) + time.monotonic() - start
+
+    def process_started(self, key, pid):
+        self.sampler.add_process(pid)
+
+    def update_progress(self, key, block):
+        # block is one -progress report (fps, speed, out_time, total_size, ...)
+        stats = {
+            "fps": _float(block.get("fps")),
+            "speed": parse_speed(block.get("speed")),
+            "out_time": parse_out_time(block.get("out_time")),
+            "total_size": _int(block.get("total_size")),
+        }
+        with self.lock:
+            self._process_stats[key] = stats
+
+    def set_frames(self, frame, total):
+        self.frame = frame
+        self.total_frames = total
+
+    def _sum(self, field):
+        values = [s[field] for s in self._process_stats.values() if s.get(field) is not None]
+        return sum(values) if values else None
+
+    @property
+    def encode_seconds(self):
+        if self.encode_started is None:
+            return 0.0
+        with self.lock:
+            if "encode" in self.phases:
+                return self.phases["encode"]
+        return time.monotonic() - self.encode_started
+
+    def eta(self):
+        """ Seconds until this job's encode finishes, None while unknown. """
+        return estimate_eta(self.frame, self.total_frames, self.encode_seconds)
+
+    def fps(self):
+        """ Frames per second achieved so far over the whole encode. """
+        seconds = self.encode_seconds
+        return self.frame / seconds if seconds > 0 else None
+
+    def finish(self, result):
+        self.finished = time.monotonic()
+        self.success = result.success
+        self.skipped = result.skipped
+        self.error = result.error
+        self.output = result.output_file
+        written = [path for path in result.output_files or [result.output_file] if path and os.path.exists(path)]
+        if written:
+            self.output_bytes = sum(os.path.getsize(path) for path in written)
+        else:
+            with self.lock:
+                self.output_bytes = self._sum("total_size") or 0
+
+    def to_dict(self):
+        with self.lock:
+            phases = dict(self.phases)
+            speed = self._sum("speed")
+            out_time = self._sum("out_time")
+        encode = phases.get("encode", 0.0)
+        measured = encode and self.success and not self.skipped
+        cpu, gpu = self.sampler.cpu, self.sampler.gpu
+        return {
+            "name": self.name,
+            "folder": self.folder,
+            "output": self.output,
+            "encoder": ", ".join(dict.fromkeys(self.encoders.values())),
+            "success": self.success,
+            "skipped": self.skipped,
+            "frames": self.total_frames,
+            "seconds": round((self.finished or time.monotonic()) - self.started, 3),
+            "phases": {name: round(seconds, 3) for name, seconds in phases.items()},
+            "fps": round(self.total_frames / encode, 2) if measured else None,
+            "speed": round(speed, 3) if speed is not None else None,
+            "out_time": round(out_time, 3) if out_time is not None else None,
+            "input_bytes": self.input_bytes,
+            "output_bytes": self.output_bytes,
+            "read_mb_per_second": round(self.input_bytes / encode / 1e6, 2) if measured else None,
+            "cpu_percent_avg": round(sum(cpu) / len(cpu), 1) if cpu else None,
+            "cpu_percent_peak": max(cpu) if cpu else None,
+            "gpu_percent_avg": round(sum(gpu) / len(gpu), 1) if gpu else None,
+            "gpu_percent_peak": max(gpu) if gpu else None,
+            "error": self.error.splitlines()[-1] if self.error else "",
+        }
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def flat_row(job):
+    # One CSV row from a JobMetrics.to_dict(), phases become *_seconds columns
+    row = {key: job.get(key) for key in CSV_FIELDS}
+    for name, seconds in job.get("phases", {}).items():
+        row[f"{name}_seconds"] = seconds
+    return row
+
+
+def write_report(path, jobs, batch_seconds=None):
+    """ Writes the JobMetrics of a batch to path, CSV when it ends in .csv, JSON otherwise. """
+    records = [job.to_dict() for job in jobs]
+    if path.lower().endswith(".csv"):
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(flat_row(record) for record in records)
+        return
+    frames = sum(r["frames"] for r in records if not r["skipped"])
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "seconds": round(batch_seconds, 3) if batch_seconds is not None else None,
+            "frames": frames,
+            "fps": round(frames / batch_seconds, 2) if batch_seconds else None,
+            "jobs": records,
+        }, f, indent=1)
@@ -0,0 +1,41 @@
+"""ffprobe helpers for source media."""
+import json
+import subprocess
+
+from .binaries import CREATE_NO_WINDOW
+
+
+def pix_fmt_bit_depth(pix_fmt, bits_per_raw_sample=None):
+    # Human readable bit depth, e.g. "8-bit", "16-bit", "32-bit float"
+    pix_fmt = pix_fmt or ""
+    if "f32" in pix_fmt:
+        return "32-bit float"
+    if "f16" in pix_fmt:
+        return "16-bit float"
+    if bits_per_raw_sample and str(bits_per_raw_sample).isdigit():
+        return f"{bits_per_raw_sample}-bit"
+    for marker, depth in (("48", 16), ("64", 16), ("16", 16), ("12", 12), ("10", 10)):
+        if marker in pix_fmt:
+            return f"{depth}-bit"
+    return "8-bit" if pix_fmt else ""
+
+
+def probe_image(ffprobe, path):
+    """ Resolution and bit depth of a single image, or None if ffprobe can't read it. """
+    try:
+        result = subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=width,height,pix_fmt,bits_per_raw_sample",
+             "-of", "json", path],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            timeout=30, creationflags=CREATE_NO_WINDOW
+        )
+        stream = json.loads(result.stdout)["streams"][0]
+    except (OSError, subprocess.SubprocessError, ValueError, KeyError, IndexError):
+        return None
+    return {
+        "width": stream.get("width"),
+        "height": stream.get("height"),
+        "pix_fmt": stream.get("pix_fmt"),
+        "bit_depth": pix_fmt_bit_depth(stream.get("pix_fmt"), stream.get("bits_per_raw_sample")),
+    }
@@ -0,0 +1,58 @@
+"""On-disk journal of the render queue, so a crash or a restart loses nothing.
+
+The GUI saves its queue (every folder with its take, audio source and extra
+presets), the batch settings and the state of each job to queue.json in the
+data folder whenever the queue changes, and right away when a render of a
+batch finishes. On the next launch the queue is rebuilt from the journal and,
+when a batch was still running, it can be resumed from the first job that
+never finished.
+
+The journal is rewritten atomically, a crash during a save leaves the previous
+journal in place. Outputs themselves are rendered under temporary names and
+renamed once complete (see engine.partial_file), so a job that was interrupted
+never leaves a movie that looks finished.
+"""
+import os
+
+from .appdata import app_data_dir, read_json, write_json_atomic
+
+JOURNAL_FILE = "queue.json"
+JOURNAL_VERSION = 1
+
+# Job states in a batch
+PENDING, DONE, FAILED = "pending", "done", "failed"
+
+
+class QueueJournal:
+    def __init__(self, path=None):
+        self.path = path or os.path.join(app_data_dir(), JOURNAL_FILE)
+
+    def load(self):
+        """ {"jobs": [...], "settings": {...}, "batch_running": bool}, None without a usable journal. """
+        data = read_json(self.path)
+        if not isinstance(data, dict) or data.get("version") != JOURNAL_VERSION:
+            return None
+        jobs = [job for job in data.get("jobs", []) if isinstance(job, dict) and job.get("folder")]
+        return {
+            "jobs": jobs,
+            "settings": data.get("settings") or {},
+            "batch_running": bool(data.get("batch_running")) and any(job.get("state") == PENDING for job in jobs),
+        }
+
+    def save(self, jobs, settings, batch_running=False):
+        """ jobs are dicts with folder, take, audio, audio_name, extra_presets and state. """
+        try:
+            write_json_atomic(self.path, {
+                "version": JOURNAL_VERSION,
+                "jobs": jobs,
+                "settings": settings,
+                "batch_running": batch_running,
+            })
+        except OSError:
+            pass  # Only a convenience, a read-only profile must not stop a render
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,87 @@
+"""Render manifests, so re-running a queue only re-encodes the shots that changed.
+
+After a successful render a small JSON manifest is written next to the output
+(``shot_010_tk01_COMP.mov.sadalchemist.json``) holding a fingerprint of
+everything that went into it: the frame files (names, sizes and mtimes), the
+audio source, the encoding settings and the ffmpeg version. Rendering the same
+job again compares fingerprints and skips the encode when nothing changed.
+"""
+import hashlib
+import json
+import os
+import time
+
+from .appdata import read_json, write_json_atomic
+
+MANIFEST_SUFFIX = ".sadalchemist.json"
+MANIFEST_VERSION = 1
+
+# Cache states of a job's output
+UP_TO_DATE, CHANGED, NEW = "up to date", "changed", "new"
+
+
+def manifest_path(output_file):
+    return output_file + MANIFEST_SUFFIX
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def frame_stamps(sequence):
+    """ [(file name, [size, mtime_ns] or None)] for every frame of sequence. """
+    return [(name, _file_stamp(os.path.join(sequence.folder, name)))
+            for name in map(sequence.filename, sequence.frames)]
+
+
+def fingerprint(sequence, audio, settings, stamps=None):
+    """ Hex digest of the sequence's files, the audio file and the settings dict.
+
+    stamps is frame_stamps(sequence) when the caller already has it.
+    """
+    digest = hashlib.sha256()
+    header = {
+        "version": MANIFEST_VERSION,
+        "settings": settings,
+        "audio": [os.path.abspath(audio), _file_stamp(audio)] if audio else None,
+        "range": [sequence.first, sequence.last],
+    }
+    digest.update(json.dumps(header, sort_keys=True).encode("utf-8"))
+    for name, stamp in stamps if stamps is not None else frame_stamps(sequence):
+        digest.update(f"{name}\0{stamp}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def check(output_file, digest):
+    """ UP_TO_DATE if output_file was rendered from exactly digest, else CHANGED or NEW. """
+    output_stamp = _file_stamp(output_file)
+    manifest = read_json(manifest_path(output_file))
+    if output_stamp is None or not isinstance(manifest, dict):
+        return NEW
+    # The size catches outputs that were overwritten or truncated since
+    if manifest.get("fingerprint") == digest and manifest.get("output_size") == output_stamp[0]:
+        return UP_TO_DATE
+    return CHANGED
+
+
+def write_manifest(output_file, digest, settings):
+    write_json_atomic(manifest_path(output_file), {
+        "version": MANIFEST_VERSION,
+        "fingerprint": digest,
+        "output_size": os.path.getsize(output_file),
+        "settings": settings,
+        "rendered": time.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+
+
+def discard_manifest(output_file):
+    # Called before an output is overwritten, an interrupted render must never
+    # look up to date
+    try:
+        os.remove(manifest_path(output_file))
+    except OSError:
+        pass
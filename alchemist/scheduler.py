@@ -0,0 +1,140 @@
+"""Batch scheduling: shortest jobs first, admitted under CPU and disk budgets.
+
+Every job gets a rough cost estimate before the batch starts, from its frame
+count, the size of a few sampled frames and the encoders of its presets: the
+CPU time it needs, how many encoder threads it can keep busy and so the disk
+bandwidth it reads at while running. The scheduler starts the cheapest jobs
+first (the first movies are out within seconds, not after the first master)
+and keeps starting jobs while their threads fit into the CPU budget and their
+reads into the disk budget, so a ProRes master and a few PNG previews share
+the machine instead of several EXR masters fighting over the disk. A job that
+doesn't fit waits, a smaller one behind it may start in the meantime, and a
+job always starts when nothing else is running.
+
+The estimates only need to be right relative to each other, the constants
+below are ballpark figures from 1080p-4K renders on desktop machines.
+"""
+import os
+
+from .capabilities import HW_ENCODERS
+from .engine import job_codec, job_frame_step, proxy_scale, split_frames
+from .sequences import main_sequence
+
+# Frames whose size is sampled for a job's estimate
+SAMPLE_FRAMES = 5
+
+# CPU seconds one thread spends per MB of source frames: decoding by frame
+# format, and encoding for each output by encoder
+DECODE_SECONDS_PER_MB = {".exr": 0.03, ".png": 0.03, ".tif": 0.015, ".tiff": 0.015, ".bmp": 0.005,
+                         ".jpg": 0.01, ".jpeg": 0.01, ".dpx": 0.005}
+ENCODE_SECONDS_PER_MB = {"libx264": 0.05, "libx265": 0.15, "prores_ks": 0.04, "prores_aw": 0.02}
+HW_ENCODE_SECONDS_PER_MB = 0.005
+
+# Encoder threads a single ffmpeg process keeps busy, beyond that they idle
+ENCODER_THREADS = {"libx264": 8, "libx265": 8, "prores_ks": 4, "prores_aw": 4}
+HW_ENCODER_THREADS = 2
+
+# Disk bandwidth budget shared by the running jobs
+DEFAULT_DISK_MB_S = 600
+
+
+class JobCost:
+    def __init__(self, frames, mb, cpu_seconds, threads, chunks=1):
+        self.frames = frames
+        self.mb = mb                    # Source frames read, in MB
+        self.cpu_seconds = cpu_seconds  # Single thread CPU time
+        self.threads = threads          # Threads it keeps busy over all its processes
+        self.chunks = chunks
+
+    @property
+    def seconds(self):
+        """ Estimated wall time when it gets all its threads. """
+        return self.cpu_seconds / max(1, self.threads)
+
+    @property
+    def disk_mb_s(self):
+        return self.mb / self.seconds if self.seconds else 0.0
+
+
+def estimate_cost(job, ffmpeg, cpu_threads=None):
+    """ JobCost of rendering job, None without a sequence. """
+    sequence = main_sequence(job.folder)
+    if sequence is None:
+        return None
+    frames = sequence.frames
+    samples = frames[::max(1, len(frames) // SAMPLE_FRAMES)][:SAMPLE_FRAMES]
+    sizes = []
+    for frame in samples:
+        try:
+            sizes.append(os.path.getsize(sequence.path(frame)))
+        except OSError:
+            pass
+    frame_mb = sum(sizes) / len(sizes) / 1e6 if sizes else 0.0
+    mb = frame_mb * len(frames) / job_frame_step(job)
+
+    seconds_per_mb = DECODE_SECONDS_PER_MB.get(sequence.ext.lower(), 0.02)
+    threads = 1
+    for preset in job.presets:
+        codec = job_codec(job, preset, ffmpeg)
+        if codec in HW_ENCODERS:
+            encode, encoder_threads = HW_ENCODE_SECONDS_PER_MB, HW_ENCODER_THREADS
+        else:
+            encode, encoder_threads = ENCODE_SECONDS_PER_MB.get(codec, 0.05), ENCODER_THREADS.get(codec, 4)
+        # Proxies encode a fraction of the pixels
+        seconds_per_mb += encode / proxy_scale(preset) ** 2
+        threads = max(threads, encoder_threads)
+    chunks = len(split_frames(sequence.first, sequence.length, job.chunks)) if job_frame_step(job) == 1 else 1
+    threads = min(threads * chunks, cpu_threads or os.cpu_count() or 1)
+    return JobCost(len(frames), mb, mb * seconds_per_mb, threads, chunks)
+
+
+def estimate_costs(jobs, ffmpeg, cpu_threads=None):
+    """ {job id: JobCost or None} of jobs ({job id: RenderJob}). A job that can't be
+    estimated (its folder gone or unreadable since it was queued) gets None and
+    is started without a budget, it fails or renders like it would unscheduled. """
+    costs = {}
+    for job_id, job in jobs.items():
+        try:
+            costs[job_id] = estimate_cost(job, ffmpeg, cpu_threads)
+        except Exception:
+            costs[job_id] = None
+    return costs
+
+
+class ResourceScheduler:
+    def __init__(self, cpu_threads=None, disk_mb_s=DEFAULT_DISK_MB_S, max_jobs=None):
+        self.cpu_threads = cpu_threads or os.cpu_count() or 1
+        self.disk_mb_s = disk_mb_s or float("inf")
+        self.max_jobs = max_jobs
+
+    def order(self, costs):
+        """ Job indices of costs ({index: JobCost or None}), shortest first. Jobs without a cost go first,
+        they fail or finish right away. """
+        return sorted(costs, key=lambda i: (costs[i] is not None, costs[i].seconds if costs[i] else 0, i))
+
+    def threads_for(self, cost):
+        """ -threads for each ffmpeg process of a job with cost. """
+        if cost is None:
+            return 0
+        return max(1, cost.threads // cost.chunks)
+
+    def admit(self, pending, costs, running):
+        """ The jobs of pending (in order) that can start next to the running ones. """
+        used_threads = sum(costs[i].threads for i in running if costs[i])
+        used_disk = sum(costs[i].disk_mb_s for i in running if costs[i])
+        count = len(running)
+        admitted = []
+        for index in pending:
+            if self.max_jobs and count >= self.max_jobs:
+                break
+            cost = costs[index]
+            fits = cost is None or (used_threads + cost.threads <= self.cpu_threads and
+                                    used_disk + cost.disk_mb_s <= self.disk_mb_s)
+            if not fits and count:
+                continue  # A smaller job further down may still fit
+            admitted.append(index)
+            count += 1
+            if cost:
+                used_threads += cost.threads
+                used_disk += cost.disk_mb_s
+        return admitted
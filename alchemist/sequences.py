@@ -0,0 +1,227 @@
+"""Image sequence detection for render folders.
+
+A folder is scanned once with os.scandir and its numbered image files are
+grouped into sequences by prefix, frame padding and extension. Each sequence
+knows its frame range and the frames missing from it. An image without a
+frame number (a single "plate.png") is a one-frame sequence of its own. Results are cached per
+folder and reused until the folder's mtime changes (files added, removed or
+renamed), so asking for frame counts again is free even on network shares.
+"""
+import bisect
+import os
+import re
+import threading
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.exr')
+
+# prefix, frame number, extension, e.g. "shot_010.v002.1001.exr"
+FRAME_RE = re.compile(r"^(.*?)(\d+)(\.[^.]+)$")
+
+
+# Frame number given to an unnumbered still
+STILL_FRAME = 1
+
+
+class ImageSequence:
+    def __init__(self, folder, prefix, padding, ext, frames, still=False):
+        self.folder = folder
+        self.prefix = prefix
+        self.padding = padding  # 0 means unpadded frame numbers (%d)
+        self.ext = ext
+        self.frames = frames    # Sorted frame numbers present on disk
+        self.still = still      # prefix + ext is one unnumbered image, frames is [STILL_FRAME]
+
+    @property
+    def first(self):
+        return self.frames[0]
+
+    @property
+    def last(self):
+        return self.frames[-1]
+
+    @property
+    def frame_count(self):
+        return len(self.frames)
+
+    @property
+    def length(self):
+        # Frames from first to last, including the missing ones
+        return self.last - self.first + 1
+
+    @property
+    def missing(self):
+        present = set(self.frames)
+        return [f for f in range(self.first, self.last + 1) if f not in present]
+
+    @property
+    def has_gaps(self):
+        return self.frame_count != self.length
+
+    @property
+    def pattern(self):
+        # printf-style pattern understood by ffmpeg's image2 demuxer
+        if self.still:
+            return f"{self.prefix.replace('%', '%%')}{self.ext}"
+        digits = f"%0{self.padding}d" if self.padding else "%d"
+        return f"{self.prefix.replace('%', '%%')}{digits}{self.ext}"
+
+    @property
+    def path_pattern(self):
+        return os.path.join(self.folder, self.pattern)
+
+    def filename(self, frame):
+        if self.still:
+            return self.prefix + self.ext
+        return f"{self.prefix}{frame:0{self.padding}d}{self.ext}"
+
+    def path(self, frame):
+        return os.path.join(self.folder, self.filename(frame))
+
+    def missing_ranges(self):
+        ranges = []
+        for frame in self.missing:
+            if ranges and ranges[-1][1] == frame - 1:
+                ranges[-1][1] = frame
+            else:
+                ranges.append([frame, frame])
+        return [tuple(r) for r in ranges]
+
+    def describe_missing(self):
+        return ", ".join(f"{a}" if a == b else f"{a}-{b}" for a, b in self.missing_ranges())
+
+    def describe(self):
+        text = f"{self.first}-{self.last} ({self.frame_count})"
+        if self.has_gaps:
+            text += f", {self.length - self.frame_count} missing"
+        return text
+
+    def __repr__(self):
+        return f"ImageSequence({self.path_pattern!r}, {self.describe()})"
+
+
+def _split_by_padding(folder, prefix, ext, numbered):
+    # numbered: list of (frame, digit string) sharing prefix and extension.
+    # Take the shortest digit width as the padding, every number that formats
+    # back to its own digits belongs to that sequence (this also covers
+    # 9999 -> 10000 rolling past the padding). Whatever is left over, e.g.
+    # "001" next to "0001", forms a sequence of its own.
+    sequences = []
+    while numbered:
+        width = min(len(digits) for _, digits in numbered)
+        at_width = [digits for _, digits in numbered if len(digits) == width]
+        uniform = len(at_width) == len(numbered)
+        padding = width if uniform or any(d.startswith("0") for d in at_width) else 0
+        matched, rest = [], []
+        for frame, digits in numbered:
+            (matched if f"{frame:0{padding}d}" == digits else rest).append((frame, digits))
+        if not matched:
+            # Should not happen, but never loop forever on odd names
+            matched, rest = numbered, []
+        frames = sorted({frame for frame, _ in matched})
+        sequences.append(ImageSequence(folder, prefix, padding, ext, frames))
+        numbered = rest
+    return sequences
+
+
+def _scan(folder):
+    groups = {}
+    stills = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            name = entry.name
+            if not name.lower().endswith(IMAGE_EXTS) or name.startswith("."):
+                continue
+            match = FRAME_RE.match(name)
+            if not match:
+                base, ext = os.path.splitext(name)
+                stills.append(ImageSequence(folder, base, 0, ext, [STILL_FRAME], still=True))
+                continue
+            prefix, digits, ext = match.groups()
+            groups.setdefault((prefix, ext), []).append((int(digits), digits))
+    sequences = stills
+    for (prefix, ext), numbered in groups.items():
+        sequences += _split_by_padding(folder, prefix, ext, numbered)
+    # Longest first, the main sequence of a render folder is sequences[0]
+    sequences.sort(key=lambda s: (-s.frame_count, s.prefix, s.ext))
+    return sequences
+
+
+_cache_lock = threading.Lock()
+_cache = {}  # folder -> (mtime_ns, [ImageSequence])
+
+
+def scan_folder(folder):
+    """ All image sequences in folder, longest first. Cached until the folder changes. """
+    folder = os.path.normpath(folder)
+    try:
+        mtime = os.stat(folder).st_mtime_ns
+    except OSError:
+        return []
+    with _cache_lock:
+        cached = _cache.get(folder)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        sequences = _scan(folder)
+    except OSError:
+        return []
+    with _cache_lock:
+        _cache[folder] = (mtime, sequences)
+    return sequences
+
+
+def main_sequence(folder):
+    sequences = scan_folder(folder)
+    return sequences[0] if sequences else None
+
+
+def write_concat_list(sequence, fps, path, first=None, last=None, step=1):
+    # ffconcat list for sequences with missing frames: image2 stops at the first
+    # gap, so each frame is listed with a duration that holds it over the
+    # frames missing after it. Keeps the timing (and audio sync) intact.
+    # first/last limit the list to part of the frame range (chunked renders),
+    # a missing first frame is covered by holding the frame before it. With a
+    # step only every step-th frame is listed, each held over the skipped ones.
+    fps = float(fps)
+    first = sequence.first if first is None else first
+    last = sequence.last if last is None else last
+    if step > 1:
+        starts = list(range(first, last + 1, step))
+        frames = [sequence.frames[bisect.bisect_right(sequence.frames, start) - 1] for start in starts]
+    else:
+        frames = [f for f in sequence.frames if first <= f <= last]
+        if not frames or frames[0] != first:
+            frames.insert(0, max(f for f in sequence.frames if f < first))
+        starts = [first] + frames[1:]
+
+    def quote(p):
+        return "'" + p.replace("\\", "/").replace("'", "'\\''") + "'"
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("ffconcat version 1.0\n")
+        for frame, start, next_start in zip(frames, starts, starts[1:] + [last + 1]):
+            f.write(f"file {quote(sequence.path(frame))}\n")
+            f.write(f"duration {(next_start - start) / fps:.6f}\n")
+        # The last entry's duration is only honoured if another file follows it
+        f.write(f"file {quote(sequence.path(frames[-1]))}\n")
+
+
+def find_sequence_folders(root):
+    """ Yields (folder, sequences) for root and every folder below it holding a sequence.
+
+    Folders that hold a sequence are not searched further, render folders are
+    leaves and their subfolders are usually proxies or caches.
+    """
+    sequences = scan_folder(root)
+    if sequences:
+        yield root, sequences
+        return
+    try:
+        with os.scandir(root) as entries:
+            subfolders = sorted(
+                e.path for e in entries
+                if not e.name.startswith(".") and e.is_dir(follow_symlinks=False))
+    except OSError:
+        return
+    for folder in subfolders:
+        yield from find_sequence_folders(folder)
@@ -0,0 +1,160 @@
+"""Contact sheet thumbnails of queued sequences, cached on disk across sessions.
+
+A sheet is the first, middle and last frame of a sequence, scaled down to
+THUMB_WIDTH pixels each and placed side by side in one small JPEG. One ffmpeg
+process renders all three (EXR frames are shown through the sRGB curve, not as
+linear light).
+
+Sheets are stored in the data folder's thumbnails cache under a key made from
+the folder, the sequence's pattern and range and the size/mtime of the sampled
+frames, so a shot seen before costs three stats instead of three frame reads
+from the network share. The cache is trimmed to MAX_CACHE_BYTES, least
+recently shown sheets first (each hit refreshes the sheet's mtime).
+"""
+import hashlib
+import json
+import os
+import subprocess
+import threading
+
+from .appdata import app_data_dir
+from .binaries import CREATE_NO_WINDOW
+
+CACHE_FOLDER = "thumbnails"
+
+# Width of each frame in a sheet, the height follows the aspect ratio
+THUMB_WIDTH = 192
+
+# The cache is trimmed to this size, then to TRIM_TO of it
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+TRIM_TO = 0.8
+
+
+def sample_frames(sequence):
+    """ The first, middle and last frame numbers of sequence, without duplicates. """
+    frames = sequence.frames
+    return list(dict.fromkeys([frames[0], frames[len(frames) // 2], frames[-1]]))
+
+
+def thumbnail_key(sequence):
+    """ Hex key of the sheet for sequence, None if a sampled frame is gone. """
+    stamps = []
+    for frame in sample_frames(sequence):
+        try:
+            st = os.stat(sequence.path(frame))
+        except OSError:
+            return None
+        stamps.append([frame, st.st_size, st.st_mtime_ns])
+    header = [os.path.abspath(sequence.folder), sequence.pattern, sequence.first, sequence.last, stamps, THUMB_WIDTH]
+    return hashlib.sha256(json.dumps(header).encode("utf-8")).hexdigest()[:32]
+
+
+def render_sheet(ffmpeg, sequence, path):
+    """ Renders the contact sheet of sequence to path (JPEG), True on success. """
+    frames = sample_frames(sequence)
+    cmd = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y"]
+    for frame in frames:
+        if sequence.ext.lower() == ".exr":
+            cmd += ["-apply_trc", "iec61966_2_1"]
+        # pattern_type none: a "%" in a frame name is not a sequence pattern
+        cmd += ["-f", "image2", "-pattern_type", "none", "-i", sequence.path(frame)]
+    scaled = ";".join(f"[{i}:v]scale={THUMB_WIDTH}:-2,setsar=1[v{i}]" for i in range(len(frames)))
+    if len(frames) > 1:
+        graph = scaled + ";" + "".join(f"[v{i}]" for i in range(len(frames))) + f"hstack=inputs={len(frames)}[sheet]"
+    else:
+        graph = scaled.replace("[v0]", "[sheet]")
+    cmd += ["-filter_complex", graph, "-map", "[sheet]", "-frames:v", "1", "-q:v", "5", "-f", "image2", path]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                timeout=60, creationflags=CREATE_NO_WINDOW)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return result.returncode == 0 and os.path.exists(path)
+
+
+class ThumbnailCache:
+    # Thread-safe, shared by every thumbnail of the session
+    def __init__(self, folder=None, max_bytes=MAX_CACHE_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._total = None  # Bytes in the cache, counted on the first write
+
+    def _path(self, key):
+        self.folder = self.folder or app_data_dir(CACHE_FOLDER)
+        return os.path.join(self.folder, key + ".jpg")
+
+    def cached(self, sequence):
+        """ Path of sequence's sheet if it is cached, else None. """
+        key = thumbnail_key(sequence)
+        if key is None:
+            return None
+        path = self._path(key)
+        try:
+            os.utime(path)  # Most recently used
+        except OSError:
+            return None
+        return path
+
+    def get(self, sequence, ffmpeg):
+        """ Path of sequence's sheet, rendered first when it isn't cached. None if it can't be. """
+        path = self.cached(sequence)
+        if path is not None:
+            return path
+        key = thumbnail_key(sequence)
+        if key is None:
+            return None
+        path = self._path(key)
+        tmp_path = os.path.join(self.folder, f".{key}.{threading.get_ident()}.jpg")
+        if not render_sheet(ffmpeg, sequence, tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return None
+        os.replace(tmp_path, path)
+        self._added(os.path.getsize(path))
+        return path
+
+    def _added(self, size):
+        with self.lock:
+            if self._total is None:
+                self._total = sum(size for _, _, size in self._entries())
+            else:
+                self._total += size
+            if self._total <= self.max_bytes:
+                return
+            entries = sorted(self._entries())
+            self._total = sum(size for _, _, size in entries)
+            for _, path, size in entries:
+                if self._total <= self.max_bytes * TRIM_TO:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self._total -= size
+
+    def _entries(self):
+        # [(mtime, path, size)] of the cached sheets
+        entries = []
+        try:
+            with os.scandir(self.folder) as scan:
+                for entry in scan:
+                    if entry.name.endswith(".jpg") and not entry.name.startswith("."):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((st.st_mtime, entry.path, st.st_size))
+        except OSError:
+            pass
+        return entries
+
+
+_session_cache = ThumbnailCache()
+
+
+def thumbnail_cache():
+    """ The session-wide ThumbnailCache. """
+    return _session_cache
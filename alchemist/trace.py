@@ -0,0 +1,38 @@
+"""Startup timing trace, switched on with the SADALCHEMIST_TRACE environment variable.
+
+trace(label) prints the milliseconds since this module was first imported
+(SadAlchemist.py imports it before anything else) and the step that just
+finished: imports, binary resolution, window construction, first paint. With
+SADALCHEMIST_TRACE=1 the lines go to stderr, any other value is a file they
+are appended to (the windowed build has no console). Without the variable
+trace() does nothing.
+"""
+import os
+import sys
+import threading
+import time
+
+_started = time.perf_counter()
+_target = os.environ.get("SADALCHEMIST_TRACE", "")
+_lock = threading.Lock()
+
+
+def enabled():
+    return bool(_target) and _target != "0"
+
+
+def trace(label):
+    if not enabled():
+        return
+    line = f"[trace] {(time.perf_counter() - _started) * 1000:8.1f} ms  {label}\n"
+    with _lock:
+        try:
+            if _target in ("1", "stderr"):
+                if sys.stderr is not None:
+                    sys.stderr.write(line)
+                    sys.stderr.flush()
+            else:
+                with open(_target, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except OSError:
+            pass  # Diagnostics only
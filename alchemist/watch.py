@@ -0,0 +1,253 @@
+"""Watch folders: find sequences as they are written and report them once complete.
+
+A FolderWatcher follows one or more root folders (a shared render tree) and
+calls on_ready(folder, sequences) for every sequence folder that has stopped
+changing: its frame count and newest frame mtime stayed the same for settle
+seconds, so a render still writing frames is never picked up halfway.
+
+On Linux the tree is followed with inotify (through ctypes, no extra
+dependency) and only folders that had events are looked at again. Elsewhere,
+or when inotify is unavailable or out of watches, the whole tree is rescanned
+every poll_interval seconds.
+
+Folders that already hold frames when watching starts are left alone unless
+existing is set, they are only reported once they change.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from .sequences import IMAGE_EXTS, scan_folder
+
+# Seconds a folder's frames must stay unchanged before it is reported
+SETTLE_SECONDS = 10.0
+
+# Seconds between full rescans without inotify
+POLL_INTERVAL = 5.0
+
+# Seconds between checks of the folders that changed
+TICK = 1.0
+
+WATCH_INOTIFY, WATCH_POLLING = "inotify", "polling"
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def folder_stamp(folder):
+    """ (frame count, newest frame mtime_ns) of the images directly in folder, None without any. """
+    count = 0
+    newest = 0
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(IMAGE_EXTS) and not entry.name.startswith("."):
+                    try:
+                        newest = max(newest, entry.stat().st_mtime_ns)
+                    except OSError:
+                        continue  # Renamed or removed while scanning
+                    count += 1
+    except OSError:
+        return None
+    return (count, newest) if count else None
+
+
+def walk_folders(root):
+    # Every folder below root (root included), hidden folders skipped
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        yield folder
+        try:
+            with os.scandir(folder) as entries:
+                stack.extend(sorted(
+                    (e.path for e in entries if not e.name.startswith(".") and e.is_dir(follow_symlinks=False)),
+                    reverse=True))
+        except OSError:
+            continue
+
+
+class Inotify:
+    # Minimal ctypes binding, one watch per folder (inotify is not recursive)
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.folders = {}  # watch descriptor -> folder
+
+    def add(self, folder):
+        wd = self._add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+        if wd < 0:
+            code = ctypes.get_errno()
+            if code == errno.ENOSPC:
+                raise OSError(code, "Out of inotify watches (fs.inotify.max_user_watches)")
+            return  # Removed already or not readable
+        self.folders[wd] = folder
+
+    def read(self, timeout):
+        """ (folders with file events, new subfolders, overflowed) seen within timeout seconds. """
+        changed, created, overflow = set(), [], False
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return changed, created, overflow
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return changed, created, overflow
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            folder = self.folders.get(wd)
+            if folder is None:
+                continue
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and not name.startswith(b"."):
+                    created.append(os.path.join(folder, os.fsdecode(name)))
+            else:
+                changed.add(folder)
+        return changed, created, overflow
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    def __init__(self, roots, on_ready, settle=SETTLE_SECONDS, poll_interval=POLL_INTERVAL, existing=False,
+                 use_inotify=True):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.on_ready = on_ready
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.existing = existing
+        self.use_inotify = use_inotify and sys.platform.startswith("linux")
+        self.mode = None
+        self.stop_event = threading.Event()
+        self.thread = None
+        self._inotify = None
+        self._pending = {}   # folder -> (stamp, when it last changed)
+        self._reported = {}  # folder -> stamp it was reported (or found) with
+
+    def start(self):
+        """ Watches on a background thread, returns the mode (inotify or polling) it uses. """
+        self._open_inotify()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self.mode
+
+    def stop(self):
+        # The thread notices within TICK seconds and closes inotify itself
+        self.stop_event.set()
+
+    def _open_inotify(self):
+        self.mode = WATCH_POLLING
+        if self.use_inotify:
+            try:
+                self._inotify = Inotify()
+                self.mode = WATCH_INOTIFY
+            except (OSError, AttributeError):
+                self._inotify = None  # Old libc or no inotify in this kernel/container
+
+    def _fall_back_to_polling(self):
+        self._inotify.close()
+        self._inotify = None
+        self.mode = WATCH_POLLING
+
+    def _add_tree(self, root):
+        # Watches every folder below root, returns them
+        folders = list(walk_folders(root))
+        if self._inotify is not None:
+            try:
+                for folder in folders:
+                    self._inotify.add(folder)
+            except OSError:
+                self._fall_back_to_polling()
+        return folders
+
+    def _all_folders(self):
+        return [folder for root in self.roots for folder in walk_folders(root)]
+
+    def _run(self):
+        try:
+            for root in self.roots:
+                for folder in self._add_tree(root):
+                    stamp = folder_stamp(folder)
+                    if stamp is None:
+                        continue
+                    if self.existing:
+                        self._pending[folder] = (stamp, time.monotonic())
+                    else:
+                        self._reported[folder] = stamp
+            next_poll = time.monotonic() + self.poll_interval
+            while not self.stop_event.is_set():
+                if self._inotify is not None:
+                    changed, created, overflow = self._inotify.read(TICK)
+                    for folder in created:
+                        # Frames may land before the new folder's watch is in place
+                        changed.update(self._add_tree(folder))
+                    if overflow or self._inotify is None:
+                        changed = set(self._all_folders())
+                else:
+                    changed = set()
+                    if self.stop_event.wait(TICK):
+                        break
+                    if time.monotonic() >= next_poll:
+                        changed = set(self._all_folders())
+                        next_poll = time.monotonic() + self.poll_interval
+                for folder in changed:
+                    self._touch(folder)
+                self._report_settled()
+        finally:
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+
+    def _touch(self, folder):
+        stamp = folder_stamp(folder)
+        if stamp is None or self._reported.get(folder) == stamp:
+            self._pending.pop(folder, None)
+            return
+        pending = self._pending.get(folder)
+        if pending is None or pending[0] != stamp:
+            self._pending[folder] = (stamp, time.monotonic())
+
+    def _report_settled(self):
+        now = time.monotonic()
+        for folder, (stamp, changed) in list(self._pending.items()):
+            if now - changed < self.settle:
+                continue
+            # Checked again, events can be missed and polling only samples
+            current = folder_stamp(folder)
+            if current != stamp:
+                if current is None:
+                    del self._pending[folder]
+                else:
+                    self._pending[folder] = (current, now)
+                continue
+            del self._pending[folder]
+            self._reported[folder] = stamp
+            sequences = scan_folder(folder)
+            if sequences:
+                self.on_ready(folder, sequences)
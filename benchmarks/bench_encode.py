@@ -0,0 +1,245 @@
+"""Encode benchmark: renders synthetic image sequences through every preset.
+
+Sequences are generated once with ffmpeg's testsrc2 (PNG, 16-bit TIFF and
+float EXR at the requested resolutions and lengths) and cached in the data
+folder. Every combination of sequence, preset, concurrency (identical jobs
+rendering at the same time), encoder threads and frame input mode (ffmpeg
+reading the files vs. prefetching and piping them) is rendered with the same
+engine as the GUI, CPU encoders only, and one row per run is appended to a
+CSV results file together with the git revision and the ffmpeg version, so
+runs from before and after a change can be compared directly.
+
+    python benchmarks/bench_encode.py
+    python benchmarks/bench_encode.py --formats exr --resolutions 3840x2160 --frames 96 \\
+        --concurrency 1,2,4 --threads 0,4 --modes files,pipe --repeat 3
+
+Each run happens in its own Python process, so the peak RSS reported is that
+of the run's ffmpeg processes (on Windows it needs the optional psutil).
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alchemist.binaries import ffmpeg_path  # noqa: E402
+from alchemist.capabilities import CPU_H264_LABEL, ffmpeg_version  # noqa: E402
+from alchemist.engine import PRESETS, RenderJob, run_job  # noqa: E402
+from alchemist.framefeed import INPUT_MODES  # noqa: E402
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Synthetic source formats: extension and the pixel format written
+FORMATS = {
+    "png": ("png", "rgb24"),
+    "tiff16": ("tif", "rgb48le"),
+    "exr": ("exr", "gbrpf32le"),
+}
+
+RESULT_FIELDS = (
+    "date", "revision", "host", "ffmpeg", "format", "resolution", "frames", "preset",
+    "concurrency", "threads", "chunks", "mode", "repeat", "success", "wall_seconds", "fps",
+    "peak_rss_mb", "output_bytes",
+)
+
+
+def generate_sequence(ffmpeg, data_dir, fmt, resolution, frames):
+    """ Folder holding a cached synthetic sequence, rendered on first use. """
+    ext, pix_fmt = FORMATS[fmt]
+    folder = os.path.join(data_dir, f"{fmt}_{resolution}_{frames}")
+    if os.path.isdir(folder) and len(os.listdir(folder)) == frames:
+        return folder
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+    subprocess.run([
+        ffmpeg, "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={resolution}:rate=24",
+        "-frames:v", str(frames), "-pix_fmt", pix_fmt, "-start_number", "1001",
+        os.path.join(folder, f"bench.%04d.{ext}"),
+    ], check=True)
+    return folder
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def peak_child_rss_mb(pids_seen):
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    if pids_seen:
+        return round(max(pids_seen.values()) / (1024 * 1024), 1)
+    return None
+
+
+def run_case(case):
+    """ Renders one benchmark case in this process, returns its measurements. """
+    output_root = tempfile.mkdtemp(prefix="sadalchemist_bench_")
+    jobs = []
+    for index in range(case["concurrency"]):
+        output_dir = os.path.join(output_root, str(index))
+        os.makedirs(output_dir)
+        jobs.append(RenderJob(case["folder"], output_dir, preset=case["preset"], hwaccel=CPU_H264_LABEL,
+                              chunks=case["chunks"], force=True, threads=case["threads"],
+                              input_mode=case["mode"]))
+
+    # Without resource (Windows) the ffmpeg processes are sampled with psutil
+    peak_rss = {}
+    stop = threading.Event()
+
+    def sample_rss():
+        me = psutil.Process()
+        while not stop.wait(0.2):
+            for child in me.children(recursive=True):
+                try:
+                    peak_rss[child.pid] = max(peak_rss.get(child.pid, 0), child.memory_info().rss)
+                except psutil.Error:
+                    pass
+
+    sampler = None
+    if resource is None and psutil is not None:
+        sampler = threading.Thread(target=sample_rss, daemon=True)
+        sampler.start()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        results = list(pool.map(run_job, jobs))
+    wall = time.perf_counter() - started
+    stop.set()
+    if sampler:
+        sampler.join()
+
+    output_bytes = [os.path.getsize(r.output_file) for r in results if r.success and os.path.exists(r.output_file)]
+    shutil.rmtree(output_root, ignore_errors=True)
+    success = all(r.success for r in results)
+    return {
+        "success": success,
+        "wall_seconds": round(wall, 3),
+        "fps": round(case["frames"] * len(jobs) / wall, 2) if success else None,
+        "peak_rss_mb": peak_child_rss_mb(peak_rss),
+        "output_bytes": max(output_bytes) if output_bytes else None,
+        "error": next((r.error for r in results if not r.success), ""),
+    }
+
+
+def run_case_isolated(case):
+    # A fresh interpreter per case keeps RUSAGE_CHILDREN (peak RSS) per case
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(case)],
+        stdout=subprocess.PIPE, text=True)
+    try:
+        return json.loads(result.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        return {"success": False, "error": f"benchmark process exited with {result.returncode}"}
+
+
+def parse_list(value, convert=str):
+    return [convert(v.strip()) for v in value.split(",") if v.strip()]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the encode pipeline on synthetic sequences.")
+    parser.add_argument("--formats", default="png,tiff16,exr", help=f"Source formats ({', '.join(FORMATS)})")
+    parser.add_argument("--resolutions", default="1920x1080", help="Comma separated WxH list")
+    parser.add_argument("--frames", default="48", help="Comma separated sequence lengths")
+    parser.add_argument("--presets", default="", help="Substrings of the presets to run (default: all)")
+    parser.add_argument("--concurrency", default="1,2", help="Jobs rendering at the same time")
+    parser.add_argument("--threads", default="0", help="ffmpeg -threads values, 0 is ffmpeg's default")
+    parser.add_argument("--chunks", default="1", help="Segments per render (chunked encoding)")
+    parser.add_argument("--modes", default=",".join(INPUT_MODES),
+                        help="Frame input modes: files (image2 demuxer), pipe (prefetched frames on stdin)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per combination")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "sadalchemist_bench"),
+                        help="Where the synthetic sequences are cached")
+    parser.add_argument("--results", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.csv"),
+                        help="CSV file the results are appended to")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    return parser
+
+
+def iter_cases(args, ffmpeg):
+    wanted = parse_list(args.presets)
+    presets = [p for p in PRESETS if not wanted or any(w.lower() in p.lower() for w in wanted)]
+    for mode in parse_list(args.modes):
+        if mode not in INPUT_MODES:
+            raise SystemExit(f"Unknown input mode: {mode}")
+    for fmt in parse_list(args.formats):
+        if fmt not in FORMATS:
+            raise SystemExit(f"Unknown format: {fmt}")
+        for resolution in parse_list(args.resolutions):
+            for frames in parse_list(args.frames, int):
+                folder = generate_sequence(ffmpeg, args.data_dir, fmt, resolution, frames)
+                for preset in presets:
+                    for concurrency in parse_list(args.concurrency, int):
+                        for threads in parse_list(args.threads, int):
+                            for chunks in parse_list(args.chunks, int):
+                                for mode in parse_list(args.modes):
+                                    yield {
+                                        "folder": folder, "format": fmt, "resolution": resolution,
+                                        "frames": frames, "preset": preset, "concurrency": concurrency,
+                                        "threads": threads, "chunks": chunks, "mode": mode,
+                                    }
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return 0
+
+    ffmpeg = ffmpeg_path()
+    if not os.path.exists(ffmpeg):
+        print(f"ffmpeg not found at: {ffmpeg}", file=sys.stderr)
+        return 2
+    os.makedirs(args.data_dir, exist_ok=True)
+    common = {
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "revision": git_revision(),
+        "host": f"{platform.node()} ({os.cpu_count()} cpus)",
+        "ffmpeg": ffmpeg_version(ffmpeg),
+    }
+    new_file = not os.path.exists(args.results)
+    with open(args.results, "a", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+        if new_file:
+            writer.writeheader()
+        for case in iter_cases(args, ffmpeg):
+            for repeat in range(1, args.repeat + 1):
+                result = run_case_isolated(case)
+                row = {**common, **case, **result, "repeat": repeat}
+                writer.writerow(row)
+                f.flush()
+                print(f"{case['format']:>6} {case['resolution']:>9} {case['frames']:>5}f  {case['preset']:<28} "
+                      f"x{case['concurrency']} t{case['threads']} c{case['chunks']} {case['mode']:<5}  "
+                      + (f"{result['wall_seconds']:8.2f}s {result['fps']:8.1f} fps  {result['peak_rss_mb']} MB"
+                         if result["success"] else f"FAILED {result.get('error', '')[-200:]}"), flush=True)
+    print(f"Results appended to {args.results}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
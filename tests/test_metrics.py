@@ -0,0 +1,18 @@
+import time
+
+from alchemist import metrics
+
+
+def test_every_encode_phase_records_samples(monkeypatch):
+    # A job retried with the next encoder runs phase("encode") once per attempt
+    monkeypatch.setattr(metrics, "SAMPLE_INTERVAL", 0.01)
+    monkeypatch.setattr(metrics, "gpu_utilization", lambda: 50.0)
+    job = metrics.JobMetrics("shot")
+    job.sampler.gpu_available = True
+    with job.phase("encode"):
+        time.sleep(0.1)
+    first_attempt = len(job.sampler.gpu)
+    with job.phase("encode"):
+        time.sleep(0.1)
+    assert first_attempt > 0
+    assert len(job.sampler.gpu) > first_attempt
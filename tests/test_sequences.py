@@ -0,0 +1,26 @@
+from alchemist.sequences import STILL_FRAME, scan_folder
+
+
+def touch(folder, *names):
+    for name in names:
+        (folder / name).write_bytes(b"")
+
+
+def test_unnumbered_still_is_a_one_frame_sequence(tmp_path):
+    touch(tmp_path, "plate.png")
+    sequences = scan_folder(str(tmp_path))
+    assert len(sequences) == 1
+    still = sequences[0]
+    assert still.still
+    assert still.frames == [STILL_FRAME]
+    assert still.length == 1
+    assert still.path(still.first) == str(tmp_path / "plate.png")
+    assert still.pattern == "plate.png"
+
+
+def test_numbered_frames_stay_the_main_sequence_next_to_a_still(tmp_path):
+    touch(tmp_path, "slate.png", "shot.1001.exr", "shot.1002.exr")
+    sequences = scan_folder(str(tmp_path))
+    assert [s.still for s in sequences] == [False, True]
+    assert sequences[0].pattern == "shot.%04d.exr"
+    assert sequences[0].frames == [1001, 1002]